@@ -0,0 +1,127 @@
+"""Measure how fast the app starts.
+
+Reports the import time of `src.main` (in a fresh interpreter each run),
+then starts uvicorn and reports how long it takes until it answers
+`/ready` at all (taking connections) and until `/ready` returns 200.
+
+Most of the import time is fastapi, pandas and bizlogic (with ipfskvs
+and the Secret Manager client). The routes need them before uvicorn
+takes connections, so deferring them would not start the server any
+sooner. Only the client setup is deferred until after startup.
+
+```sh
+    python -m benchmarks.startup --runs 5
+```
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from signal import SIGKILL
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import src.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import(runs: int) -> list:
+    """Import `src.main` in new interpreters.
+
+    Args:
+        runs (int): The number of imports.
+
+    Returns:
+        list: Seconds per import.
+    """
+    return [
+        float(subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()[-1])
+        for _ in range(runs)
+    ]
+
+
+def get_ready_status(url: str) -> int:
+    """Call `/ready`.
+
+    Args:
+        url (str): The `/ready` url.
+
+    Returns:
+        int: The status code, 0 if the server is not listening yet.
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as err:
+        return err.code
+    except OSError:
+        return 0
+
+
+def measure_startup(port: int, timeout: float) -> tuple:
+    """Start uvicorn and wait for `/ready`.
+
+    Args:
+        port (int): The port to listen on.
+        timeout (float): Seconds to wait for the app to be ready.
+
+    Returns:
+        tuple: Seconds until the server answered, and until it was
+            ready (None if it was not ready before the timeout).
+    """
+    url = f"http://127.0.0.1:{port}/ready"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    serving = ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            status = get_ready_status(url)
+            now = time.perf_counter() - start
+            if status and serving is None:
+                serving = now
+            if status == 200:
+                ready = now
+                break
+            time.sleep(0.02)
+    finally:
+        os.kill(server.pid, SIGKILL)
+        server.wait()
+
+    return serving, ready
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    imports = measure_import(args.runs)
+    print(
+        f"import src.main: median {statistics.median(imports):.3f}s "
+        f"min {min(imports):.3f}s ({args.runs} runs)"
+    )
+
+    def seconds(value: float) -> str:
+        return "timed out" if value is None else f"{value:.3f}s"
+
+    serving, ready = measure_startup(args.port, args.timeout)
+    print(f"taking connections after: {seconds(serving)}")
+    print(f"ready after: {seconds(ready)}")
+
+
+if __name__ == "__main__":
+    main()
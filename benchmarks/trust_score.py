@@ -0,0 +1,53 @@
+"""Measure how fast trust scores are computed over a large vouch graph.
+
+Reports the time of a full PageRank computation over a random graph,
+then the time to update the scores after a batch of new vouches,
+starting from the previous scores.
+
+```sh
+    python -m benchmarks.trust_score --users 200000 --vouches 1000000
+```
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.trust_score import pagerank
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--vouches", type=int, default=1_000_000)
+    parser.add_argument("--new-vouches", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    voucher = rng.integers(0, args.users, args.vouches)
+    vouchee = rng.integers(0, args.users, args.vouches)
+
+    start = time.perf_counter()
+    scores = pagerank(voucher, vouchee, args.users)
+    print(
+        f"full computation ({args.vouches} vouches): "
+        f"{time.perf_counter() - start:.3f}s"
+    )
+
+    voucher = np.concatenate(
+        [voucher, rng.integers(0, args.users, args.new_vouches)]
+    )
+    vouchee = np.concatenate(
+        [vouchee, rng.integers(0, args.users, args.new_vouches)]
+    )
+    start = time.perf_counter()
+    pagerank(voucher, vouchee, args.users, start=scores)
+    print(
+        f"update ({args.new_vouches} new vouches): "
+        f"{time.perf_counter() - start:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,15 @@ def tests(session: nox.Session) -> None:
     session.run("pytest", "--cov=src")
 
 
+@nox.session(python=["python3.11"])
+def benchmark(session: nox.Session) -> None:
+    """Measure the startup time and the trust score computation time."""
+    session.install("-r", "requirements.txt")
+    session.env["PYTHONPATH"] = str(DIR)
+    session.run("python", "-m", "benchmarks.startup", *session.posargs)
+    session.run("python", "-m", "benchmarks.trust_score")
+
+
 @nox.session(python=["python3.11"])
 def lint(session: nox.Session) -> None:
     """Run the linter checks."""
@@ -0,0 +1,200 @@
+"""Firebase ID token verification.
+
+`auth.verify_id_token` checks the token signature on every call, and
+fetches Google's signing certificates whenever its HTTP cache of them
+has expired. Clients send the same token many times, so verified
+tokens are cached (by hash) until they expire, and the certificates
+are fetched again in the background as soon as they go stale.
+"""
+import asyncio
+import email.utils
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Dict, Mapping, Optional, Self
+
+from src.cache import LRUCache
+from src.executor import executor
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 10000))
+CERT_REFRESH_SECONDS = float(
+    os.environ.get("FIREBASE_CERT_REFRESH_SECONDS", 3600)
+)
+CERT_RETRY_SECONDS = float(os.environ.get("FIREBASE_CERT_RETRY_SECONDS", 30))
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+_refresh_task = None
+
+
+class TokenCache():
+    """Verified token claims, kept until the token expires."""
+
+    def __init__(self: Self, max_size: int) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_size (int): Max number of tokens to keep.
+        """
+        self._cache = LRUCache(max_size)
+
+    @staticmethod
+    def key(token: str) -> str:
+        """Get the cache key for a token, tokens are not kept in memory.
+
+        Args:
+            token (str): The ID token.
+
+        Returns:
+            str: The sha256 of the token.
+        """
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self: Self, token: str) -> Optional[Dict]:
+        """Get the claims of a token that was verified before.
+
+        Args:
+            token (str): The ID token.
+
+        Returns:
+            Optional[Dict]: The claims, or None if the token is not
+                cached or has expired.
+        """
+        key = self.key(token)
+        claims = self._cache.get(key)
+        if claims is None:
+            return None
+
+        if claims['exp'] <= time.time():
+            self._cache.pop(key)
+            return None
+
+        return claims
+
+    def set(self: Self, token: str, claims: Dict) -> None:
+        """Cache the claims of a verified token.
+
+        Args:
+            token (str): The ID token.
+            claims (Dict): The verified claims, with an `exp` claim.
+        """
+        if claims.get('exp', 0) > time.time():
+            self._cache.set(self.key(token), claims)
+
+    def clear(self: Self) -> None:
+        """Remove every token."""
+        self._cache.clear()
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+def verify_id_token(token: str) -> Dict:
+    """Verify a Firebase ID token, skipping tokens verified before.
+
+    Args:
+        token (str): The ID token.
+
+    Raises:
+        ValueError: (or a firebase `auth` error) if the token is invalid.
+
+    Returns:
+        Dict: The token claims.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        # firebase_admin is slow to import, load it on first use
+        from firebase_admin import auth
+
+        claims = auth.verify_id_token(token)
+        token_cache.set(token, claims)
+    return claims
+
+
+def seconds_until_stale(
+        headers: Mapping[str, str],
+        now: float = None) -> float:
+    """Get how long a cached HTTP response stays fresh.
+
+    Args:
+        headers (Mapping[str, str]): The response headers.
+        now (float, optional): The current epoch time.
+
+    Returns:
+        float: Seconds left, `CERT_REFRESH_SECONDS` if the response does
+            not say.
+    """
+    now = time.time() if now is None else now
+    match = _MAX_AGE.search(headers.get('cache-control', ''))
+    if match is None:
+        return CERT_REFRESH_SECONDS
+
+    fetched = now
+    if headers.get('date'):
+        fetched = email.utils.parsedate_to_datetime(
+            headers['date']
+        ).timestamp()
+
+    return fetched + int(match.group(1)) - now
+
+
+def prefetch_certificates() -> float:
+    """Fetch the ID token signing certificates into firebase's HTTP cache.
+
+    firebase_admin has no public API for this, so it uses the private
+    request of its token verifier. `requirements.txt` pins the major
+    version, and `test_prefetch_warms_the_verifier_cache` fails if the
+    internals move.
+
+    This is blocking, run it with the executor.
+
+    Returns:
+        float: Seconds until the certificates have to be fetched again.
+    """
+    from firebase_admin import auth
+    from firebase_admin._token_gen import ID_TOKEN_CERT_URI
+
+    # the same cache-control session `auth.verify_id_token` reads from
+    request = auth._get_client(None)._token_verifier.request
+    response = request(ID_TOKEN_CERT_URI)
+    if response.status != 200:
+        raise ValueError(
+            f"Failed to fetch certificates: HTTP {response.status}"
+        )
+
+    return seconds_until_stale(response.headers)
+
+
+async def refresh_certificates() -> None:
+    """Fetch the certificates again every time they expire."""
+    while True:
+        try:
+            delay = await executor.run("firebase", prefetch_certificates)
+            # wake up just after the cached copy goes stale
+            delay = min(max(delay, 0) + 1, CERT_REFRESH_SECONDS)
+        except Exception:
+            LOG.exception("Failed to prefetch firebase certificates")
+            delay = CERT_RETRY_SECONDS
+
+        await asyncio.sleep(delay)
+
+
+def start_certificate_refresh() -> None:
+    """Start refreshing the certificates in the background."""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.get_running_loop().create_task(
+            refresh_certificates()
+        )
+
+
+def stop_certificate_refresh() -> None:
+    """Stop refreshing the certificates."""
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
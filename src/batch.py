@@ -0,0 +1,92 @@
+"""Helpers for endpoints that take many items in one request.
+
+Items succeed or fail independently: the result of each item is a
+`BatchItemResponse` in the same position as the item. The blocking work
+of the items runs in parallel, bounded by the `executor` limit of each
+downstream.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+from fastapi import HTTPException, status
+
+from src.schemas import BatchItemResponse
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 1000))
+
+T = TypeVar("T")
+
+
+def check_batch_size(items: Sequence) -> None:
+    """Refuse batches with too many items.
+
+    Args:
+        items (Sequence): The items.
+
+    Raises:
+        HTTPException: If there are more than `BATCH_MAX_SIZE` items.
+    """
+    if len(items) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BATCH_MAX_SIZE} items per batch"
+        )
+
+
+def failure(index: int, error: Exception, id: Optional[str] = None) -> BatchItemResponse:  # noqa: E501
+    """Get the result of an item that failed.
+
+    Args:
+        index (int): The position of the item.
+        error (Exception): Why it failed.
+        id (str, optional): The record the item was for.
+
+    Returns:
+        BatchItemResponse: The result.
+    """
+    if isinstance(error, HTTPException):
+        message = error.detail
+    else:
+        # not always called from the except block, pass the traceback
+        LOG.error("Batch item %s failed: %s", index, error, exc_info=error)
+        message = str(error)
+
+    return BatchItemResponse(
+        index=index,
+        id=id,
+        success=False,
+        error_message=message,
+        error_type=type(error).__name__
+    )
+
+
+async def run_batch(
+        items: Sequence[T],
+        func: Callable[[T], Awaitable[Optional[str]]]
+) -> List[BatchItemResponse]:
+    """Process every item of a batch.
+
+    Args:
+        items (Sequence[T]): The items.
+        func (Callable[[T], Awaitable[Optional[str]]]): Processes one
+            item, returns the id of the record it created or changed.
+
+    Returns:
+        List[BatchItemResponse]: The result of each item, in order.
+    """
+    async def attempt(index: int, item: T) -> BatchItemResponse:
+        try:
+            return BatchItemResponse(
+                index=index, id=await func(item), success=True
+            )
+        except Exception as e:
+            return failure(index, e)
+
+    return list(await asyncio.gather(*(
+        attempt(index, item) for index, item in enumerate(items)
+    )))
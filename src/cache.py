@@ -0,0 +1,75 @@
+"""In-memory caches."""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Self
+
+
+class LRUCache():
+    """Thread-safe least-recently-used cache with a max entry count."""
+
+    def __init__(self: Self, max_size: int) -> None:
+        """Create an LRU cache.
+
+        Args:
+            max_size (int): The max number of entries to keep.
+        """
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self: Self, key: Hashable, default: Any = None) -> Any:
+        """Get a value and mark it as recently used.
+
+        Args:
+            key (Hashable): The cache key.
+            default (Any, optional): Returned on a miss. Defaults to None.
+
+        Returns:
+            Any: The cached value or `default`.
+        """
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self: Self, key: Hashable, value: Any) -> None:
+        """Add a value, evicting the least recently used entries.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to cache.
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self: Self, key: Hashable, default: Any = None) -> Any:
+        """Remove a value.
+
+        Args:
+            key (Hashable): The cache key.
+            default (Any, optional): Returned on a miss. Defaults to None.
+
+        Returns:
+            Any: The removed value or `default`.
+        """
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self: Self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self: Self, key: Hashable) -> bool:
+        """Check if a key is cached without marking it as used."""
+        with self._lock:
+            return key in self._data
+
+    def __len__(self: Self) -> int:
+        """Get the number of cached entries."""
+        with self._lock:
+            return len(self._data)
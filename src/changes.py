@@ -0,0 +1,172 @@
+"""Change feed of the records in the store indexes.
+
+Every record a `StoreIndex` adds (read from IPFS or written by this
+process) is a change. Changes are ordered by the key of their record:
+(created, filename). `created` is the write time in nanoseconds and
+the filename is unique, so every replica that has read a record orders
+it the same way. A cursor is the key of the last change a client has
+seen, so it can be resumed on any replica, and after a restart.
+
+Records written by other replicas reach the indexes some time after
+they were written, with a key that can be before the cursor of a client
+that already synced past it. So the cursor after a partial page stays
+`CHANGES_SETTLE_SECONDS` behind the present, and the newest changes are
+sent again on the next sync. A change is a whole record, applying it
+twice is harmless.
+
+Listeners are notified of every new record, see `src.events`.
+"""
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Self, Tuple
+
+from fastapi import HTTPException, status
+
+import pandas as pd
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+CHANGES_SETTLE_SECONDS = float(os.environ.get("CHANGES_SETTLE_SECONDS", 60))
+
+# (created in nanoseconds, filename) of a record
+ChangeKey = Tuple[int, str]
+START: ChangeKey = (0, "")
+
+Listener = Callable[[int, List[ChangeKey], pd.DataFrame], None]
+
+
+class ChangeLog():
+    """Notify listeners of new records and issue the feed cursors."""
+
+    def __init__(self: Self) -> None:
+        """Create a log without listeners."""
+        self._listeners: List[Listener] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self: Self, listener: Listener) -> None:
+        """Call a function with the records of every append.
+
+        Listeners are called on the thread that appended the records,
+        they must not block.
+
+        Args:
+            listener (Listener): Called with the `ParserType`, the keys
+                and the new records.
+        """
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self: Self, listener: Listener) -> None:
+        """Stop calling a function added with `add_listener`.
+
+        Args:
+            listener (Listener): The function.
+        """
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def append(
+            self: Self,
+            parser_type: int,
+            keys: List[ChangeKey],
+            records: pd.DataFrame) -> None:
+        """Notify the listeners of new records.
+
+        Args:
+            parser_type (int): The `ParserType` of the records.
+            keys (List[ChangeKey]): The key of each record.
+            records (pd.DataFrame): The records.
+        """
+        with self._lock:
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(parser_type, keys, records)
+            except Exception:
+                LOG.exception("Change log listener failed")
+
+    @staticmethod
+    def encode_cursor(key: ChangeKey) -> str:
+        """Encode the key of a change as an opaque cursor.
+
+        Args:
+            key (ChangeKey): The key of the last change the client has
+                seen.
+
+        Returns:
+            str: The cursor.
+        """
+        data = json.dumps({"created": key[0], "filename": key[1]})
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor: Optional[str]) -> ChangeKey:
+        """Decode a cursor from `encode_cursor`.
+
+        Args:
+            cursor (Optional[str]): The cursor, None to start over.
+
+        Raises:
+            HTTPException: 400 if the cursor is invalid.
+
+        Returns:
+            ChangeKey: The key of the last change the client has seen.
+        """
+        if cursor is None:
+            return START
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return int(data["created"]), str(data["filename"])
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+
+    @staticmethod
+    def read(
+            sources: Dict[int, Any],
+            since: ChangeKey,
+            limit: int,
+            settle: float = CHANGES_SETTLE_SECONDS
+    ) -> Tuple[List[Tuple[ChangeKey, int, int]], ChangeKey]:
+        """Get the changes after a key, across every type of record.
+
+        Args:
+            sources (Dict[int, Any]): `ParserType` --> `StoreIndex`.
+            since (ChangeKey): The key of the last change the client has
+                seen.
+            limit (int): Max number of changes.
+            settle (float, optional): Seconds the next cursor stays
+                behind the present after a partial page.
+
+        Returns:
+            Tuple[List[Tuple[ChangeKey, int, int]], ChangeKey]: (key,
+                parser type, row) of each change in key order, and the
+                key to continue from.
+        """
+        changes = sorted(
+            (key, parser_type, row)
+            for parser_type, source in sources.items()
+            for key, row in source.changes(since, limit)
+        )[:limit]
+
+        last = changes[-1][0] if changes else since
+        if len(changes) == limit:
+            return changes, last
+
+        # records of other replicas can still arrive before this key
+        settled = (time.time_ns() - int(settle * 1e9), "")
+        return changes, max(since, min(last, settled))
+
+
+change_log = ChangeLog()
@@ -0,0 +1,227 @@
+"""Fan out new records to subscribers of the `/events` streams.
+
+The `EventBroker` listens to the `ChangeLog`, so it sees the records
+written by this process as soon as they are written, and the records
+written by other processes when the store indexes refresh.
+
+Every subscriber has a bounded queue. A subscriber that falls too far
+behind is closed instead of buffering without limit, and can catch up
+with `/changes` from the cursor of the last event it received.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import AsyncIterator, Dict, FrozenSet, List, Optional, Self
+
+from bizlogic.utils import GROUP_BY
+
+from fastapi.encoders import jsonable_encoder
+
+import pandas as pd
+
+from src.changes import ChangeKey, ChangeLog, change_log
+from src.utils import RouterUtils
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", 1000))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get("EVENT_HEARTBEAT_SECONDS", 15))  # noqa: E501
+
+# record fields subscribers can filter on
+TOPICS = ("borrower", "lender", "voucher", "vouchee")
+
+
+class Subscription():
+    """The events one client receives."""
+
+    def __init__(
+            self: Self,
+            loop: asyncio.AbstractEventLoop,
+            kinds: Optional[FrozenSet[str]] = None,
+            topics: Optional[Dict[str, str]] = None,
+            max_size: int = EVENT_QUEUE_SIZE) -> None:
+        """Create a subscription.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The loop of the client.
+            kinds (FrozenSet[str], optional): Only receive these types of
+                records, ex: {"loan"}. Defaults to every type.
+            topics (Dict[str, str], optional): Only receive records with
+                these field values, ex: {"borrower": "123"}.
+            max_size (int, optional): Max number of events waiting to be
+                sent before the subscription is closed.
+        """
+        self.loop = loop
+        self.kinds = kinds
+        self.topics = topics or {}
+        self.closed = False
+        self.queue = asyncio.Queue(max_size)
+
+    def matches(self: Self, event: dict) -> bool:
+        """Check if the client wants an event.
+
+        Args:
+            event (dict): The event.
+
+        Returns:
+            bool: True if it has one of the kinds and all the topics.
+        """
+        if self.kinds and event["kind"] not in self.kinds:
+            return False
+
+        record = event["record"]
+        return all(
+            key in record and str(record[key]) == value
+            for key, value in self.topics.items()
+        )
+
+    def push(self: Self, events: List[dict]) -> None:
+        """Queue events for the client, on the loop of the client.
+
+        Args:
+            events (List[dict]): The events.
+        """
+        for event in events:
+            if self.closed:
+                return
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                LOG.warning("Closing a subscription that fell behind")
+                self.close()
+
+    def close(self: Self) -> None:
+        """Stop the subscription once the queued events are sent."""
+        self.closed = True
+        try:
+            # wake up the client if it is waiting for an event
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def events(
+            self: Self,
+            heartbeat: float = EVENT_HEARTBEAT_SECONDS
+    ) -> AsyncIterator[Optional[dict]]:
+        """Wait for events.
+
+        Args:
+            heartbeat (float, optional): Seconds without events before
+                yielding None, so the caller can keep the connection
+                alive.
+
+        Yields:
+            Optional[dict]: The events, or None when there was no event
+                for `heartbeat` seconds.
+        """
+        while not (self.closed and self.queue.empty()):
+            try:
+                event = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+
+            if event is not None:
+                yield event
+
+
+class EventBroker():
+    """Send the records added to a `ChangeLog` to the subscribers."""
+
+    def __init__(self: Self, log: ChangeLog = change_log) -> None:
+        """Create a broker without subscribers.
+
+        Args:
+            log (ChangeLog, optional): The log that issues the cursors.
+        """
+        self.log = log
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(
+            self: Self,
+            kinds: Optional[FrozenSet[str]] = None,
+            topics: Optional[Dict[str, str]] = None) -> Subscription:
+        """Start receiving events, call it from the loop of the client.
+
+        Args:
+            kinds (FrozenSet[str], optional): See `Subscription`.
+            topics (Dict[str, str], optional): See `Subscription`.
+
+        Returns:
+            Subscription: The subscription, pass it to `unsubscribe`
+                when the client disconnects.
+        """
+        subscription = Subscription(
+            asyncio.get_running_loop(), kinds, topics
+        )
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self: Self, subscription: Subscription) -> None:
+        """Stop sending events to a subscription.
+
+        Args:
+            subscription (Subscription): From `subscribe`.
+        """
+        with self._lock:
+            self._subscriptions.discard(subscription)
+        subscription.close()
+
+    def publish(self: Self, events: List[dict]) -> None:
+        """Send events to the matching subscriptions, from any thread.
+
+        Args:
+            events (List[dict]): The events.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            matching = [event for event in events if subscription.matches(event)]  # noqa: E501
+            if matching:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.push, matching
+                )
+
+    def publish_changes(
+            self: Self,
+            parser_type: int,
+            keys: List[ChangeKey],
+            records: pd.DataFrame) -> None:
+        """Send new records as events, see `ChangeLog.add_listener`.
+
+        Args:
+            parser_type (int): The `ParserType` of the records.
+            keys (List[ChangeKey]): The key of each record.
+            records (pd.DataFrame): The records.
+        """
+        if not self._subscriptions:
+            return
+
+        records = jsonable_encoder(
+            RouterUtils.sanitize_output(records).to_dict(orient='records')
+        )
+        self.publish([
+            {
+                "kind": GROUP_BY[parser_type],
+                "record": record,
+                "cursor": self.log.encode_cursor(key)
+            }
+            for key, record in zip(keys, records)
+        ])
+
+    def close(self: Self) -> None:
+        """End every subscription."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            self._subscriptions.clear()
+
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.close)
+
+
+broker = EventBroker()
@@ -0,0 +1,155 @@
+"""Bounded executor for blocking downstream calls.
+
+The bizlogic readers/writers and the IPFS client are synchronous. Calling
+them directly from an `async def` handler blocks the event loop, so every
+blocking call is dispatched through the shared executor instead:
+
+```py
+    from src.executor import executor
+
+    df = await executor.run("ipfs", loan_reader.get_all_loans)
+```
+
+Each downstream has its own concurrency limit so one slow dependency
+cannot take every worker thread.
+"""
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Self
+
+from src.ipfs import IPFS_POOL_SIZE
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+DEFAULT_LIMITS = {
+    # never queue more ipfs calls than there are pooled connections
+    "ipfs": IPFS_POOL_SIZE,
+    "wallet": int(os.environ.get("EXECUTOR_WALLET_LIMIT", 4)),
+    "firebase": int(os.environ.get("EXECUTOR_FIREBASE_LIMIT", 4)),
+    "cpu": int(os.environ.get("EXECUTOR_CPU_LIMIT", os.cpu_count() or 1)),
+}
+
+
+@dataclass
+class DownstreamStats():
+    """Queue depth metrics for a single downstream."""
+
+    limit: int
+    waiting: int = 0
+    in_flight: int = 0
+    completed: int = 0
+    failed: int = 0
+    max_waiting: int = 0
+
+
+class BoundedExecutor():
+    """Run blocking calls in a thread pool with per-downstream limits."""
+
+    def __init__(
+            self: Self,
+            limits: Dict[str, int],
+            max_workers: int = None) -> None:
+        """Create a bounded executor.
+
+        Args:
+            limits (Dict[str, int]): Max concurrent calls per downstream.
+            max_workers (int, optional): Size of the shared thread pool.
+                Defaults to the sum of the downstream limits.
+        """
+        self.limits = dict(limits)
+        self.max_workers = max_workers or sum(self.limits.values())
+        self._pool = None
+        self._semaphores = {}
+        self._stats = {
+            name: DownstreamStats(limit=limit)
+            for name, limit in self.limits.items()
+        }
+
+    @property
+    def pool(self: Self) -> ThreadPoolExecutor:
+        """The shared thread pool, created on first use."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="blocking"
+            )
+        return self._pool
+
+    def _semaphore(self: Self, downstream: str) -> asyncio.Semaphore:
+        if downstream not in self.limits:
+            raise KeyError(f"Unknown downstream `{downstream}`")
+
+        if downstream not in self._semaphores:
+            self._semaphores[downstream] = asyncio.Semaphore(
+                self.limits[downstream]
+            )
+        return self._semaphores[downstream]
+
+    async def run(
+            self: Self,
+            downstream: str,
+            func: Callable,
+            *args: Any,
+            **kwargs: Any) -> Any:
+        """Run a blocking function without blocking the event loop.
+
+        Args:
+            downstream (str): The downstream the call talks to,
+                ex: "ipfs". Used for the concurrency limit and metrics.
+            func (Callable): The blocking function.
+            *args (Any): Positional arguments for `func`.
+            **kwargs (Any): Keyword arguments for `func`.
+
+        Returns:
+            Any: The return value of `func`.
+        """
+        semaphore = self._semaphore(downstream)
+        stats = self._stats[downstream]
+
+        stats.waiting += 1
+        stats.max_waiting = max(stats.max_waiting, stats.waiting)
+        try:
+            await semaphore.acquire()
+        finally:
+            stats.waiting -= 1
+
+        stats.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self.pool,
+                functools.partial(func, *args, **kwargs)
+            )
+            stats.completed += 1
+            return result
+        except Exception:
+            stats.failed += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            semaphore.release()
+
+    def stats(self: Self) -> Dict[str, dict]:
+        """Get the queue depth metrics for every downstream.
+
+        Returns:
+            Dict[str, dict]: downstream name --> metrics
+        """
+        return {
+            name: asdict(stats) for name, stats in self._stats.items()
+        }
+
+    def shutdown(self: Self) -> None:
+        """Stop the thread pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._semaphores = {}
+
+
+executor = BoundedExecutor(DEFAULT_LIMITS)
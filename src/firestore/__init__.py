@@ -1,3 +1,32 @@
-from google.cloud import firestore
+"""Firestore client.
 
-db = firestore.Client()
+The client is created on first use, importing the app does not
+connect to Firestore.
+"""
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING
+
+from src.firestore.lock import lock_user, unlock_user, update_applicant_id  # noqa: F401
+
+if TYPE_CHECKING:
+    from google.cloud import firestore
+
+_lock = threading.Lock()
+_db = None
+
+
+def get_db() -> firestore.Client:
+    """Get the process-wide Firestore client.
+
+    Returns:
+        firestore.Client: The shared client.
+    """
+    from google.cloud import firestore
+
+    global _db
+    with _lock:
+        if _db is None:
+            _db = firestore.Client()
+        return _db
@@ -1,17 +1,31 @@
-from fastapi import HTTPException
-import time
+from __future__ import annotations
+
 import logging
+import os
+import time
+import uuid
+from typing import Optional, TYPE_CHECKING
 
-from google.cloud import firestore
-from google.cloud.firestore_v1.transaction import Transaction
+from fastapi import HTTPException
 
-from src.firestore import db
+from src.executor import executor
+from src.firestore import get_db
+from src.firestore.lock import LOCK_LEASE_SECONDS, acquire_lease, lease_held, release_lease, transactional, update_applicant_id  # noqa: E501
 from src.schemas import SumsubApplicantStatus
-from src.sumsub import create_applicant, get_applicant_status
+from src.sumsub import SUMSUB_LEVEL_NAME, get_sumsub_client, webhook_created, webhook_status  # noqa: E501
+
+if TYPE_CHECKING:
+    from google.cloud.firestore_v1.document import DocumentReference
+    from google.cloud.firestore_v1.transaction import Transaction
 
 LOG = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
+# statuses pushed by the webhook (or fetched) are served for this long
+ONBOARD_STATUS_TTL_SECONDS = float(
+    os.environ.get("ONBOARD_STATUS_TTL_SECONDS", 3600)
+)
+
 
 def check_locked(uid: str) -> bool:
     """Checks if a user is locked in Firestore.
@@ -26,68 +40,175 @@ def check_locked(uid: str) -> bool:
     """
     # Check if user id is "locked" in Firestore
     LOG.debug(f"Checking if user {uid} is locked")
-    user_ref = db.collection('users').document(uid)
+    user_ref = get_db().collection('users').document(uid)
     doc = user_ref.get()
     if not doc.exists:
         LOG.debug(f"User {uid} not found. Creating new user.")
         user_ref.set({'uid': uid, 'locked': False}, merge=True)
         return False
 
-    data = doc.to_dict()
-    return data.get('locked', False)
+    return lease_held(doc.to_dict())
 
 
-@firestore.transactional
-def check_and_lock_user(transaction: Transaction, uid: str) -> SumsubApplicantStatus:
-    """Perform the transaction of checking and locking the user.
+def cached_status(data: dict, now: float = None) -> Optional[dict]:
+    """Get the Sumsub status stored on a user document, if it is fresh.
+
+    Args:
+        data (dict): The user document.
+        now (float, optional): The current epoch time.
+
+    Returns:
+        Optional[dict]: The status, or None if it is missing or older
+            than `ONBOARD_STATUS_TTL_SECONDS`.
+    """
+    now = time.time() if now is None else now
+    status = data.get('sumsub_status')
+    updated = data.get('sumsub_status_updated')
+    if not status or updated is None or \
+            now - updated > ONBOARD_STATUS_TTL_SECONDS:
+        return None
+    return status
 
-    This function will be called within a Firestore transaction and ensures that
-    the operations of checking and locking the user are performed atomically.
+
+@transactional
+def store_applicant_status(
+        transaction: Transaction,
+        user_ref: DocumentReference,
+        status: dict,
+        created: float,
+        applicant_id: str = None) -> bool:
+    """Store the Sumsub status on a user document, unless it is older.
+
+    Sumsub does not deliver webhooks in order, so a status is only
+    stored if it is newer than the stored one.
 
     Args:
         transaction (Transaction): The Firestore transaction instance.
-        uid (str): The external user id to associate to the sumsub applicant id
+        user_ref (DocumentReference): The user document.
+        status (dict): The `SumsubApplicantStatus` fields to update.
+        created (float): The epoch time of the status: when the webhook
+            event was created, or when the status was fetched.
+        applicant_id (str, optional): The Sumsub applicant id.
+
+    Returns:
+        bool: False if a newer status is already stored.
+    """
+    snapshot = user_ref.get(transaction=transaction)
+    stored = (snapshot.to_dict() if snapshot.exists else None) or {}
+    if created < (stored.get('sumsub_status_created') or 0):
+        return False
+
+    data = {
+        'sumsub_status': status,
+        'sumsub_status_created': created,
+        'sumsub_status_updated': time.time(),
+    }
+    if applicant_id:
+        data['applicant_id'] = applicant_id
+
+    # merge, so partial statuses from webhooks keep the other fields
+    transaction.set(user_ref, data, merge=True)
+    return True
 
-    Raises:
-        HTTPException: If the user is already locked.
+
+def record_webhook(payload: dict) -> bool:
+    """Store the status from a Sumsub webhook event.
+
+    Events older than the stored status are ignored.
+
+    Args:
+        payload (dict): The webhook body.
 
     Returns:
-        str: The status of the user.
+        bool: False if the event is not for one of our users.
     """
-    user_ref = db.collection('users').document(uid)
+    uid = payload.get('externalUserId')
+    status = webhook_status(payload)
+    if not uid or not status:
+        return False
 
-    snapshot = user_ref.get(transaction=transaction)
-    if not snapshot.exists:
-        LOG.debug(f"User {uid} not found. Creating new user.")
-        transaction.set(user_ref, {'uid': uid, 'locked': False})
+    created = webhook_created(payload)
+    if created is None:
+        LOG.warning(f"Sumsub event without createdAtMs for user {uid}")
+        created = time.time()
 
-    data = snapshot.to_dict()
+    LOG.debug(f"Sumsub {payload.get('type')} event for user {uid}: {status}")
+    if not store_applicant_status(
+            get_db().transaction(),
+            get_db().collection('users').document(uid),
+            status,
+            created,
+            payload.get('applicantId')):
+        LOG.debug(f"Ignored Sumsub event older than the status of {uid}")
+    return True
 
-    if data.get('locked', False):
-        # If user is already locked, raise an HTTPException
-        raise HTTPException(
-            status_code=400,
-            detail="Duplicate request is already in progress"
-        )
 
-    # Lock user if it's not locked
-    transaction.update(user_ref, {'locked': True})
+async def get_onboarding_status(uid: str) -> SumsubApplicantStatus:
+    """Get the Sumsub status of a user, creating the applicant if needed.
 
-    # get applicant id corresponding to user from firestore
-    applicant_id = data.get('applicant_id')
+    The status pushed by the Sumsub webhook is served while it is fresh.
+    Otherwise it is fetched from Sumsub: the user is leased for the
+    duration of the Sumsub calls, so only one request can be in progress
+    at a time for a given user. The Sumsub calls run outside of any
+    Firestore transaction.
 
-    # if the applicant id does not exist,
-    # create a new one in sumsub
-    # and store the id in firestore
-    if not applicant_id:
-        applicant_id = create_applicant(uid, 'basic-kyc-level')
-        transaction.update(user_ref, {'applicant_id': applicant_id})
+    Args:
+        uid (str): The external user id to associate to the sumsub applicant id
 
-    # query sumsub for the status of the applicant id
-    status = get_applicant_status(applicant_id)
-    LOG.debug(f"Applicant {applicant_id} status: {status}")
+    Raises:
+        HTTPException: If the user is already locked.
 
-    # Unlock user
-    transaction.update(user_ref, {'locked': False})
+    Returns:
+        SumsubApplicantStatus: The status of the user.
+    """
+    user_ref = get_db().collection('users').document(uid)
+    doc = await executor.run("firebase", user_ref.get)
+    status = cached_status(doc.to_dict() if doc.exists else {})
+    if status is not None:
+        return status
+
+    owner = str(uuid.uuid4())
+    client = get_sumsub_client()
+    # the lease must outlive the two Sumsub calls made under it,
+    # LOCK_LEASE_SECONDS is left for the Firestore calls
+    lease_seconds = LOCK_LEASE_SECONDS + 2 * client.max_request_seconds
+
+    data = await executor.run(
+        "firebase", acquire_lease,
+        get_db().transaction(), user_ref, owner, lease_seconds
+    )
+    if data is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Duplicate request is already in progress"
+        )
 
-    return status
+    try:
+        # get applicant id corresponding to user from firestore
+        applicant_id = data.get('applicant_id')
+
+        # if the applicant id does not exist,
+        # create a new one in sumsub
+        # and store the id in firestore
+        if not applicant_id:
+            applicant_id = await client.create_applicant(
+                uid, SUMSUB_LEVEL_NAME
+            )
+            await executor.run(
+                "firebase", update_applicant_id, user_ref, applicant_id
+            )
+
+        # query sumsub for the status of the applicant id
+        fetched = time.time()
+        status = await client.get_applicant_status(applicant_id)
+        LOG.debug(f"Applicant {applicant_id} status: {status}")
+        await executor.run(
+            "firebase", store_applicant_status,
+            get_db().transaction(), user_ref, status, fetched
+        )
+        return status
+    finally:
+        # Unlock user
+        await executor.run(
+            "firebase", release_lease, get_db().transaction(), user_ref, owner
+        )
@@ -0,0 +1,188 @@
+"""Per-user lease locks in Firestore.
+
+A user is locked while a request talks to Sumsub on their behalf. The
+lock is a lease: it records an owner and an expiry, so a request that
+crashes without unlocking only blocks the user until the lease expires.
+
+Taking and releasing the lease are short reads and writes. Slow
+external calls run between `lock_user` and `unlock_user`, never inside
+a Firestore transaction.
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import time
+from typing import Callable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google.cloud.firestore_v1.document import DocumentReference
+    from google.cloud.firestore_v1.transaction import Transaction
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+LOCK_LEASE_SECONDS = float(os.environ.get("LOCK_LEASE_SECONDS", 60))
+
+
+def transactional(func: Callable) -> Callable:
+    """`firestore.transactional`, google.cloud.firestore is slow to import."""
+    @functools.wraps(func)
+    def wrapper(transaction: Transaction, *args, **kwargs):  # noqa: ANN002,ANN003,ANN201,ANN202,E501
+        from google.cloud import firestore
+
+        return firestore.transactional(func)(transaction, *args, **kwargs)
+
+    return wrapper
+
+
+def lease_held(data: dict, now: float = None) -> bool:
+    """Check if a user document is locked by an unexpired lease.
+
+    Args:
+        data (dict): The user document.
+        now (float, optional): The current epoch time.
+
+    Returns:
+        bool: True if the user is locked.
+    """
+    now = time.time() if now is None else now
+    # locks from before leases (no expiry) are treated as expired
+    return bool(data.get('locked', False)) and \
+        (data.get('lease_expiry') or 0) > now
+
+
+def _get(user_ref: DocumentReference, transaction: Transaction) -> dict:
+    snapshot = user_ref.get(transaction=transaction) \
+        if transaction is not None else user_ref.get()
+    return (snapshot.to_dict() if snapshot.exists else None) or {}
+
+
+def _set(
+        user_ref: DocumentReference,
+        transaction: Transaction,
+        data: dict) -> None:
+    if transaction is not None:
+        transaction.set(user_ref, data, merge=True)
+    else:
+        user_ref.set(data, merge=True)
+
+
+def lock_user(
+        user_ref: DocumentReference,
+        owner: Optional[str] = None,
+        lease_seconds: float = LOCK_LEASE_SECONDS,
+        transaction: Optional[Transaction] = None) -> bool:
+    """Take the lease on a user.
+
+    Args:
+        user_ref (DocumentReference): The user document.
+        owner (str, optional): Identifies the holder of the lease.
+        lease_seconds (float, optional): Seconds before the lease expires.
+        transaction (Transaction, optional): Read and write in this
+            transaction. Use `acquire_lease` to take the lease atomically.
+
+    Returns:
+        bool: True if the lease was taken, False if another request
+            holds it.
+    """
+    now = time.time()
+    if lease_held(_get(user_ref, transaction), now):
+        return False
+
+    _set(user_ref, transaction, {
+        'uid': user_ref.id,
+        'locked': True,
+        'lease_owner': owner,
+        'lease_expiry': now + lease_seconds,
+    })
+    return True
+
+
+def unlock_user(
+        user_ref: DocumentReference,
+        owner: Optional[str] = None,
+        transaction: Optional[Transaction] = None) -> bool:
+    """Release the lease on a user.
+
+    Args:
+        user_ref (DocumentReference): The user document.
+        owner (str, optional): Only release the lease if it is still
+            held by this owner (it may have expired and been taken).
+        transaction (Transaction, optional): Read and write in this
+            transaction.
+
+    Returns:
+        bool: True if the user was unlocked.
+    """
+    if owner is not None:
+        lease_owner = _get(user_ref, transaction).get('lease_owner')
+        if lease_owner != owner:
+            LOG.warning(f"Lease on user {user_ref.id} was taken by {lease_owner}")  # noqa: E501
+            return False
+
+    _set(user_ref, transaction, {
+        'locked': False,
+        'lease_owner': None,
+        'lease_expiry': None,
+    })
+    return True
+
+
+def update_applicant_id(
+        user_ref: DocumentReference,
+        applicant_id: str) -> bool:
+    """Store the Sumsub applicant id of a user.
+
+    Args:
+        user_ref (DocumentReference): The user document.
+        applicant_id (str): The Sumsub applicant id.
+
+    Returns:
+        bool: True when successful.
+    """
+    user_ref.set({'applicant_id': applicant_id}, merge=True)
+    return True
+
+
+@transactional
+def acquire_lease(
+        transaction: Transaction,
+        user_ref: DocumentReference,
+        owner: str,
+        lease_seconds: float = LOCK_LEASE_SECONDS) -> Optional[dict]:
+    """Atomically take the lease on a user.
+
+    Args:
+        transaction (Transaction): The Firestore transaction instance.
+        user_ref (DocumentReference): The user document.
+        owner (str): Identifies the holder of the lease.
+        lease_seconds (float, optional): Seconds before the lease expires.
+
+    Returns:
+        Optional[dict]: The user document as it was before locking, or
+            None if another request holds the lease.
+    """
+    data = _get(user_ref, transaction)
+    if not lock_user(user_ref, owner, lease_seconds, transaction):
+        return None
+    return data
+
+
+@transactional
+def release_lease(
+        transaction: Transaction,
+        user_ref: DocumentReference,
+        owner: str) -> bool:
+    """Atomically release the lease on a user, if it is still ours.
+
+    Args:
+        transaction (Transaction): The Firestore transaction instance.
+        user_ref (DocumentReference): The user document.
+        owner (str): The holder of the lease.
+
+    Returns:
+        bool: True if the user was unlocked.
+    """
+    return unlock_user(user_ref, owner, transaction)
@@ -0,0 +1,194 @@
+"""Feature flags from Firebase Remote Config.
+
+The flags are loaded in the background and kept in memory, so reading
+a flag from a handler never makes a network call:
+
+```py
+    from src.flags import flags
+
+    if flags.is_enabled("new_loan_flow"):
+        ...
+```
+
+The template is fetched again every `FLAG_REFRESH_SECONDS` with its
+ETag, and only parsed when it changed.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Self
+
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2 import service_account
+
+import requests
+
+from src import FIREBASE_PROJECT_ID
+from src.executor import executor
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+# https://firebase.google.com/docs/reference/remote-config/rest/v1/projects/getRemoteConfig
+REMOTE_CONFIG_URL = f"https://firebaseremoteconfig.googleapis.com/v1/projects/{FIREBASE_PROJECT_ID}/remoteConfig"  # noqa: E501
+REMOTE_CONFIG_SCOPES = [
+    "https://www.googleapis.com/auth/firebase.remoteconfig"
+]
+FLAG_REFRESH_SECONDS = float(os.environ.get("FLAG_REFRESH_SECONDS", 60))
+FLAG_TIMEOUT = float(os.environ.get("FLAG_TIMEOUT", 10))
+
+
+def parse_value(parameter: dict) -> Any:
+    """Convert the default value of a Remote Config parameter.
+
+    Args:
+        parameter (dict): The parameter from the template.
+
+    Returns:
+        Any: The value, typed by the parameter's `valueType`. None if
+            the parameter has no server side default.
+    """
+    value = parameter.get('defaultValue', {}).get('value')
+    if value is None:
+        return None
+
+    value_type = parameter.get('valueType', 'STRING')
+    if value_type == 'BOOLEAN':
+        return value.lower() == 'true'
+    if value_type == 'NUMBER':
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    if value_type == 'JSON':
+        return json.loads(value)
+    return value
+
+
+class FeatureFlags():
+    """In-memory copy of the Remote Config parameters."""
+
+    def __init__(
+            self: Self,
+            url: str = REMOTE_CONFIG_URL,
+            session: requests.Session = None,
+            refresh_interval: float = FLAG_REFRESH_SECONDS) -> None:
+        """Create an empty flag store.
+
+        Args:
+            url (str, optional): The Remote Config template url.
+            session (requests.Session, optional): An authorized session.
+                Defaults to one for the `FIREBASE_CREDENTIALS_PATH`
+                service account, created on the first refresh.
+            refresh_interval (float, optional): Seconds between fetches.
+        """
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.etag = None
+        self.loaded_at = None
+        self._session = session
+        self._values: Dict[str, Any] = {}
+        self._refresh_lock = threading.Lock()
+        self._refresh_task = None
+
+    def _get_session(self: Self) -> requests.Session:
+        if self._session is None:
+            # Authenticate a credential with the service account
+            credentials = service_account.Credentials.from_service_account_file(  # noqa: E501
+                os.environ['FIREBASE_CREDENTIALS_PATH'],
+                scopes=REMOTE_CONFIG_SCOPES
+            )
+            self._session = AuthorizedSession(credentials)
+        return self._session
+
+    def refresh(self: Self) -> bool:
+        """Fetch the template if it changed since the last fetch.
+
+        This is blocking, run it with the executor.
+
+        Returns:
+            bool: True if the flags changed.
+        """
+        with self._refresh_lock:
+            headers = {'If-None-Match': self.etag} if self.etag else {}
+            response = self._get_session().get(
+                self.url, headers=headers, timeout=FLAG_TIMEOUT
+            )
+            self.loaded_at = time.monotonic()
+            if response.status_code == 304:
+                return False
+            response.raise_for_status()
+
+            etag = response.headers.get('ETag')
+            if etag is not None and etag == self.etag:
+                return False
+
+            parameters = response.json().get('parameters', {})
+            # swap the whole dict, readers never see a partial update
+            self._values = {
+                name: parse_value(parameter)
+                for name, parameter in parameters.items()
+            }
+            self.etag = etag
+            LOG.debug("Loaded feature flags %s: %s", etag, self._values)
+            return True
+
+    def get(self: Self, name: str, default: Any = None) -> Any:
+        """Get a flag value.
+
+        Args:
+            name (str): The parameter name.
+            default (Any, optional): Returned if the flag is not set.
+
+        Returns:
+            Any: The flag value.
+        """
+        value = self._values.get(name)
+        return default if value is None else value
+
+    def is_enabled(self: Self, name: str, default: bool = False) -> bool:
+        """Check a boolean flag.
+
+        Args:
+            name (str): The parameter name.
+            default (bool, optional): Returned if the flag is not set.
+
+        Returns:
+            bool: The flag value.
+        """
+        return bool(self.get(name, default))
+
+    def all(self: Self) -> Dict[str, Any]:
+        """Get every flag.
+
+        Returns:
+            Dict[str, Any]: parameter name --> value
+        """
+        return dict(self._values)
+
+    async def refresh_forever(self: Self) -> None:
+        """Refresh the flags every `refresh_interval` seconds."""
+        while True:
+            try:
+                await executor.run("firebase", self.refresh)
+            except Exception:
+                LOG.exception("Failed to refresh feature flags")
+
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self: Self) -> None:
+        """Start refreshing the flags in the background."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(
+                self.refresh_forever()
+            )
+
+    def stop(self: Self) -> None:
+        """Stop refreshing the flags."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+
+flags = FeatureFlags()
@@ -0,0 +1,223 @@
+"""Batch rendering of UUID images.
+
+`Generate.generate_image` renders one UUID at a time with a python loop
+per pixel. `generate_images` renders a whole batch of UUIDs as a single
+`(n, width, height, 4)` array stack and produces exactly the same
+pixels, so lists of loans can include images. `render_pngs` renders at
+most `IMAGE_RENDER_BATCH` UUIDs at a time, so the memory it needs does
+not grow with the number of UUIDs.
+"""
+import functools
+import math
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+PNG_POOL_SIZE = int(os.environ.get("PNG_POOL_SIZE", os.cpu_count() or 1))
+PNG_POOL_MIN_BATCH = int(os.environ.get("PNG_POOL_MIN_BATCH", 32))
+IMAGE_RENDER_BATCH = int(os.environ.get("IMAGE_RENDER_BATCH", 256))
+
+_png_pool = None
+
+
+@functools.lru_cache(maxsize=8)
+def _pixel_targets(width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Map every pixel to the pixel `Generate` colors when it is drawn.
+
+    Pixels inside the circle color themselves, pixels outside the circle
+    are moved to the edge of the circle. This only depends on the image
+    size, so it is computed once with the same math as `Generate`.
+
+    Args:
+        width (int): The image width.
+        height (int): The image height.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: flat target pixel index per pixel,
+            and the mask of pixels inside the circle.
+    """
+    # PIL and imageio are slow to import, load them on first use
+    from uuidtoimage.generate import Generate
+
+    radius = width / 2 if width < height else height / 2
+    center = (width // 2, height // 2)
+
+    target = np.empty((width, height), dtype=np.int64)
+    inside = np.empty((width, height), dtype=bool)
+    for x in range(width):
+        for y in range(height):
+            if Generate.distance(center[0], center[1], x, y) < radius:
+                inside[x, y] = True
+                target[x, y] = x * height + y
+            else:
+                angle = math.atan2(y - center[1], x - center[0])
+                new_x = int(center[0] + radius * math.cos(angle))
+                new_y = int(center[1] + radius * math.sin(angle))
+                inside[x, y] = False
+                target[x, y] = new_x * height + new_y
+
+    return target, inside
+
+
+def generate_images(
+        uuids: Sequence[Union[str, uuid.UUID]],
+        width: int,
+        height: int) -> np.ndarray:
+    """Render the images for many UUIDs at once.
+
+    Same output as calling `Generate.generate_image` for each UUID.
+
+    Each group of 3 hex digits draws a square of one color, and drawing
+    a pixel averages it with that color. Within a square the color is
+    constant, so it only matters how many times each pixel is drawn:
+    the draws are counted for every image in the batch at once with
+    `np.bincount`, then applied `count` times to the drawn pixels.
+
+    Args:
+        uuids (Sequence[Union[str, uuid.UUID]]): The UUIDs to render.
+        width (int): The image width.
+        height (int): The image height.
+
+    Raises:
+        ValueError: If the image is not square. `Generate` only
+            supports square images.
+
+    Returns:
+        np.ndarray: uint8 array of shape `(len(uuids), width, height, 4)`
+    """
+    if width != height:
+        raise ValueError("UUID images must be square")
+
+    target, inside = _pixel_targets(width, height)
+    count = len(uuids)
+    pixels = width * height
+
+    digits = np.array(
+        [[int(c, 16) for c in uuid.UUID(str(u)).hex] for u in uuids],
+        dtype=np.int64
+    ).reshape(count, 32)
+    # every draw is reduced mod 256, so the channels fit in a byte
+    rgb = np.zeros((count * pixels, 3), dtype=np.uint8)
+
+    xs = np.arange(width)
+    ys = np.arange(height)
+    index_type = np.int32 if count * pixels < 2 ** 31 else np.int64
+    targets = (np.arange(count, dtype=index_type) * pixels)[:, None, None] \
+        + target.astype(index_type)
+
+    for i in range(digits.shape[1] - 2):
+        red = digits[:, i] / 16
+        green = digits[:, i + 1] / 16
+        blue = digits[:, i + 2] / 16
+
+        x_loc = (red + green * width).astype(np.int64)
+        y_loc = (green + blue * height).astype(np.int64)
+        size = ((red + green + blue) * 16).astype(np.int64)
+        color = np.trunc(0xFF * np.stack(
+            [red - green * width, green, blue], axis=1
+        )).astype(np.int64)
+
+        # the square around the pixel location, per image
+        in_x = (xs >= (x_loc - size)[:, None]) & (xs < (x_loc + size)[:, None])
+        in_y = (ys >= (y_loc - size)[:, None]) & (ys < (y_loc + size)[:, None])
+        square = in_x[:, :, None] & in_y[:, None, :]
+
+        # number of times each pixel is drawn
+        draws = np.bincount(targets[square], minlength=count * pixels)
+        drawn = np.flatnonzero(draws)
+        remaining = draws[drawn]
+        drawn_color = color[drawn // pixels]
+        while drawn.size:
+            # int64 math: colors can be negative and are floor divided
+            rgb[drawn] = ((drawn_color + rgb[drawn]) // 2) % 256
+            remaining = remaining - 1
+            again = remaining > 0
+            drawn = drawn[again]
+            remaining = remaining[again]
+            drawn_color = drawn_color[again]
+
+    images = np.zeros((count, width, height, 4), dtype=np.uint8)
+    images[..., :3] = rgb.reshape(count, width, height, 3)
+    images[..., 3] = np.where(inside.T, 255, 0)
+    return images
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """Encode an image as a PNG.
+
+    Args:
+        image (np.ndarray): The image array.
+
+    Returns:
+        bytes: The PNG data.
+    """
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.fromarray(image.astype('uint8')).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _get_png_pool() -> ProcessPoolExecutor:
+    global _png_pool
+    if _png_pool is None:
+        # spawn, not fork: the server process is multi-threaded
+        _png_pool = ProcessPoolExecutor(
+            max_workers=PNG_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _png_pool
+
+
+def encode_pngs(images: np.ndarray) -> List[bytes]:
+    """Encode a stack of images as PNGs.
+
+    Large batches are spread across a process pool.
+
+    Args:
+        images (np.ndarray): The image stack.
+
+    Returns:
+        List[bytes]: The PNG data for each image.
+    """
+    if len(images) < PNG_POOL_MIN_BATCH or PNG_POOL_SIZE <= 1:
+        return [encode_png(image) for image in images]
+
+    chunksize = max(1, len(images) // (PNG_POOL_SIZE * 4))
+    return list(_get_png_pool().map(encode_png, images, chunksize=chunksize))
+
+
+def render_pngs(
+        uuids: Sequence[Union[str, uuid.UUID]],
+        width: int,
+        height: int) -> List[bytes]:
+    """Render the PNG images for many UUIDs.
+
+    The images are rendered in batches of `IMAGE_RENDER_BATCH`.
+
+    Args:
+        uuids (Sequence[Union[str, uuid.UUID]]): The UUIDs to render.
+        width (int): The image width.
+        height (int): The image height.
+
+    Returns:
+        List[bytes]: The PNG data for each UUID.
+    """
+    pngs = []
+    for start in range(0, len(uuids), IMAGE_RENDER_BATCH):
+        batch = uuids[start:start + IMAGE_RENDER_BATCH]
+        pngs.extend(encode_pngs(generate_images(batch, width, height)))
+    return pngs
+
+
+def shutdown() -> None:
+    """Stop the PNG encoding process pool."""
+    global _png_pool
+    if _png_pool is not None:
+        _png_pool.shutdown(wait=False, cancel_futures=True)
+        _png_pool = None
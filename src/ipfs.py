@@ -0,0 +1,121 @@
+"""Process-wide IPFS client registry.
+
+Every router shares the same IPFS RPC connection pool instead of
+building its own `Ipfs()`:
+
+```py
+    from src.ipfs import get_ipfs_client
+
+    ipfsclient = get_ipfs_client()
+```
+
+The pool is sized and configured in one place (the env vars below),
+and the same keep-alive connections are reused across requests.
+"""
+import logging
+import os
+import threading
+from typing import Self
+
+from ipfsclient.ipfs import Ipfs
+
+import requests
+from requests.adapters import HTTPAdapter
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+IPFS_HOST = os.environ.get("IPFS_HOST", "http://127.0.0.1")
+IPFS_PORT = int(os.environ.get("IPFS_PORT", 5001))
+IPFS_POOL_SIZE = int(os.environ.get("IPFS_POOL_SIZE", 16))
+IPFS_TIMEOUT = float(os.environ.get("IPFS_TIMEOUT", 60))
+
+
+class PooledIpfs(Ipfs):
+    """IPFS client that reuses keep-alive connections from a pool."""
+
+    def __init__(
+            self: Self,
+            host: str = IPFS_HOST,
+            port: int = IPFS_PORT,
+            version: str = "v0",
+            pool_size: int = IPFS_POOL_SIZE,
+            timeout: float = IPFS_TIMEOUT) -> None:
+        """Create a pooled IPFS client.
+
+        Args:
+            host (str, optional): IPFS server host.
+            port (int, optional): IPFS RPC port.
+            version (str, optional): IPFS rpc version. Defaults to "v0".
+            pool_size (int, optional): Max keep-alive connections.
+            timeout (float, optional): Request timeout in seconds.
+        """
+        super().__init__(host=host, port=port, version=version)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=True
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _make_request(
+            self: Self,
+            endpoint: str,
+            params: dict = None,
+            files: dict = None,
+            raise_for_status: bool = True) -> bytes:
+        """Make an http request for an IPFS RPC call on the shared session.
+
+        Args:
+            endpoint (str): The IPFS RPC endpoint
+            params (dict, optional): The RPC params. Defaults to None.
+            files (dict, optional): The RPC files. Defaults to None.
+            raise_for_status (bool, optional): If true, raise any
+                exceptions that are caught. Defaults to True.
+
+        Returns:
+            bytes: The http response data
+        """
+        url = f"{self.host}:{self.port}/api/{self.version}/{endpoint}"
+        LOG.debug("HTTP POST; url: %s params: %s", url, params)
+        response = self.session.post(
+            url, params=params, files=files, timeout=self.timeout
+        )
+        if raise_for_status:
+            response.raise_for_status()
+
+        return response.content
+
+    def close(self: Self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
+
+
+_lock = threading.Lock()
+_ipfs_client = None
+
+
+def get_ipfs_client() -> PooledIpfs:
+    """Get the process-wide IPFS client.
+
+    Returns:
+        PooledIpfs: The shared client.
+    """
+    global _ipfs_client
+    with _lock:
+        if _ipfs_client is None:
+            _ipfs_client = PooledIpfs()
+        return _ipfs_client
+
+
+def close_ipfs_client() -> None:
+    """Close the shared IPFS client."""
+    global _ipfs_client
+    with _lock:
+        client, _ipfs_client = _ipfs_client, None
+
+    if client is not None:
+        client.close()
@@ -0,0 +1,113 @@
+"""Loan status for a whole dataframe of loans at once.
+
+Same rules as `LoanStatus.loan_status`, which takes one loan at a time:
+
+- no `transaction`: DRAFT
+- accepted: ACCEPTED
+- not accepted, `offer_expiry` passed: EXPIRED_UNACCEPTED
+- not accepted, `offer_expiry` in the future: PENDING_ACCEPTANCE
+"""
+import datetime
+
+from bizlogic.loan.status import LoanStatusType
+
+import numpy as np
+
+import pandas as pd
+
+_STATUSES = {status.value: status for status in LoanStatusType}
+LOAN_STATUS_VALUES = frozenset(_STATUSES)
+
+
+def loan_status_codes(
+        df: pd.DataFrame,
+        now: datetime.datetime = None) -> np.ndarray:
+    """Get the `LoanStatusType` value of every loan.
+
+    Args:
+        df (pd.DataFrame): The loans, with `offer_expiry` and `accepted`
+            columns (and `transaction`, if any loan has one).
+        now (datetime.datetime, optional): The time to check the offer
+            expiry against. Defaults to now.
+
+    Returns:
+        np.ndarray: The status value of each row.
+    """
+    if 'transaction' not in df.columns:
+        # TODO: check if transaction is valid (same as `LoanStatus`)
+        return np.full(len(df), LoanStatusType.DRAFT.value)
+
+    now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+    has_transaction = df['transaction'].notna().to_numpy()
+    accepted = df['accepted'].fillna(False).astype(bool).to_numpy()
+    expired = (
+        pd.to_datetime(df['offer_expiry'], utc=True) <= now
+    ).to_numpy()
+
+    return np.select(
+        [~has_transaction, accepted, expired],
+        [
+            LoanStatusType.DRAFT.value,
+            LoanStatusType.ACCEPTED.value,
+            LoanStatusType.EXPIRED_UNACCEPTED.value
+        ],
+        default=LoanStatusType.PENDING_ACCEPTANCE.value
+    )
+
+
+def sorted_offer_expiry(df: pd.DataFrame) -> np.ndarray:
+    """Get the `offer_expiry` of every loan, sorted, for `count_expired`.
+
+    Args:
+        df (pd.DataFrame): The loans.
+
+    Returns:
+        np.ndarray: The offer expiry times as sorted UTC datetime64 values.
+    """
+    if df.empty or 'offer_expiry' not in df.columns:
+        return np.array([], dtype='datetime64[ns]')
+
+    expiry = pd.to_datetime(df['offer_expiry'], utc=True).dt.tz_localize(None)
+    return np.sort(expiry.to_numpy(dtype='datetime64[ns]'))
+
+
+def count_expired(
+        offer_expiry: np.ndarray,
+        now: datetime.datetime = None) -> int:
+    """Count the offers that have expired, with a binary search.
+
+    The statuses of a set of loans only change over time when an offer
+    expires, so this count versions the statuses together with the loans.
+
+    Args:
+        offer_expiry (np.ndarray): From `sorted_offer_expiry`.
+        now (datetime.datetime, optional): The time to check the offer
+            expiry against. Defaults to now.
+
+    Returns:
+        int: The number of offers with `offer_expiry <= now`.
+    """
+    now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+    if now.tzinfo is not None:
+        now = now.tz_convert('UTC').tz_localize(None)
+    return int(np.searchsorted(
+        offer_expiry, now.to_datetime64(), side='right'
+    ))
+
+
+def loan_statuses(
+        df: pd.DataFrame,
+        now: datetime.datetime = None) -> pd.Series:
+    """Get the `LoanStatusType` of every loan.
+
+    Args:
+        df (pd.DataFrame): The loans.
+        now (datetime.datetime, optional): The time to check the offer
+            expiry against. Defaults to now.
+
+    Returns:
+        pd.Series: The status of each row, aligned with `df`.
+    """
+    return pd.Series(
+        loan_status_codes(df, now), index=df.index
+    ).map(_STATUSES)
@@ -1,21 +1,43 @@
 """Main."""
+import asyncio
 import logging
 import os
 from pathlib import Path
+from typing import Awaitable, Callable, Dict
+
+from bizlogic.utils import ParserType
 
 from dotenv import load_dotenv
 
-from fastapi import FastAPI
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from firebase_admin import credentials, initialize_app
-
-import src.utils
+import src.auth
+import src.image_render
+from src import uuid_images
+from src.events import broker
+from src.executor import executor
+from src.firestore import get_db
+from src.flags import flags
+from src.ipfs import close_ipfs_client
 from src.routes.application import LoanApplicationRouter
+from src.routes.changes import ChangeRouter
+from src.routes.events import EventRouter
+from src.routes.image import ImageRouter
 from src.routes.loan import LoanRouter
 from src.routes.nano import NanoRouter
 from src.routes.sumsub import SumsubRouter
 from src.routes.vouch import VouchRouter
+from src.store_index import get_store_index, start_index_refresh, stop_index_refresh  # noqa: E501
+from src.sumsub import close_sumsub_client
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+INIT_RETRY_SECONDS = float(os.environ.get("INIT_RETRY_SECONDS", 5))
+# the app is not ready to take traffic until these are initialized
+REQUIRED_INIT_STEPS = ("firebase", "firestore", "ipfs")
 
 app = FastAPI()
 
@@ -37,9 +59,13 @@ app.add_middleware(
 )
 
 
-@app.on_event("startup")
-async def startup_firebase() -> None:
-    """Initialize firebase app."""
+def initialize_firebase() -> None:
+    """Initialize firebase app.
+
+    This is blocking, run it with the executor.
+    """
+    from firebase_admin import credentials, initialize_app
+
     # firebase auth credentials
     load_dotenv(Path(os.environ['SECRETS_PATH'] + "/.env.nanoswap"))
 
@@ -49,15 +75,20 @@ async def startup_firebase() -> None:
     # Use the service account to authenticate
     initialize_app(cred)
 
-@app.on_event("startup")
-async def startup_feature_store() -> None:
-    """Initialize feature store."""
-    # feature store config
-    src.utils.get_config()
 
+async def startup_firebase() -> None:
+    """Initialize firebase, then the services that need its credentials."""
+    await executor.run("firebase", initialize_firebase)
+
+    # Keep the ID token signing certificates fetched
+    if os.environ.get('NODE_ENV') != 'development':
+        src.auth.start_certificate_refresh()
 
-@app.on_event("startup")
-async def startup_router() -> None:
+    # feature flags load in the background, nothing waits on them
+    flags.start()
+
+
+def startup_router() -> None:
     """Add routes."""
     # add loan routes
     LoanApplicationRouter(app)
@@ -65,10 +96,12 @@ async def startup_router() -> None:
     VouchRouter(app)
     SumsubRouter(app)
     NanoRouter(app)
+    ImageRouter(app)
+    ChangeRouter(app)
+    EventRouter(app)
 
 
-@app.on_event("startup")
-async def startup_logger() -> None:
+def startup_logger() -> None:
     """Initialize logger."""
     logger = logging.getLogger("uvicorn.access")
     handler = logging.StreamHandler()
@@ -78,3 +111,158 @@ async def startup_logger() -> None:
         )
     )
     logger.addHandler(handler)
+
+
+readiness: Dict[str, str] = {}
+
+
+async def run_init_step(
+        name: str,
+        step: Callable[[], Awaitable],
+        retry: bool = True) -> bool:
+    """Run an initialization step and record its state in `readiness`.
+
+    Args:
+        name (str): The name of the step.
+        step (Callable[[], Awaitable]): The step.
+        retry (bool, optional): Retry every `INIT_RETRY_SECONDS` until
+            the step succeeds.
+
+    Returns:
+        bool: True if the step succeeded.
+    """
+    readiness[name] = "pending"
+    while True:
+        try:
+            await step()
+            readiness[name] = "ready"
+            return True
+        except Exception:
+            LOG.exception("Failed to initialize %s", name)
+            readiness[name] = "failed"
+            if not retry:
+                return False
+
+        await asyncio.sleep(INIT_RETRY_SECONDS)
+
+
+async def initialize_firebase_services() -> None:
+    """Initialize firebase, then the firestore client (it needs the env)."""
+    await run_init_step("firebase", startup_firebase)
+    await run_init_step(
+        "firestore", lambda: executor.run("firebase", get_db)
+    )
+
+
+async def initialize() -> None:
+    """Initialize the clients, independent steps run concurrently."""
+    await asyncio.gather(
+        initialize_firebase_services(),
+        run_init_step(
+            "ipfs", lambda: executor.run("ipfs", uuid_images.prepare_cdn)
+        ),
+        # warm up only, requests load the index on demand anyway
+        run_init_step(
+            "loan_index",
+            lambda: get_store_index(ParserType.LOAN).snapshot(),
+            retry=False
+        ),
+    )
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    """Add the routes and start initializing in the background.
+
+    The server takes connections right away, `/ready` reports when
+    the initialization is done.
+    """
+    startup_logger()
+    startup_router()
+    app.state.init_task = asyncio.create_task(initialize())
+    # read the records written by the other replicas
+    start_index_refresh()
+
+
+@app.get("/ready", response_model=dict)
+async def ready() -> JSONResponse:
+    """Check if the app is initialized and can take traffic.
+
+    Returns:
+        JSONResponse: 200 when ready, 503 otherwise, with the state of
+            each initialization step.
+    """
+    is_ready = all(
+        readiness.get(step) == "ready" for step in REQUIRED_INIT_STEPS
+    )
+    return JSONResponse(
+        {"ready": is_ready, "steps": readiness},
+        status_code=status.HTTP_200_OK if is_ready
+        else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_init() -> None:
+    """Stop initializing, if it is still running."""
+    init_task = getattr(app.state, "init_task", None)
+    if init_task is not None:
+        init_task.cancel()
+
+
+@app.on_event("shutdown")
+async def shutdown_feature_store() -> None:
+    """Stop refreshing the feature flags."""
+    flags.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_store_indexes() -> None:
+    """Stop refreshing the store indexes."""
+    stop_index_refresh()
+
+
+@app.on_event("shutdown")
+async def shutdown_auth() -> None:
+    """Stop refreshing the ID token signing certificates."""
+    src.auth.stop_certificate_refresh()
+
+
+@app.on_event("shutdown")
+async def shutdown_events() -> None:
+    """End the event streams."""
+    broker.close()
+
+
+@app.on_event("shutdown")
+async def shutdown_executor() -> None:
+    """Stop the blocking call executor."""
+    executor.shutdown()
+
+
+@app.on_event("shutdown")
+async def shutdown_image_render() -> None:
+    """Stop the PNG encoding process pool."""
+    src.image_render.shutdown()
+
+
+@app.on_event("shutdown")
+async def shutdown_ipfs() -> None:
+    """Close the shared IPFS connection pool."""
+    close_ipfs_client()
+
+
+@app.on_event("shutdown")
+async def shutdown_sumsub() -> None:
+    """Close the shared Sumsub connection pool."""
+    await close_sumsub_client()
+
+
+@app.get("/metrics/executor", response_model=dict)
+async def executor_metrics() -> dict:
+    """Get the queue depth metrics for each blocking downstream.
+
+    Returns:
+        dict: downstream name --> waiting/in flight/completed counts
+    """
+    return executor.stats()
@@ -0,0 +1,122 @@
+"""Cursor based pagination for list endpoints.
+
+Rows are ordered by (`created`, object id), which never changes for a
+record, so a cursor keeps pointing at the same place while new rows
+are added. The cursor for the next page is returned in the
+`X-Next-Cursor` header and is opaque to clients.
+"""
+import base64
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+
+import pandas as pd
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 1000))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created: pd.Timestamp, object_id: str) -> str:
+    """Encode the position after a row as an opaque cursor.
+
+    Args:
+        created (pd.Timestamp): The `created` value of the row.
+        object_id (str): The id of the row.
+
+    Returns:
+        str: The cursor.
+    """
+    data = json.dumps({
+        "created": pd.Timestamp(created).isoformat(),
+        "id": str(object_id)
+    })
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[pd.Timestamp, str]:
+    """Decode a cursor from `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+
+    Returns:
+        Tuple[pd.Timestamp, str]: The `created` value and id of the row
+            the cursor points after.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return pd.Timestamp(data["created"]), data["id"]
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def paginate(
+        df: pd.DataFrame,
+        id_column: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None) -> Tuple[pd.DataFrame, Optional[str]]:
+    """Get one page of rows ordered by (`created`, `id_column`).
+
+    Args:
+        df (pd.DataFrame): All the rows.
+        id_column (str): The object id column, ex: "loan".
+        limit (int, optional): The page size. If neither `limit` nor
+            `cursor` are set, every row is returned.
+        cursor (str, optional): The cursor from the previous page.
+
+    Returns:
+        Tuple[pd.DataFrame, Optional[str]]: The page and the cursor for
+            the next page (None on the last page).
+    """
+    if limit is None and cursor is None:
+        return df, None
+    if df.empty:
+        return df, None
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    df = df.sort_values(['created', id_column], kind='stable')
+
+    if cursor is not None:
+        created, object_id = decode_cursor(cursor)
+        df = df[
+            (df['created'] > created) |
+            ((df['created'] == created) & (df[id_column] > object_id))
+        ]
+
+    page = df.head(limit)
+    if len(df) <= limit:
+        return page, None
+
+    last = page.iloc[-1]
+    return page, encode_cursor(last['created'], last[id_column])
+
+
+def next_cursor_headers(next_cursor: Optional[str]) -> Dict[str, str]:
+    """Get the headers that tell the client where the next page starts.
+
+    Args:
+        next_cursor (Optional[str]): The cursor, None on the last page.
+
+    Returns:
+        Dict[str, str]: The headers.
+    """
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """Tell the client where the next page starts.
+
+    Args:
+        response (Response): The response to add the header to.
+        next_cursor (Optional[str]): The cursor, None on the last page.
+    """
+    response.headers.update(next_cursor_headers(next_cursor))
@@ -0,0 +1,183 @@
+"""Response classes for large list endpoints.
+
+The rows are serialized with the same JSON format as the pydantic
+response models: datetimes are ISO 8601 with microseconds (and no
+fraction when it is 0), and `/` is not escaped.
+"""
+import json
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Self
+
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+
+import numpy as np
+
+import pandas as pd
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_CHUNK_SIZE = 500
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize values the json module can not convert on its own."""
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def _dumps(value: Any) -> str:
+    """Serialize to JSON like `JSONResponse`."""
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_json_default
+    )
+
+
+def _iso_datetimes(values: pd.Series) -> List[Any]:
+    """Format a datetime column like pydantic, column-wise.
+
+    Args:
+        values (pd.Series): The datetimes.
+
+    Returns:
+        List[Any]: The ISO 8601 strings, None for missing values.
+    """
+    suffix = ''
+    if values.dt.tz is not None:
+        if str(values.dt.tz) != 'UTC':
+            return [
+                None if pd.isna(value) else value.isoformat(
+                    timespec='auto'
+                ) for value in values.dt.floor('us')
+            ]
+        values = values.dt.tz_convert(None)
+        suffix = 'Z'
+
+    formatted = np.datetime_as_string(
+        values.to_numpy(dtype='datetime64[us]'), unit='us'
+    )
+    # pydantic leaves out the fraction when it is 0
+    formatted = np.char.replace(formatted, '.000000', '')
+    if suffix:
+        formatted = np.char.add(formatted, suffix)
+
+    return [
+        None if missing else value
+        for value, missing in zip(formatted.tolist(), values.isna().tolist())
+    ]
+
+
+def _to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert the rows to JSON compatible dicts, column by column.
+
+    Args:
+        df (pd.DataFrame): The rows.
+
+    Returns:
+        List[Dict[str, Any]]: One dict per row.
+    """
+    columns = []
+    for _, values in df.items():
+        if pd.api.types.is_datetime64_any_dtype(values):
+            columns.append(_iso_datetimes(values))
+        elif values.hasnans:
+            columns.append(
+                values.astype(object).where(values.notna(), None).tolist()
+            )
+        else:
+            columns.append(values.tolist())
+
+    names = list(df.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Check if the client asked for a newline delimited JSON stream.
+
+    Args:
+        request (Request): The request.
+
+    Returns:
+        bool: True if the `Accept` header includes `application/x-ndjson`.
+    """
+    return NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def not_modified(etag: str) -> Response:
+    """Tell the client its copy of the response is still current.
+
+    Args:
+        etag (str): The ETag the client sent in `If-None-Match`.
+
+    Returns:
+        Response: An empty `304 Not Modified` response.
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag}
+    )
+
+
+def iter_ndjson(
+        df: pd.DataFrame,
+        chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Serialize a dataframe as newline delimited JSON, chunk by chunk.
+
+    Args:
+        df (pd.DataFrame): The rows.
+        chunk_size (int, optional): Rows serialized at a time.
+
+    Yields:
+        Iterator[bytes]: One JSON object per line.
+    """
+    for start in range(0, len(df), chunk_size):
+        records = _to_records(df.iloc[start:start + chunk_size])
+        yield ''.join(
+            _dumps(record) + '\n' for record in records
+        ).encode('utf-8')
+
+
+class DataFrameJSONResponse(JSONResponse):
+    """Serialize the rows of a dataframe as a JSON array.
+
+    Converts the columns to JSON types with pandas instead of validating
+    every row against the response model. The dataframe must already
+    match the response model, see `RouterUtils.sanitize_output`.
+    """
+
+    def render(self: Self, content: pd.DataFrame) -> bytes:
+        """Serialize the dataframe.
+
+        Args:
+            content (pd.DataFrame): The rows.
+
+        Returns:
+            bytes: The JSON array.
+        """
+        if content.empty:
+            return b"[]"
+
+        return _dumps(_to_records(content)).encode('utf-8')
+
+
+class NDJSONResponse(StreamingResponse):
+    """Stream the rows of a dataframe as newline delimited JSON.
+
+    Rows are written as they are serialized, without building the full
+    list or validating it against a response model first.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    def __init__(self: Self, df: pd.DataFrame, **kwargs: Any) -> None:
+        """Create a streaming response.
+
+        Args:
+            df (pd.DataFrame): The rows to stream.
+            **kwargs (Any): Passed on to `StreamingResponse`.
+        """
+        super().__init__(iter_ndjson(df), **kwargs)
@@ -1,15 +1,23 @@
 """Application Routes."""
+import asyncio
 import logging
-from typing import List, Self, Union
+from typing import List, Optional, Self, Union
 
-from bizlogic.application import LoanApplicationReader, LoanApplicationWriter
-from bizlogic.utils import ParserType, Utils
+from bizlogic.application import LoanApplicationWriter
+from bizlogic.utils import GROUP_BY, ParserType, Utils
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 
-from ipfsclient.ipfs import Ipfs
+import pandas as pd
 
-from src.schemas import LoanApplication, SuccessOrFailureResponse
+from src.batch import check_batch_size, failure, run_batch
+from src.executor import executor
+from src.ipfs import get_ipfs_client
+from src.pagination import MAX_PAGE_SIZE, next_cursor_headers, paginate
+from src.responses import DataFrameJSONResponse, NDJSONResponse, not_modified, wants_ndjson  # noqa: E501
+from src.schemas import BatchItemResponse, LoanApplication, SuccessOrFailureResponse, WithdrawApplicationsRequest  # noqa: E501
+from src.store_index import get_store_index
+from src.trust_score import get_trust_scores
 from src.utils import RouterUtils
 
 LOG = logging.getLogger(__name__)
@@ -25,8 +33,114 @@ class LoanApplicationRouter():
         Args:
             app (FastAPI): Routes will be added to this app.
         """
-        ipfsclient = Ipfs()
-        loan_application_reader = LoanApplicationReader(ipfsclient)
+        ipfsclient = get_ipfs_client()
+        application_index = get_store_index(ParserType.LOAN_APPLICATION)
+        vouch_index = get_store_index(ParserType.VOUCH)
+        trust_scores = get_trust_scores()
+        group_by = GROUP_BY[ParserType.LOAN_APPLICATION]
+
+        async def create_application(
+                application: LoanApplication,
+                user: str) -> str:
+            """Write a new loan application.
+
+            Args:
+                application (LoanApplication): The application.
+                user (str): The borrower.
+
+            Returns:
+                str: The application id.
+            """
+            loan_application_writer = LoanApplicationWriter(
+                ipfsclient,
+                user,
+                application.asking
+            )
+            await executor.run("ipfs", loan_application_writer.write)
+            application_index.record(
+                loan_application_writer.index,
+                loan_application_writer.data
+            )
+            return loan_application_writer.application_id
+
+        def find_application(application: str) -> Optional[pd.Series]:
+            """Get the most recent record of an application, in O(1).
+
+            Args:
+                application (str): The application id.
+
+            Returns:
+                Optional[pd.Series]: The record, None if there is none.
+            """
+            by_id = application_index.view(
+                "by_id",
+                lambda df: df if df.empty else
+                df.sort_values('created').groupby(group_by).last()
+            )
+            if application not in by_id.index:
+                return None
+            return by_id.loc[application]
+
+        async def withdraw(application: str, user: str) -> None:
+            """Close an application of the user with one IPFS write.
+
+            Args:
+                application (str): The application id.
+                user (str): The user withdrawing the application.
+
+            Raises:
+                HTTPException: If the application does not exist or
+                    belongs to another user.
+            """
+            record = find_application(application)
+            if record is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Application {application} not found"
+                )
+            if record['borrower'] != user:
+                raise HTTPException(
+                    status_code=403,
+                    detail=f"Application {application} belongs to another user"  # noqa: E501
+                )
+            if record['closed']:
+                return
+
+            loan_application_writer = LoanApplicationWriter(
+                ipfsclient,
+                user,
+                int(record['amount_asking'])
+            )
+            # write the update to the existing application
+            loan_application_writer.application_id = application
+            await executor.run(
+                "ipfs", loan_application_writer.withdraw_loan_application
+            )
+            application_index.record(
+                loan_application_writer.index,
+                loan_application_writer.data
+            )
+
+        def open_applications(recent: bool) -> pd.DataFrame:
+            """Get the records of the applications that are still open.
+
+            Args:
+                recent (bool): Only get the most recent record of each
+                    application, instead of every change (CDC).
+
+            Returns:
+                pd.DataFrame: The records.
+            """
+            latest = application_index.latest(group_by)
+            if latest.empty:
+                return latest
+            if recent:
+                return latest[~latest['closed']]
+
+            history = application_index.frame()
+            return history[history[group_by].isin(
+                latest.loc[~latest['closed'], group_by]
+            )]
 
         # Loan application endpoints
 
@@ -44,12 +158,7 @@ class LoanApplicationRouter():
                 SuccessOrFailureResponse: `success=True` when successful.
             """
             try:
-                loan_application_writer = LoanApplicationWriter(
-                    ipfsclient,
-                    user,
-                    application.asking
-                )
-                loan_application_writer.write()
+                await create_application(application, user)
                 return SuccessOrFailureResponse(
                     success=True
                 )
@@ -61,43 +170,107 @@ class LoanApplicationRouter():
                     error_type=type(e).__name__
                 )
 
+        @app.post(
+            "/loan/application/bulk",
+            response_model=List[BatchItemResponse]
+        )
+        async def submit_loan_applications(
+            applications: List[LoanApplication],
+            user: str = Depends(RouterUtils.get_user_token)
+        ) -> List[BatchItemResponse]:
+            """Create many loan applications at once.
+
+            Args:
+                applications (List[LoanApplication]): The applications.
+
+            Returns:
+                List[BatchItemResponse]: The result for each application,
+                    in the same order, with the id of the application.
+            """
+            check_batch_size(applications)
+            return await run_batch(
+                applications,
+                lambda application: create_application(application, user)
+            )
+
         @app.get(
             "/loan/application",
             response_model=List
         )
         async def get_all_loan_applications(
-            recent: bool = False,
+            request: Request,
+            recent: bool = True,
+            score: bool = False,
+            limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+            cursor: Optional[str] = None,
             user: str = Depends(RouterUtils.get_user_token)
         ) -> List:
             """Get all loan applications.
 
             Args:
-                recent (bool, optional): Use CDC or only get the most recent.
-                    Defaults to False.
+                recent (bool, optional): Only get the most recent record of
+                    each application, False for every change (CDC).
+                    Defaults to True.
+                score (bool, optional): Add the `trust_score` of the
+                    borrower, see `/vouch/score`. Defaults to False.
+                limit (int, optional): Page size. Defaults to every
+                    application.
+                cursor (str, optional): The `X-Next-Cursor` header from the
+                    previous page.
 
             Returns:
                 List: _description_
             """
-            return loan_application_reader.query_loan_applications(open_only=True).to_dict(orient="records")
+            # served from memory, the index refreshes from IPFS incrementally
+            await application_index.snapshot()
+            version = application_index.version
+            if score:
+                # the scores change with the vouches
+                await vouch_index.snapshot()
+                version = f"{version}:{vouch_index.version}"
+            etag = RouterUtils.make_etag(
+                version, recent, score, limit, cursor, wants_ndjson(request)
+            )
+            if RouterUtils.etag_matches(request, etag):
+                return not_modified(etag)
+
+            results = open_applications(recent)
+            results, next_cursor = paginate(results, group_by, limit, cursor)
+            if score and not results.empty:
+                await executor.run("cpu", trust_scores.refresh)
+                results = results.assign(
+                    trust_score=trust_scores.scores(results['borrower'])
+                )
+            results = RouterUtils.sanitize_output(results)
+            headers = {"ETag": etag, **next_cursor_headers(next_cursor)}
+            if wants_ndjson(request):
+                return NDJSONResponse(results, headers=headers)
+
+            return DataFrameJSONResponse(results, headers=headers)
 
         @app.get(
             "/loan/application/user/self",
             response_model=List
         )
         async def get_my_loan_applications(
-            recent: bool = False,
+            recent: bool = True,
             user: str = Depends(RouterUtils.get_user_token)
         ) -> List:
             """Get my loan applications.
 
             Args:
-                recent (bool, optional): Use CDC or only get the most recent.
-                    Defaults to False.
+                recent (bool, optional): Only get the most recent record of
+                    each application, False for every change (CDC).
+                    Defaults to True.
 
             Returns:
                 List: _description_
             """
-            return loan_application_reader.query_loan_applications(borrower=user).to_dict(orient="records")  # noqa: E501
+            await application_index.snapshot()
+            results = open_applications(recent)
+            if not results.empty:
+                results = results[results['borrower'] == user]
+            return DataFrameJSONResponse(RouterUtils.sanitize_output(results))
 
         @app.get(
             "/loan/application/user/other",
@@ -105,20 +278,25 @@ class LoanApplicationRouter():
         )
         async def get_their_loan_applications(
             them: str,
-            recent: bool = False,
+            recent: bool = True,
             user: str = Depends(RouterUtils.get_user_token)
         ) -> List:
             """Get their loan applications.
 
             Args:
                 them (str): The user whose applications to get.
-                recent (bool, optional): Use CDC or only get the most recent.
-                    Defaults to False.
+                recent (bool, optional): Only get the most recent record of
+                    each application, False for every change (CDC).
+                    Defaults to True.
 
             Returns:
                 List: _description_
             """
-            return loan_application_reader.query_loan_applications(borrower=them).to_dict(orient="records")  # noqa: E501
+            await application_index.snapshot()
+            results = open_applications(recent)
+            if not results.empty:
+                results = results[results['borrower'] == them]
+            return DataFrameJSONResponse(RouterUtils.sanitize_output(results))
 
         @app.delete(
             "/loan/application/{application}",
@@ -136,28 +314,14 @@ class LoanApplicationRouter():
             Returns:
                 SuccessOrFailureResponse: `success=True` when successful.
             """
+            await application_index.snapshot()
             try:
-                # query to get the application data
-                results = loan_application_reader.get_loan_application(user)  # noqa: E501
-
-                # TODO: get the specific application
-
-                # parse the results
-                for result in results:
-                    loan_application_writer = LoanApplicationWriter(
-                        ipfsclient,
-                        user,
-                        result.reader.amount_asking,
-                        result.reader.closed
-                    )
-
-                    # withdraw the application
-                    loan_application_writer.withdraw_loan_application()
-                    loan_application_writer.write()
-
+                await withdraw(application, user)
                 return SuccessOrFailureResponse(
                     success=True
                 )
+            except HTTPException:
+                raise
             except Exception as e:
                 LOG.exception(e)
                 return SuccessOrFailureResponse(
@@ -165,3 +329,39 @@ class LoanApplicationRouter():
                     error_message=str(e),
                     error_type=type(e).__name__
                 )
+
+        @app.post(
+            "/loan/application/withdraw",
+            response_model=List[BatchItemResponse]
+        )
+        async def withdraw_loan_applications(
+            batch: WithdrawApplicationsRequest,
+            user: str = Depends(RouterUtils.get_user_token)
+        ) -> List[BatchItemResponse]:
+            """Withdraw many loan applications at once.
+
+            The applications are written in parallel, bounded by the IPFS
+            executor limit. Each one succeeds or fails on its own.
+
+            Args:
+                batch (WithdrawApplicationsRequest): The applications.
+
+            Returns:
+                List[BatchItemResponse]: The result for each application,
+                    in the same order.
+            """
+            check_batch_size(batch.applications)
+            await application_index.snapshot()
+
+            # withdraw each application once, even if it is listed twice
+            applications = list(dict.fromkeys(batch.applications))
+            errors = dict(zip(applications, await asyncio.gather(
+                *(withdraw(application, user) for application in applications),  # noqa: E501
+                return_exceptions=True
+            )))
+            return [
+                BatchItemResponse(index=index, id=application, success=True)
+                if errors[application] is None else
+                failure(index, errors[application], application)
+                for index, application in enumerate(batch.applications)
+            ]
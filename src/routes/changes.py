@@ -0,0 +1,94 @@
+"""Change Feed Routes."""
+import logging
+from collections import defaultdict
+from typing import List, Optional, Self
+
+from bizlogic.utils import GROUP_BY
+
+from fastapi import Depends, FastAPI, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.changes import change_log
+from src.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, next_cursor_headers  # noqa: E501
+from src.schemas import ChangeResponse
+from src.store_index import STORE_INDEXES, get_store_index
+from src.utils import RouterUtils
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+
+class ChangeRouter():
+    """Change Feed Router."""
+
+    def __init__(self: Self, app: FastAPI) -> None:
+        """Add routes for the change feed.
+
+        Args:
+            app (FastAPI): Routes will be added to this app.
+        """
+        indexes = {
+            parser_type: get_store_index(parser_type)
+            for parser_type in STORE_INDEXES
+        }
+
+        @app.get(
+            "/changes",
+            response_model=List[ChangeResponse]
+        )
+        async def get_changes(
+            since: Optional[str] = None,
+            limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+            user: str = Depends(RouterUtils.get_user_token)
+        ) -> List[ChangeResponse]:
+            """Get the loans, applications and vouches added since a cursor.
+
+            Every record is a change: updates to a loan, application or
+            vouch are new records for the same object id. Cursors can be
+            resumed on any replica. The newest changes can be sent again
+            on the next call, see `src.changes`.
+
+            Args:
+                since (str, optional): The `X-Next-Cursor` header from the
+                    previous call. Defaults to the start of the log.
+                limit (int, optional): Max number of changes.
+
+            Returns:
+                List[ChangeResponse]: The changes, oldest first. The
+                    `X-Next-Cursor` header is always set, pass it as
+                    `since` to get the next changes.
+            """
+            for index in indexes.values():
+                await index.snapshot()
+
+            changes, next_key = change_log.read(
+                indexes, change_log.decode_cursor(since), limit
+            )
+
+            # look up the changed rows, one batch per record type
+            rows = defaultdict(list)
+            for _, parser_type, row in changes:
+                rows[parser_type].append(row)
+
+            records = {}
+            for parser_type, positions in rows.items():
+                frame = indexes[parser_type].frame().iloc[positions]
+                frame = RouterUtils.sanitize_output(frame)
+                records[parser_type] = iter(frame.to_dict(orient='records'))
+
+            results = [
+                {
+                    "cursor": change_log.encode_cursor(key),
+                    "kind": GROUP_BY[parser_type],
+                    "record": next(records[parser_type])
+                }
+                for key, parser_type, _ in changes
+            ]
+
+            return JSONResponse(
+                jsonable_encoder(results),
+                headers=next_cursor_headers(
+                    change_log.encode_cursor(next_key)
+                )
+            )
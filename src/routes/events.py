@@ -0,0 +1,192 @@
+"""Event Stream Routes."""
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Dict, FrozenSet, Optional, Self, Tuple
+
+from bizlogic.utils import GROUP_BY
+
+from fastapi import Depends, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, status  # noqa: E501
+from fastapi.responses import StreamingResponse
+
+from src.changes import change_log
+from src.events import TOPICS, Subscription, broker
+from src.utils import RouterUtils
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+KINDS = frozenset(GROUP_BY.values())
+
+
+def parse_filters(
+        kind: Optional[str],
+        params: Dict[str, str]) -> Tuple[Optional[FrozenSet[str]], Dict[str, str]]:  # noqa: E501
+    """Get the subscription filters from the query parameters.
+
+    Args:
+        kind (Optional[str]): Comma separated types of records,
+            ex: "loan,vouch".
+        params (Dict[str, str]): The query parameters.
+
+    Raises:
+        HTTPException: If a type of record is unknown.
+
+    Returns:
+        Tuple[Optional[FrozenSet[str]], Dict[str, str]]: The kinds and
+            the topics for `EventBroker.subscribe`.
+    """
+    kinds = None
+    if kind:
+        kinds = frozenset(value.strip() for value in kind.split(","))
+        if not kinds <= KINDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown kind, expected one of {sorted(KINDS)}"
+            )
+
+    topics = {key: params[key] for key in TOPICS if params.get(key)}
+    return kinds, topics
+
+
+async def iter_sse(subscription: Subscription) -> AsyncIterator[bytes]:
+    """Write the events of a subscription as server-sent events.
+
+    The `id` of each event is the `/changes` cursor after it, so clients
+    can catch up on what they missed while disconnected.
+
+    Args:
+        subscription (Subscription): The subscription.
+
+    Yields:
+        bytes: The events, and comments to keep the connection alive.
+    """
+    try:
+        async for event in subscription.events():
+            if event is None:
+                yield b": keep-alive\n\n"
+                continue
+
+            yield (
+                f"id: {event['cursor']}\n"
+                f"event: {event['kind']}\n"
+                f"data: {json.dumps(event)}\n\n"
+            ).encode('utf-8')
+    finally:
+        broker.unsubscribe(subscription)
+
+
+class EventRouter():
+    """Event Stream Router."""
+
+    def __init__(self: Self, app: FastAPI) -> None:
+        """Add routes for the event streams.
+
+        Args:
+            app (FastAPI): Routes will be added to this app.
+        """
+        change_log.add_listener(broker.publish_changes)
+
+        @app.get(
+            "/events",
+            response_class=StreamingResponse,
+            responses={200: {"content": {SSE_MEDIA_TYPE: {}}}}
+        )
+        async def stream_events(
+            request: Request,
+            kind: Optional[str] = None,
+            borrower: Optional[str] = None,
+            lender: Optional[str] = None,
+            voucher: Optional[str] = None,
+            vouchee: Optional[str] = None,
+            user: str = Depends(RouterUtils.get_user_token)
+        ) -> StreamingResponse:
+            """Stream new loans, applications and vouches as server-sent events.
+
+            Args:
+                kind (str, optional): Comma separated types of records to
+                    receive: `loan`, `application` or `vouch`. Defaults to
+                    every type.
+                borrower (str, optional): Only receive records of this
+                    borrower.
+                lender (str, optional): Only receive records of this lender.
+                voucher (str, optional): Only receive vouches by this user.
+                vouchee (str, optional): Only receive vouches for this user.
+
+            Returns:
+                StreamingResponse: The event stream. Each event has the
+                    same fields as a `/changes` entry.
+            """
+            kinds, topics = parse_filters(kind, request.query_params)
+            subscription = broker.subscribe(kinds, topics)
+            return StreamingResponse(
+                iter_sse(subscription),
+                media_type=SSE_MEDIA_TYPE,
+                headers={"Cache-Control": "no-cache"}
+            )
+
+        @app.websocket("/events")
+        async def websocket_events(
+            websocket: WebSocket,
+            kind: Optional[str] = None,
+            token: Optional[str] = None
+        ) -> None:
+            """Stream new loans, applications and vouches over a WebSocket.
+
+            Takes the same filters as the server-sent events stream. The
+            ID token is passed as the `token` query parameter or as a
+            bearer `Authorization` header. Each message is one event as
+            JSON.
+
+            Args:
+                websocket (WebSocket): The connection.
+                kind (str, optional): Comma separated types of records.
+                token (str, optional): The Firebase ID token.
+            """
+            authorization = websocket.headers.get('authorization', '')
+            if token is None and authorization.lower().startswith('bearer '):
+                token = authorization[len('bearer '):]
+            try:
+                if not token:
+                    raise ValueError("Bearer authentication is needed")
+                RouterUtils.user_from_token(token, websocket.headers)
+                kinds, topics = parse_filters(kind, websocket.query_params)
+            except Exception as err:
+                LOG.debug("Refused event stream: %s", err)
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+
+            await websocket.accept()
+            subscription = broker.subscribe(kinds, topics)
+
+            async def send_events() -> None:
+                async for event in subscription.events():
+                    if event is not None:
+                        await websocket.send_json(event)
+
+            sender = asyncio.create_task(send_events())
+            stopped = False
+            try:
+                # the client does not send anything, wait for it to leave
+                while True:
+                    receiver = asyncio.create_task(websocket.receive())
+                    done, _ = await asyncio.wait(
+                        {sender, receiver},
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if sender in done:
+                        receiver.cancel()
+                        stopped = sender.exception() is None
+                        break
+                    if receiver.result()["type"] == "websocket.disconnect":
+                        break
+            except WebSocketDisconnect:
+                pass
+            finally:
+                sender.cancel()
+                broker.unsubscribe(subscription)
+
+            if stopped:
+                # the subscription fell behind (or the server is stopping)
+                await websocket.close()
@@ -0,0 +1,80 @@
+"""Image Routes."""
+import hashlib
+import logging
+import os
+import uuid
+from typing import Self, Tuple
+
+from fastapi import FastAPI, HTTPException, Request, Response, status
+
+from src.cache import LRUCache
+from src.executor import executor
+from src.utils import RouterUtils
+from src.uuid_images import render_uuid_image
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+IMAGE_CACHE_SIZE = int(os.environ.get("IMAGE_CACHE_SIZE", 4096))
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class ImageRouter():
+    """Image Router."""
+
+    def __init__(self: Self, app: FastAPI) -> None:
+        """Add routes for UUID images.
+
+        Args:
+            app (FastAPI): Routes will be added to this app.
+        """
+        image_cache = LRUCache(IMAGE_CACHE_SIZE)
+
+        def render(image_id: str) -> Tuple[str, bytes]:
+            png = render_uuid_image(image_id)
+            etag = f'"{hashlib.sha256(png).hexdigest()}"'
+            return etag, png
+
+        @app.get(
+            "/image/{image_id}.png",
+            response_class=Response,
+            responses={200: {"content": {"image/png": {}}}}
+        )
+        async def get_uuid_image(image_id: str, request: Request) -> Response:
+            """Get the image for a UUID.
+
+            The image only depends on the UUID, so it can be cached forever
+            by browsers and CDNs.
+
+            Args:
+                image_id (str): The UUID of the loan or payment.
+
+            Returns:
+                Response: The PNG image.
+            """
+            try:
+                image_id = str(uuid.UUID(image_id))
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Image not found"
+                )
+
+            cached = image_cache.get(image_id)
+            if cached is None:
+                cached = await executor.run("cpu", render, image_id)
+                image_cache.set(image_id, cached)
+            etag, png = cached
+
+            headers = {"ETag": etag, "Cache-Control": IMMUTABLE}
+            if RouterUtils.etag_matches(request, etag):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers=headers
+                )
+
+            return Response(
+                content=png,
+                media_type="image/png",
+                headers=headers
+            )
@@ -1,7 +1,7 @@
 """Loan Routes."""
 import datetime
 import logging
-from typing import List, Self, Union
+from typing import List, Optional, Self, Union
 import os
 
 from bizlogic.loan.reader import LoanReader
@@ -9,17 +9,24 @@ from bizlogic.loan.repayment import PaymentSchedule
 from bizlogic.loan.status import LoanStatusType, LoanStatus
 from bizlogic.loan.writer import LoanWriter
 from bizlogic.protoc.loan_pb2 import Loan, LoanPayment
-from bizlogic.utils import ParserType, Utils
+from bizlogic.utils import GROUP_BY, ParserType, Utils
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 
-from ipfsclient.ipfs import Ipfs
+from google.protobuf.json_format import MessageToDict
 
 import pandas as pd
 from src import uuid_images
 from nanohelp.secret import SecretManager
 
-from src.schemas import LoanDetailResponse, LoanOffer, LoanResponse, SuccessOrFailureResponse  # noqa: E501
+from src.batch import check_batch_size, run_batch
+from src.executor import executor
+from src.ipfs import get_ipfs_client
+from src.loan_status import LOAN_STATUS_VALUES, count_expired, loan_status_codes, loan_statuses, sorted_offer_expiry  # noqa: E501
+from src.pagination import MAX_PAGE_SIZE, next_cursor_headers, paginate
+from src.responses import DataFrameJSONResponse, NDJSONResponse, not_modified, wants_ndjson  # noqa: E501
+from src.schemas import BatchItemResponse, LoanDetailResponse, LoanOffer, LoanResponse, SuccessOrFailureResponse  # noqa: E501
+from src.store_index import get_store_index
 from src.utils import RouterUtils
 
 LOG = logging.getLogger(__name__)
@@ -35,16 +42,70 @@ class LoanRouter():
         Args:
             app (FastAPI): Routes will be added to this app.
         """
-        ipfsclient = Ipfs()
+        ipfsclient = get_ipfs_client()
         loan_reader = LoanReader(ipfsclient)
+        loan_index = get_store_index(ParserType.LOAN)
         secret_manager = SecretManager()
 
+        def loan_versions(df: pd.DataFrame) -> pd.DataFrame:
+            if df.empty:
+                return df
+            return df.sort_values('created').groupby(
+                GROUP_BY[ParserType.LOAN]
+            ).agg(
+                records=('created', 'size'),
+                created=('created', 'last'),
+                offer_expiry=('offer_expiry', 'last')
+            )
+
+        async def create_offer(loan: LoanOffer, user: str) -> LoanWriter:
+            """Write a new loan offer.
+
+            Args:
+                loan (LoanOffer): The offer.
+                user (str): The lender.
+
+            Returns:
+                LoanWriter: The writer, with the data it wrote.
+            """
+            payment_schedule = PaymentSchedule.create_payment_schedule(
+                principal=loan.principal,
+                interest_rate=loan.interest,
+                start_date=loan.start,
+                end_date=loan.maturity,
+                number_of_payments=loan.payments
+            )
+
+            LOG.debug("Project: %s", os.environ.get("GCLOUD_PROJECT_ID"))
+
+            # creating the writer also creates the deposit wallets
+            loan_writer = await executor.run(
+                "wallet",
+                LoanWriter,
+                ipfsclient,
+                loan.borrower,
+                user,
+                int(loan.principal),
+                payment_schedule,
+                offer_expiry=loan.expiry,
+                secret_manager=secret_manager,
+                project=os.environ.get("GCLOUD_PROJECT_ID")
+            )
+
+            await executor.run("ipfs", loan_writer.write)
+            loan_index.record(loan_writer.index, loan_writer.data)
+            return loan_writer
+
         @app.get(
             "/loans",
             response_model=List[LoanResponse]
         )
         async def get_all_loans(
+            request: Request,
             recent: bool = False,
+            status: Optional[int] = None,
+            limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+            cursor: Optional[str] = None,
             user: str = Depends(RouterUtils.get_user_token)
         ) -> List[LoanResponse]:
             """Get all open loans.
@@ -52,24 +113,75 @@ class LoanRouter():
             Args:
                 recent (bool, optional): If True, only return the most recent
                     loan. Defaults to False.
+                status (int, optional): Only return loans with this
+                    `loan_status` (a `LoanStatusType` value).
+                limit (int, optional): Page size. Defaults to every loan.
+                cursor (str, optional): The `X-Next-Cursor` header from the
+                    previous page.
                 user (str, optional): User token. Defaults to Depends(RouterUtils.get_user_token).
 
             Returns:
                 List: List of loans.
             """
-            results = loan_reader.get_all_loans(recent_only=recent)
+            if status is not None and status not in LOAN_STATUS_VALUES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown loan status {status}"
+                )
+
+            # served from memory, the index refreshes from IPFS incrementally
+            await loan_index.snapshot()
+
+            # the loans only change with the index, their statuses
+            # also change when an offer expires. Read the version first,
+            # so the ETag is never newer than the results.
+            version = loan_index.version
+            results = loan_index.frame()
+            etag = RouterUtils.make_etag(
+                version,
+                count_expired(
+                    loan_index.view("offer_expiry", sorted_offer_expiry)
+                ),
+                recent, status, limit, cursor, wants_ndjson(request),
+                # the image links point at this server
+                request.base_url
+            )
+            if RouterUtils.etag_matches(request, etag):
+                return not_modified(etag)
+            headers = {"ETag": etag}
+
+            if recent:
+                results = loan_index.latest(GROUP_BY[ParserType.LOAN])
+
+            if status is not None:
+                results = results[loan_status_codes(results) == status]
+
+            results, next_cursor = paginate(
+                results, GROUP_BY[ParserType.LOAN], limit, cursor
+            )
+            results = results.assign(loan_status=loan_statuses(results))
 
             LOG.debug("Results: %s", results)
-            # results = uuid_images.add_uuid_images(results)
-            results = RouterUtils.sanitize_output(results.to_dict(orient='records')) if not results.empty else []
+            results = await executor.run(
+                "ipfs", uuid_images.add_uuid_image_links, results,
+                str(request.base_url)
+            )
+            results = RouterUtils.sanitize_output(results, LoanResponse)
             LOG.debug("Final results: %s", results)
-            return results
+            headers.update(next_cursor_headers(next_cursor))
+            if wants_ndjson(request):
+                return NDJSONResponse(results, headers=headers)
+
+            # the columns already match `LoanResponse`, skip re-validation
+            return DataFrameJSONResponse(results, headers=headers)
 
         @app.get(
             "/loan",
             response_model=LoanDetailResponse
         )
         async def get_loan_details(
+            request: Request,
+            res: Response,
             loan_id: str,
             user: str = Depends(RouterUtils.get_user_token)
         ) -> LoanDetailResponse:
@@ -83,11 +195,35 @@ class LoanRouter():
             Returns:
                 List: List of loans.
             """
-            response = loan_reader.query_for_loan_details(loan_id, recent_only=True)[0]
+            # version the loan by its records in the index
+            await loan_index.snapshot()
+            versions = loan_index.view("versions", loan_versions)
+            if loan_id in versions.index:
+                version = versions.loc[[loan_id]]
+                etag = RouterUtils.make_etag(
+                    loan_id,
+                    version['records'].iloc[0],
+                    version['created'].iloc[0],
+                    count_expired(sorted_offer_expiry(version)),
+                    request.base_url
+                )
+                if RouterUtils.etag_matches(request, etag):
+                    return not_modified(etag)
+                res.headers["ETag"] = etag
+
+            response = (await executor.run(
+                "ipfs",
+                loan_reader.query_for_loan_details,
+                loan_id,
+                recent_only=True
+            ))[0]
 
             # add links to images
             LOG.debug("Before adding image links: %s", response)
-            response = uuid_images.add_uuid_images(response)
+            response = await executor.run(
+                "ipfs", uuid_images.add_uuid_images, response,
+                str(request.base_url)
+            )
             LOG.debug("After adding image links: %s", response)
 
             # add loan status
@@ -120,42 +256,23 @@ class LoanRouter():
 
         @app.post("/loan", response_model=LoanDetailResponse)
         async def create_loan_offer(
+            request: Request,
             loan: LoanOffer,
             user: str = Depends(RouterUtils.get_user_token)
         ) -> LoanDetailResponse:
             """Create a loan offer."""
             try:
-                payment_schedule = PaymentSchedule.create_payment_schedule(
-                    principal=loan.principal,
-                    interest_rate=loan.interest,
-                    start_date=loan.start,
-                    end_date=loan.maturity,
-                    number_of_payments=loan.payments
-                )
-
-                LOG.debug("Project: %s", os.environ.get("GCLOUD_PROJECT_ID"))
-                loan_writer = LoanWriter(
-                    ipfsclient,
-                    loan.borrower,
-                    user,
-                    int(loan.principal),
-                    payment_schedule,
-                    offer_expiry=loan.expiry,
-                    secret_manager=secret_manager,
-                    project=os.environ.get("GCLOUD_PROJECT_ID")
+                loan_writer = await create_offer(loan, user)
+
+                # build the loan details from what was just written,
+                # the same way `query_for_loan_details` reads them back
+                response = MessageToDict(loan_writer.data)
+                response['metadata'] = loan_writer.index.get_metadata()
+                response = await executor.run(
+                    "ipfs", uuid_images.add_uuid_images, response,
+                    str(request.base_url)
                 )
 
-                loan_writer.write()
-
-                # TODO: instead of writing and then reading,
-                #       just return the loan details from the writer
-
-                # Query the loan details after creating the loan offer
-                response = loan_reader.query_for_loan_details(
-                    loan_writer.loan_id, recent_only=True
-                )[0]
-                response = uuid_images.add_uuid_images(response)
-
                 loan = {
                     'loan_id': response['metadata']['loan'],
                     'borrower': response['metadata']['borrower'],
@@ -191,6 +308,30 @@ class LoanRouter():
                     error_type=type(e).__name__
                 )
 
+        @app.post("/loan/bulk", response_model=List[BatchItemResponse])
+        async def create_loan_offers(
+            loans: List[LoanOffer],
+            user: str = Depends(RouterUtils.get_user_token)
+        ) -> List[BatchItemResponse]:
+            """Create many loan offers at once.
+
+            The wallets and the IPFS writes of the offers run in parallel,
+            bounded by the executor limit of each downstream.
+
+            Args:
+                loans (List[LoanOffer]): The offers.
+
+            Returns:
+                List[BatchItemResponse]: The result for each offer, in the
+                    same order, with the id of the loan.
+            """
+            check_batch_size(loans)
+
+            async def create(loan: LoanOffer) -> str:
+                return (await create_offer(loan, user)).loan_id
+
+            return await run_batch(loans, create)
+
         @app.post("/loan/accept", response_model=SuccessOrFailureResponse)
         async def accept_loan(
             loan_id: str,
@@ -205,5 +346,7 @@ class LoanRouter():
                 SuccessOrFailureResponse: The response.
             """
             # read the loan
-            results = loan_reader.query_for_loan(loan_id)
+            results = await executor.run(
+                "ipfs", loan_reader.query_for_loan, loan_id
+            )
             print(results)
@@ -1,18 +1,17 @@
 from http.client import HTTPException
 from fastapi import FastAPI, Depends
+from src.executor import executor
+from src.ipfs import get_ipfs_client
 from src.schemas import NanoAddressResponse
 from src.utils import RouterUtils
-from src.firestore import db
-from src.firestore.crud import check_locked, check_and_lock_user
 from nanohelp.wallet import WalletManager
 from nanohelp.secret import SecretManager
 from bizlogic.loan.reader import LoanReader
-from ipfsclient.ipfs import Ipfs
 
 class NanoRouter:
     def __init__(self, app: FastAPI) -> None:
         self.wallet_manager = WalletManager(SecretManager())
-        ipfsclient = Ipfs()
+        ipfsclient = get_ipfs_client()
         loan_reader = LoanReader(ipfsclient)
 
         @app.get("/wallet/deposit", response_model=NanoAddressResponse)
@@ -23,7 +22,12 @@ class NanoRouter:
 
             # TODO: check if user is valid perspective based on loan data
 
-            loan = loan_reader.query_for_loan_details(loan_id, recent_only=True)[0]
+            loan = (await executor.run(
+                "ipfs",
+                loan_reader.query_for_loan_details,
+                loan_id,
+                recent_only=True
+            ))[0]
             if perspective == loan.borrower:
                 nano_address = loan.borrower_nano_address
             elif perspective == loan.lender:
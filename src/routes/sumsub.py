@@ -1,21 +1,16 @@
 """Sumsub Routes."""
-from http.client import HTTPException
-from fastapi import Depends
-from fastapi import FastAPI
+import json
+import logging
 from typing import Self
 
+from fastapi import Depends, FastAPI, HTTPException, Request
+
+from src.executor import executor
+from src.firestore import get_db
+from src.firestore.crud import get_onboarding_status, record_webhook
 from src.schemas import SuccessOrFailureResponse, SumsubApplicantStatus
+from src.sumsub import SUMSUB_LEVEL_NAME, access_tokens, verify_webhook
 from src.utils import RouterUtils
-from src.sumsub import generate_sumsub_token
-from src.firestore import db
-from src.firestore.crud import check_locked, check_and_lock_user
-
-from google.cloud import firestore
-from google.cloud.firestore_v1.transaction import Transaction
-
-from fastapi import HTTPException
-import time
-import logging
 
 LOG = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
@@ -33,7 +28,7 @@ class SumsubRouter():
             """Query Firestore to see if the user has been onboarded yet.
 
             Only one request can be in progress at a time for a given user.
-            This is verified by checking if the user id is "locked" in firestore.
+            This is verified by leasing the user id in firestore.
 
             Args:
                 user (str): The user to submit the application for.
@@ -41,24 +36,50 @@ class SumsubRouter():
             Returns:
                 str: The user status
             """
-            # Check if the user is locked
-            if check_locked(user):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Duplicate request is already in progress"
-                )
-
-            # Initialize a Firestore transaction
-            transaction = db.transaction()
-
-            # Check and lock the user in the transaction
             try:
-                return check_and_lock_user(transaction, user)
+                return await get_onboarding_status(user)
+            except HTTPException:
+                raise
             except Exception as e:
                 LOG.exception(e)
-                transaction.rollback()
                 raise HTTPException(status_code=400, detail=str(e))
 
+        @app.post("/onboard/webhook", response_model=SuccessOrFailureResponse)
+        async def sumsub_webhook(request: Request) -> SuccessOrFailureResponse:
+            """Receive a Sumsub applicant event and cache the new status.
+
+            The request is authenticated by its `X-Payload-Digest` signature.
+
+            Args:
+                request (Request): The webhook request.
+
+            Returns:
+                SuccessOrFailureResponse: `success=True` when the status was stored.
+            """
+            body = await request.body()
+            if not verify_webhook(
+                    body,
+                    request.headers.get('x-payload-digest'),
+                    request.headers.get('x-payload-digest-alg')):
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid webhook signature"
+                )
+
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid JSON")
+
+            if not await executor.run("firebase", record_webhook, payload):
+                return SuccessOrFailureResponse(
+                    success=False,
+                    error_message="No applicant status in event",
+                    error_type="ValueError"
+                )
+
+            return SuccessOrFailureResponse(success=True)
+
         # TODO: not sure if this is needed
         @app.get("/onboard/id", response_model=dict)
         async def get_applicant_id(user: str = Depends(RouterUtils.get_user_token)) -> str:
@@ -70,7 +91,7 @@ class SumsubRouter():
             Returns:
                 str: The applicant_id for the user
             """
-            user_ref = db.collection('users').document(user)
+            user_ref = get_db().collection('users').document(user)
             doc = user_ref.get()
 
             if not doc.exists:
@@ -89,18 +110,17 @@ class SumsubRouter():
         async def sumsub_token(
             user: str = Depends(RouterUtils.get_user_token)
         ) -> dict:
-            """Generates a Sumsub access token and returns it.
+            """Gets a Sumsub access token, reusing the user's last one until it is close to expiry.
 
             Args:
                 user (str): The user to submit the application for.
 
             Returns:
-                dict: A dictionary containing the newly generated access token.
+                dict: A dictionary containing the access token.
             """
-            level_name = 'basic-kyc-level'  # replace with your level name
             try:
-                token = generate_sumsub_token(user, level_name)
-                LOG.debug(f"Generated Sumsub access token for user {user}")
+                token = await access_tokens.get(user, SUMSUB_LEVEL_NAME)
+                LOG.debug(f"Got Sumsub access token for user {user}")
                 return {'token': token}
             except Exception as e:
                 LOG.exception(e)
@@ -1,16 +1,24 @@
 """Vouch Routes."""
 import logging
-from typing import List, Self, Union
+from typing import List, Optional, Self, Union
 
-from bizlogic.vouch import VouchReader, VouchWriter
-from bizlogic.utils import ParserType, Utils
+from bizlogic.vouch import VouchWriter
+from bizlogic.utils import GROUP_BY, ParserType, Utils
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 
-from ipfsclient.ipfs import Ipfs
+import pandas as pd
 
-from src.schemas import SuccessOrFailureResponse
+from src.batch import check_batch_size, run_batch
+from src.executor import executor
+from src.ipfs import get_ipfs_client
+from src.pagination import MAX_PAGE_SIZE, next_cursor_headers, paginate
+from src.responses import DataFrameJSONResponse, NDJSONResponse, not_modified, wants_ndjson  # noqa: E501
+from src.schemas import BatchItemResponse, SuccessOrFailureResponse, TrustScoreResponse, VouchNeighbourhoodResponse, VouchRequest  # noqa: E501
+from src.store_index import get_store_index
+from src.trust_score import get_trust_scores
 from src.utils import RouterUtils
+from src.vouch_graph import DIRECTIONS, VOUCH_GRAPH_MAX_DEPTH, get_vouch_graph
 
 LOG = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
@@ -25,8 +33,60 @@ class VouchRouter():
         Args:
             app (FastAPI): Routes will be added to this app.
         """
-        ipfsclient = Ipfs()
-        vouch_reader = VouchReader(ipfsclient)
+        ipfsclient = get_ipfs_client()
+        vouch_index = get_store_index(ParserType.VOUCH)
+        vouch_graph = get_vouch_graph()
+        trust_scores = get_trust_scores()
+        group_by = GROUP_BY[ParserType.VOUCH]
+
+        def vouches(recent: bool) -> pd.DataFrame:
+            """Get the vouch records.
+
+            Args:
+                recent (bool): Only get the most recent record of each
+                    vouch, instead of every change (CDC).
+
+            Returns:
+                pd.DataFrame: The records.
+            """
+            if recent:
+                return vouch_index.latest(group_by)
+            return vouch_index.frame()
+
+        async def create_vouch(vouchee: str) -> str:
+            """Write a new vouch.
+
+            Args:
+                vouchee (str): The user to vouch for.
+
+            Returns:
+                str: The vouch id.
+            """
+            voucher = "123"  # TODO: get from KYC
+            vouch_writer = VouchWriter(ipfsclient, voucher, vouchee)
+            await executor.run("ipfs", vouch_writer.write)
+            vouch_index.record(vouch_writer.index, vouch_writer.data)
+            return vouch_writer.vouch_id
+
+        async def user_vouches(
+                user: str,
+                perspective: str,
+                recent: bool) -> pd.DataFrame:
+            """Get the vouches by or for a user from the vouch graph.
+
+            Args:
+                user (str): The user id.
+                perspective (str): "voucher" or "vouchee".
+                recent (bool): Only get the most recent record of each
+                    vouch, instead of every change (CDC).
+
+            Returns:
+                pd.DataFrame: The records.
+            """
+            await vouch_index.snapshot()
+            await executor.run("cpu", vouch_graph.refresh)
+            rows = vouch_graph.vouches(user, perspective, recent)
+            return vouch_index.frame().iloc[rows]
 
         # Loan application endpoints
 
@@ -43,10 +103,8 @@ class VouchRouter():
             Returns:
                 SuccessOrFailureResponse: `success=True` when successful.
             """
-            voucher = "123"  # TODO: get from KYC
             try:
-                vouch_writer = VouchWriter(ipfsclient, voucher, vouchee)
-                vouch_writer.write()
+                await create_vouch(vouchee)
 
                 return SuccessOrFailureResponse(
                     success=True
@@ -59,23 +117,130 @@ class VouchRouter():
                     error_type=type(e).__name__
                 )
 
+        @app.post("/vouch/bulk", response_model=List[BatchItemResponse])
+        async def submit_vouches(
+            batch: List[VouchRequest],
+            user: str = Depends(RouterUtils.get_user_token)
+        ) -> List[BatchItemResponse]:
+            """Create many vouches at once.
+
+            Args:
+                batch (List[VouchRequest]): The vouches.
+
+            Returns:
+                List[BatchItemResponse]: The result for each vouch, in the
+                    same order, with the id of the vouch.
+            """
+            check_batch_size(batch)
+            return await run_batch(
+                batch, lambda vouch: create_vouch(vouch.vouchee)
+            )
+
         @app.get(
             "/vouch",
             response_model=List
         )
         async def get_all_vouches(
-            recent: bool = False,
+            request: Request,
+            recent: bool = True,
+            limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+            cursor: Optional[str] = None,
             user: str = Depends(RouterUtils.get_user_token)
         ) -> List:
             """Get all vouches.
 
             Args:
-                recent (bool, optional): Whether to only get recent vouches. Defaults to False.
+                recent (bool, optional): Only get the most recent record of
+                    each vouch, False for every change (CDC). Defaults to True.
+                limit (int, optional): Page size. Defaults to every vouch.
+                cursor (str, optional): The `X-Next-Cursor` header from the
+                    previous page.
 
             Returns:
                 List: List of vouches.
             """
-            return vouch_reader.get_all_vouches().to_dict(orient="records")
+            # served from memory, the index refreshes from IPFS incrementally
+            await vouch_index.snapshot()
+            version = vouch_index.version
+            etag = RouterUtils.make_etag(
+                version, recent, limit, cursor, wants_ndjson(request)
+            )
+            if RouterUtils.etag_matches(request, etag):
+                return not_modified(etag)
+
+            results = vouches(recent)
+            results, next_cursor = paginate(results, group_by, limit, cursor)
+            results = RouterUtils.sanitize_output(results)
+            headers = {"ETag": etag, **next_cursor_headers(next_cursor)}
+            if wants_ndjson(request):
+                return NDJSONResponse(results, headers=headers)
+
+            return DataFrameJSONResponse(results, headers=headers)
+
+        @app.get(
+            "/vouch/graph",
+            response_model=VouchNeighbourhoodResponse
+        )
+        async def get_vouch_neighbourhood(
+            them: str,
+            depth: int = Query(1, ge=1, le=VOUCH_GRAPH_MAX_DEPTH),
+            direction: str = "both",
+            user: str = Depends(RouterUtils.get_user_token)
+        ) -> VouchNeighbourhoodResponse:
+            """Get the users within a few vouches of a user.
+
+            Args:
+                them (str): The user to start from.
+                depth (int, optional): Max number of vouches between `them`
+                    and the users returned. Defaults to 1.
+                direction (str, optional): Follow vouches by each user
+                    ("out"), for each user ("in") or "both".
+
+            Returns:
+                VouchNeighbourhoodResponse: The users and the vouches
+                    between them.
+            """
+            if direction not in DIRECTIONS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown direction {direction}"
+                )
+
+            await vouch_index.snapshot()
+            await executor.run("cpu", vouch_graph.refresh)
+            distances, edges = vouch_graph.neighbourhood(
+                them, depth, direction
+            )
+            return VouchNeighbourhoodResponse(
+                nodes=[
+                    {"user": node, "depth": distance}
+                    for node, distance in distances.items()
+                ],
+                edges=edges
+            )
+
+        @app.get(
+            "/vouch/score",
+            response_model=TrustScoreResponse
+        )
+        async def get_trust_score(
+            them: str = Query(..., alias="user"),
+            user: str = Depends(RouterUtils.get_user_token)
+        ) -> TrustScoreResponse:
+            """Get the trust score of a user, from the vouch graph.
+
+            Args:
+                them (str): The user to score, the `user` query parameter.
+
+            Returns:
+                TrustScoreResponse: The score, 0 if nobody vouched for or
+                    by the user.
+            """
+            await vouch_index.snapshot()
+            await executor.run("cpu", trust_scores.refresh)
+            return TrustScoreResponse(
+                user=them, score=trust_scores.score(them)
+            )
 
         @app.get(
             "/vouch/user/self",
@@ -83,26 +248,23 @@ class VouchRouter():
         )
         async def get_my_vouchers(
             perspective: str = "voucher",
-            recent: bool = False,
+            recent: bool = True,
             user: str = Depends(RouterUtils.get_user_token)
         ) -> List:
             """Get all vouches for the current user.
 
             Args:
                 perspective (str, optional): Whether to get vouchers or vouchees. Defaults to "voucher".
-                recent (bool, optional): Whether to only get recent vouches. Defaults to False.
+                recent (bool, optional): Only get the most recent record of
+                    each vouch, False for every change (CDC). Defaults to True.
 
             Returns:
                 List: List of vouches.
             """
             assert perspective in ["voucher", "vouchee"]  # TODO: handle invalid request properly (and make enum instead of str?)  # noqa: E501
             borrower = "123"  # TODO: get from KYC
-            if perspective == "voucher":
-                results = vouch_reader.query_vouches(voucher=borrower)
-            elif perspective == "vouchee":
-                results = vouch_reader.query_vouches(vouchee=borrower)
-
-            return results.to_json(orient="records")
+            results = await user_vouches(borrower, perspective, recent)
+            return DataFrameJSONResponse(RouterUtils.sanitize_output(results))
 
         @app.get(
             "/vouch/user/other",
@@ -111,7 +273,7 @@ class VouchRouter():
         async def get_their_vouchers(
             them: str,
             perspective: str = "voucher",
-            recent: bool = False,
+            recent: bool = True,
             user: str = Depends(RouterUtils.get_user_token)
         ) -> List:
             """Get all vouches for the given user.
@@ -119,15 +281,12 @@ class VouchRouter():
             Args:
                 them (str): The user to get vouches for.
                 perspective (str, optional): Whether to get vouchers or vouchees. Defaults to "voucher".
-                recent (bool, optional): Whether to only get recent vouches. Defaults to False.
+                recent (bool, optional): Only get the most recent record of
+                    each vouch, False for every change (CDC). Defaults to True.
 
             Returns:
                 List: List of vouches.
             """
             assert perspective in ["voucher", "vouchee"]  # TODO: handle invalid request properly (and make enum instead of str?)  # noqa: E501
-            if perspective == "voucher":
-                results = vouch_reader.query_vouches(voucher=them)
-            elif perspective == "vouchee":
-                results = vouch_reader.query_vouches(vouchee=them)
-
-            return results.to_json(orient="records")
+            results = await user_vouches(them, perspective, recent)
+            return DataFrameJSONResponse(RouterUtils.sanitize_output(results))
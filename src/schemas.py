@@ -64,6 +64,7 @@ class LoanResponse(BaseModel):
     offer expiry time, transaction ID, acceptance status, number of payments, and loan status.
     """
     loan: str = Field(..., description="The identifier of the loan.")
+    loanImageLink: Optional[str] = Field(None, description="The link to the image associated with the loan.")
     borrower: str = Field(..., description="The identifier of the borrower.")
     lender: str = Field(..., description="The identifier of the lender.")
     created: datetime = Field(..., description="The time when the loan was created.")
@@ -84,7 +85,7 @@ class RepaymentSchedule(BaseModel):
     """
     paymentId: str = Field(..., description="The unique identifier for the payment.")
     amountDue: int = Field(..., description="The amount due for the payment.")
-    imageLink: Optional[str] = Field(None, description="The IPFS link to the image associated with the loan.")
+    imageLink: Optional[str] = Field(None, description="The link to the image associated with the loan.")
     dueDate: datetime = Field(..., description="The date and time when the payment is due.")
 
 
@@ -97,7 +98,7 @@ class Metadata(BaseModel):
     borrower: str = Field(..., description="The identifier of the borrower.")
     lender: str = Field(..., description="The identifier of the lender.")
     loan: str = Field(..., description="The identifier of the loan.")
-    loanImageLink: Optional[str] = Field(None, description="The IPFS link to the image associated with the loan.")
+    loanImageLink: Optional[str] = Field(None, description="The link to the image associated with the loan.")
     created: datetime = Field(..., description="The timestamp of when the loan was created.")
     loan_status: LoanStatusType = Field(..., description="The status of the loan.")
 
@@ -146,3 +147,73 @@ class SumsubApplicantStatus(BaseModel):
     startDate: Optional[datetime] = Field(None, description="Date of check started.")
     reviewResult: Optional[SumsubReviewResult] = Field(None, description="The result of the review.")
     reviewStatus: str = Field(None, description="Current status of an applicant.")
+
+
+class ChangeResponse(BaseModel):
+    """
+    Model representing one record in the change feed.
+
+    This includes the cursor of the change, the type of record and the record itself.
+    """
+    cursor: str = Field(..., description="The cursor of the change, pass it as `since` to get the changes after it.")
+    kind: str = Field(..., description="The type of record: `loan`, `application` or `vouch`.")
+    record: dict = Field(..., description="The record, with the same fields as the list endpoint for its type.")
+
+
+class VouchEdge(BaseModel):
+    """
+    Model representing a vouch in the vouch graph.
+    """
+    vouch: str = Field(..., description="The identifier of the vouch.")
+    voucher: str = Field(..., description="The user who vouched.")
+    vouchee: str = Field(..., description="The user who was vouched for.")
+
+
+class VouchNode(BaseModel):
+    """
+    Model representing a user in the vouch graph.
+    """
+    user: str = Field(..., description="The identifier of the user.")
+    depth: int = Field(..., description="The number of vouches between this user and the queried user.")
+
+
+class VouchNeighbourhoodResponse(BaseModel):
+    """
+    Model representing the users near a user in the vouch graph.
+
+    This includes the users found and the vouches between them.
+    """
+    nodes: List[VouchNode] = Field([], description="The users within the requested depth, including the queried user.")
+    edges: List[VouchEdge] = Field([], description="The vouches followed to find the users.")
+
+
+class TrustScoreResponse(BaseModel):
+    """
+    Model representing the trust score of a user.
+    """
+    user: str = Field(..., description="The identifier of the user.")
+    score: float = Field(..., description="The PageRank of the user in the vouch graph, scaled so the average user has a score of 1.")
+
+
+class BatchItemResponse(SuccessOrFailureResponse):
+    """
+    Model for the result of one item of a batch operation.
+
+    Items succeed or fail independently, this tells which item the result is for.
+    """
+    index: int = Field(..., description="The position of the item in the request.")
+    id: Optional[str] = Field(None, description="The identifier of the record the item created or changed, if any.")
+
+
+class WithdrawApplicationsRequest(BaseModel):
+    """
+    Model representing a batch of loan applications to withdraw.
+    """
+    applications: List[str] = Field(..., description="The identifiers of the applications to withdraw.")
+
+
+class VouchRequest(BaseModel):
+    """
+    Model representing a vouch to create.
+    """
+    vouchee: str = Field(..., description="The user to vouch for.")
@@ -0,0 +1,390 @@
+"""Materialized in-memory indexes of the ipfskvs stores.
+
+The bizlogic readers rebuild a dataframe from IPFS on every query. A
+`StoreIndex` loads every record under a prefix once, then refreshes
+incrementally: it lists the filenames and only reads the ones it has
+not seen yet. Records written by this process are added directly with
+`record()`, so they are visible without waiting for a refresh.
+Records written by other processes are read by the refresh loop
+(`start_index_refresh`) every `STORE_INDEX_REFRESH_SECONDS`, and by
+reads of an index that is stale.
+
+`version` identifies the set of records in the index. It only depends
+on the filenames, so every replica that has read the same records
+reports the same version, which makes it usable as an HTTP ETag.
+
+New records are also sent to the `ChangeLog`, and `changes()` serves
+them in the order of the change feed, see `src.changes`.
+
+```py
+    from src.store_index import get_store_index
+
+    loan_index = get_store_index(ParserType.LOAN)
+    df = await loan_index.snapshot()
+```
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Self, Tuple
+
+from bizlogic.application import PREFIX as APPLICATION_PREFIX
+from bizlogic.loan import PREFIX as LOAN_PREFIX
+from bizlogic.protoc.loan_application_pb2 import LoanApplication
+from bizlogic.protoc.loan_pb2 import Loan
+from bizlogic.protoc.vouch_pb2 import Vouch
+from bizlogic.utils import PARSERS, ParserType, Utils
+from bizlogic.vouch import PREFIX as VOUCH_PREFIX
+
+from google.protobuf.message import Message
+
+from ipfsclient.ipfs import Ipfs
+
+from ipfskvs.index import Index
+from ipfskvs.store import Store
+
+import pandas as pd
+
+from src.changes import ChangeKey, ChangeLog, change_log
+from src.executor import executor
+from src.ipfs import get_ipfs_client
+
+LOG = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+STORE_INDEX_REFRESH_SECONDS = float(
+    os.environ.get("STORE_INDEX_REFRESH_SECONDS", 30)
+)
+
+
+def _filename_digest(filename: str) -> int:
+    return int.from_bytes(
+        hashlib.sha256(filename.encode('utf-8')).digest()[:16], 'big'
+    )
+
+
+class StoreIndex():
+    """Incrementally maintained in-memory copy of an ipfskvs prefix."""
+
+    def __init__(
+            self: Self,
+            ipfsclient: Ipfs,
+            prefix: str,
+            reader: Message,
+            parser_type: int,
+            refresh_interval: float = STORE_INDEX_REFRESH_SECONDS,
+            change_log: Optional[ChangeLog] = None) -> None:
+        """Create an empty index.
+
+        Args:
+            ipfsclient (Ipfs): The ipfs client.
+            prefix (str): The ipfskvs prefix, ex: "loan".
+            reader (Message): The protobuf type stored under the prefix.
+            parser_type (int): The `ParserType` of the records.
+            refresh_interval (float, optional): Seconds before the index
+                is refreshed from IPFS again.
+            change_log (ChangeLog, optional): Log of the added records.
+        """
+        self.ipfsclient = ipfsclient
+        self.prefix = prefix
+        self.reader = reader
+        self.parser_type = parser_type
+        self.refresh_interval = refresh_interval
+        self.change_log = change_log
+
+        self.generation = 0
+        self.loaded_at = None
+        self._filenames = set()
+        self._keys: List[ChangeKey] = []
+        self._digest = 0
+        self._frame = pd.DataFrame()
+        self._views = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_task = None
+
+    def _to_dataframe(self: Self, stores: List[Store]) -> pd.DataFrame:
+        df = Store.to_dataframe(stores, PARSERS[self.parser_type])
+        if not df.empty:
+            df['created'] = df['created'].apply(
+                Utils.nanosecond_epoch_to_datetime
+            )
+        return df
+
+    def _append(self: Self, stores: List[Store]) -> None:
+        """Add the records for new filenames to the index."""
+        with self._lock:
+            stores = [
+                store for store in stores
+                if store.index.get_filename() not in self._filenames
+            ]
+            if not stores:
+                return
+
+            records = self._to_dataframe(stores)
+            self._frame = pd.concat([self._frame, records], ignore_index=True)
+            keys = []
+            for store in stores:
+                filename = store.index.get_filename()
+                self._filenames.add(filename)
+                self._digest ^= _filename_digest(filename)
+                keys.append(
+                    (int(store.index.get_metadata()["created"]), filename)
+                )
+            self._keys.extend(keys)
+            self._views = {}
+            self.generation += 1
+            if self.change_log is not None:
+                self.change_log.append(self.parser_type, keys, records)
+
+    def refresh(self: Self) -> None:
+        """Read any records that are not in the index yet from IPFS.
+
+        This is blocking, run it with the executor.
+        """
+        with self._refresh_lock:
+            indexes = Store.query_indexes(
+                Index(prefix=self.prefix, index={}),
+                self.ipfsclient
+            )
+
+            stores = []
+            for index in indexes:
+                if index.get_filename() in self._filenames:
+                    continue
+
+                store = Store(
+                    index=index,
+                    ipfs=self.ipfsclient,
+                    reader=type(self.reader)()
+                )
+                store.read()
+                stores.append(store)
+
+            LOG.debug(
+                "Refreshed %s index: %s new records",
+                self.prefix, len(stores)
+            )
+            self._append(stores)
+            self.loaded_at = time.monotonic()
+
+    def record(self: Self, index: Index, data: Message) -> None:
+        """Add a record that was just written by this process.
+
+        Args:
+            index (Index): The index the writer wrote to.
+            data (Message): The data the writer wrote.
+        """
+        self._append([Store(index=index, ipfs=self.ipfsclient, reader=data)])
+
+    @property
+    def version(self: Self) -> str:
+        """Get a token that changes whenever a record is added.
+
+        Returns:
+            str: The number of records and an order independent hash
+                of their filenames.
+        """
+        with self._lock:
+            return f"{len(self._filenames)}-{self._digest:032x}"
+
+    def is_stale(self: Self) -> bool:
+        """Check if the index should be refreshed.
+
+        Returns:
+            bool: True if it was never loaded or is older than the
+                interval.
+        """
+        return self.loaded_at is None or \
+            time.monotonic() - self.loaded_at > self.refresh_interval
+
+    def frame(self: Self) -> pd.DataFrame:
+        """Get every record in the index (including previous updates).
+
+        The dataframe is shared, copy it before modifying it.
+
+        Returns:
+            pd.DataFrame: The records.
+        """
+        return self._frame
+
+    def changes(
+            self: Self,
+            since: ChangeKey,
+            limit: int) -> List[Tuple[ChangeKey, int]]:
+        """Get the records after a key of the change feed.
+
+        Args:
+            since (ChangeKey): The key of the last record the client has
+                seen, see `src.changes`.
+            limit (int): Max number of records.
+
+        Returns:
+            List[Tuple[ChangeKey, int]]: The key and the row in `frame()`
+                of each record, in key order.
+        """
+        with self._lock:
+            if "changes" not in self._views:
+                rows = sorted(
+                    range(len(self._keys)), key=self._keys.__getitem__
+                )
+                self._views["changes"] = (
+                    [self._keys[row] for row in rows], rows
+                )
+            keys, rows = self._views["changes"]
+
+        start = bisect.bisect_right(keys, since)
+        return list(zip(keys[start:start + limit], rows[start:start + limit]))
+
+    def view(
+            self: Self,
+            name: str,
+            build: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+        """Get a derived dataframe, rebuilt only when the index changes.
+
+        Args:
+            name (str): The name of the view.
+            build (Callable[[pd.DataFrame], pd.DataFrame]): Builds the
+                view from `frame()`.
+
+        Returns:
+            pd.DataFrame: The view. It is shared, copy it before
+                modifying it.
+        """
+        with self._lock:
+            frame = self._frame
+            views = self._views
+
+        if name not in views:
+            views[name] = build(frame)
+        return views[name]
+
+    def latest(self: Self, group_by: str) -> pd.DataFrame:
+        """Get the most recent record for each object.
+
+        Args:
+            group_by (str): The object id column, ex: "loan".
+
+        Returns:
+            pd.DataFrame: The most recent records.
+        """
+        def build(df: pd.DataFrame) -> pd.DataFrame:
+            if df.empty:
+                return df
+            return df.sort_values('created').groupby(
+                group_by, as_index=False
+            ).last()
+
+        return self.view(f"latest:{group_by}", build)
+
+    def _schedule_refresh(self: Self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+
+        def log_failure(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception():
+                LOG.error(
+                    "Failed to refresh %s index",
+                    self.prefix,
+                    exc_info=task.exception()
+                )
+
+        self._refresh_task = asyncio.get_running_loop().create_task(
+            executor.run("ipfs", self.refresh)
+        )
+        self._refresh_task.add_done_callback(log_failure)
+
+    async def snapshot(self: Self) -> pd.DataFrame:
+        """Get every record, loading the index on first use.
+
+        A stale index is served as is while it refreshes
+        in the background.
+
+        Returns:
+            pd.DataFrame: The records.
+        """
+        if self.loaded_at is None:
+            await executor.run("ipfs", self.refresh)
+        elif self.is_stale():
+            self._schedule_refresh()
+
+        return self.frame()
+
+
+STORE_INDEXES = {
+    ParserType.LOAN: (LOAN_PREFIX, Loan()),
+    ParserType.LOAN_APPLICATION: (APPLICATION_PREFIX, LoanApplication()),
+    ParserType.VOUCH: (VOUCH_PREFIX, Vouch()),
+}
+
+_lock = threading.Lock()
+_indexes: Dict[int, StoreIndex] = {}
+_refresh_task = None
+
+
+def get_store_index(parser_type: int) -> StoreIndex:
+    """Get the process-wide index for a type of record.
+
+    Args:
+        parser_type (int): The `ParserType` of the records.
+
+    Returns:
+        StoreIndex: The shared index.
+    """
+    with _lock:
+        if parser_type not in _indexes:
+            prefix, reader = STORE_INDEXES[parser_type]
+            _indexes[parser_type] = StoreIndex(
+                get_ipfs_client(), prefix, reader, parser_type,
+                change_log=change_log
+            )
+        return _indexes[parser_type]
+
+
+async def refresh_indexes(
+        interval: float = STORE_INDEX_REFRESH_SECONDS) -> None:
+    """Refresh every registered index every `interval` seconds.
+
+    Without it, records written by other processes would only be read
+    when a request finds an index stale, and `/events` subscribers
+    would not see them until then.
+
+    Args:
+        interval (float, optional): Seconds between refreshes.
+    """
+    while True:
+        await asyncio.sleep(interval)
+
+        with _lock:
+            indexes = list(_indexes.values())
+        results = await asyncio.gather(
+            *(executor.run("ipfs", index.refresh) for index in indexes),
+            return_exceptions=True
+        )
+        for index, result in zip(indexes, results):
+            if isinstance(result, Exception):
+                LOG.error(
+                    "Failed to refresh %s index", index.prefix,
+                    exc_info=result
+                )
+
+
+def start_index_refresh() -> None:
+    """Start refreshing the indexes in the background."""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.get_running_loop().create_task(
+            refresh_indexes()
+        )
+
+
+def stop_index_refresh() -> None:
+    """Stop refreshing the indexes."""
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
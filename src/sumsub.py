@@ -1,151 +1,392 @@
 # flake8: noqa
 """Source: https://github.com/SumSubstance/AppTokenUsageExamples/blob/master/Python/AppTokenPythonExample.py"""
+import asyncio
+import calendar
 import hashlib
 import hmac
 import json
 import logging
 import time
-import uuid
 import os
-from typing import Optional
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Self, Tuple
 
-import requests
+import httpx
 
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from src.cache import LRUCache
 from src.schemas import SumsubApplicantStatus
 
 SUMSUB_TEST_BASE_URL = "https://api.sumsub.com"
-REQUEST_TIMEOUT = 60
-# Please don't forget to change token and secret key values to production ones when switching to production
+SUMSUB_BASE_URL = os.environ.get("SUMSUB_BASE_URL", SUMSUB_TEST_BASE_URL)
+SUMSUB_LEVEL_NAME = os.environ.get("SUMSUB_LEVEL_NAME", "basic-kyc-level")
+SUMSUB_POOL_SIZE = int(os.environ.get("SUMSUB_POOL_SIZE", 10))
+SUMSUB_TIMEOUT = float(os.environ.get("SUMSUB_TIMEOUT", 10))
+SUMSUB_RETRIES = int(os.environ.get("SUMSUB_RETRIES", 3))
+# max seconds between two attempts of a request
+SUMSUB_BACKOFF_SECONDS = float(os.environ.get("SUMSUB_BACKOFF_SECONDS", 10))
+SUMSUB_TOKEN_TTL_SECONDS = int(os.environ.get("SUMSUB_TOKEN_TTL_SECONDS", 600))
+# tokens are refreshed when they have less than this left
+SUMSUB_TOKEN_REFRESH_SECONDS = float(os.environ.get("SUMSUB_TOKEN_REFRESH_SECONDS", 120))
+SUMSUB_TOKEN_CACHE_SIZE = int(os.environ.get("SUMSUB_TOKEN_CACHE_SIZE", 10000))
+WEBHOOK_DIGEST_ALGORITHMS = {
+    'HMAC_SHA1_HEX': hashlib.sha1,
+    'HMAC_SHA256_HEX': hashlib.sha256,
+    'HMAC_SHA512_HEX': hashlib.sha512,
+}
 
 logging.basicConfig(level=logging.DEBUG)
 LOG = logging.getLogger(__name__)
 
-def generate_sumsub_token(uid: str, level_name: str, ttl_in_secs: Optional[int]=600) -> str:
-    """Generates a Sumsub access token.
+
+def sign_headers(method: str, path_url: str, body: bytes = b'', now: int = None) -> Dict[str, str]:
+    """Get the Sumsub authentication headers for a request.
 
     Args:
-        uid (str): The external user ID which will be bound to the token.
-        level_name (str): The name of the level configured in the dashboard.
-        ttl_in_secs (int, optional): Lifespan of a token in seconds. Default is 600 seconds.
+        method (str): The HTTP method.
+        path_url (str): The path, including the encoded query params.
+        body (bytes, optional): The request body.
+        now (int, optional): The epoch timestamp of the request.
 
     Returns:
-        str: A newly generated access token for an applicant.
+        Dict[str, str]: The `X-App-*` headers.
     """
-    url = SUMSUB_TEST_BASE_URL + f'/resources/accessTokens?userId={uid}&levelName={level_name}'
-    if ttl_in_secs is not None:
-        url += f'&ttlInSecs={ttl_in_secs}'
-    resp = sign_request(requests.Request('POST', url))
-    s = requests.Session()
-    response = s.send(resp, timeout=REQUEST_TIMEOUT)
-    LOG.debug(f"Sumsub generate_sumsub_token response: {response.json()}")
-    return response.json().get('token')
-
-def create_applicant(external_user_id, level_name):
-    # https://developers.sumsub.com/api-reference/#creating-an-applicant
-    body = {'externalUserId': external_user_id}
-    params = {'levelName': level_name}
-    headers = {
-        'Content-Type': 'application/json',
-        'Content-Encoding': 'utf-8'
-    }
-    resp = sign_request(
-        requests.Request('POST', SUMSUB_TEST_BASE_URL + '/resources/applicants?levelName=' + level_name,
-                         params=params,
-                         data=json.dumps(body),
-                         headers=headers))
-    s = requests.Session()
-    response = s.send(resp, timeout=REQUEST_TIMEOUT)
-    LOG.debug(f"Sumsub create_applicant response: {response.json()}")
-    applicant_id = (response.json()['id'])
-    return applicant_id
-
-
-def add_document(applicant_id):
-    # https://developers.sumsub.com/api-reference/#adding-an-id-document
-    with open('img.jpg', 'wb') as handle:
-        response = requests.get('https://fv2-1.failiem.lv/thumb_show.php?i=gdmn9sqy&view', stream=True,
-                                timeout=REQUEST_TIMEOUT)
-        if not response.ok:
-            logging.error(response)
-
-        for block in response.iter_content(1024):
-            if not block:
-                break
-            handle.write(block)
-    payload = {"metadata": '{"idDocType":"PASSPORT", "country":"USA"}'}
-    resp = sign_request(
-        requests.Request('POST', SUMSUB_TEST_BASE_URL + '/resources/applicants/' + applicant_id + '/info/idDoc',
-                         data=payload,
-                         files=[('content', open('img.jpg', 'rb'))]
-                         ))
-    sw = requests.Session()
-    response = sw.send(resp, timeout=REQUEST_TIMEOUT)
-    LOG.debug(f"Sumsub add_document response: {response.json()}")
-    return response.headers['X-Image-Id']
-
-
-def get_applicant_status(applicant_id) -> SumsubApplicantStatus:
-    # https://developers.sumsub.com/api-reference/#getting-applicant-status-api
-    url = SUMSUB_TEST_BASE_URL + '/resources/applicants/' + applicant_id + '/status'
-    resp = sign_request(requests.Request('GET', url))
-    s = requests.Session()
-    response = s.send(resp, timeout=REQUEST_TIMEOUT)
-    LOG.debug(f"Sumsub get_applicant_status response: {response.json()}")
-    return response.json()
-
-
-def get_access_token(external_user_id, level_name):
-    # https://developers.sumsub.com/api-reference/#access-tokens-for-sdks
-    params = {'userId': external_user_id, 'ttlInSecs': '600', 'levelName': level_name}
-    headers = {'Content-Type': 'application/json',
-               'Content-Encoding': 'utf-8'
-               }
-    resp = sign_request(requests.Request('POST', SUMSUB_TEST_BASE_URL + '/resources/accessTokens',
-                                         params=params,
-                                         headers=headers))
-    s = requests.Session()
-    response = s.send(resp, timeout=REQUEST_TIMEOUT)
-    LOG.debug(f"Sumsub get_access_token response: {response.json()}")
-    token = (response.json()['token'])
-
-    return token
-
-def sign_request(request: requests.Request) -> requests.PreparedRequest:
-    prepared_request = request.prepare()
-    now = int(time.time())
-    method = request.method.upper()
-    path_url = prepared_request.path_url  # includes encoded query params
-    # could be None so we use an empty **byte** string here
-    body = b'' if prepared_request.body is None else prepared_request.body
-    if type(body) == str:
-        body = body.encode('utf-8')
-    data_to_sign = str(now).encode('utf-8') + method.encode('utf-8') + path_url.encode('utf-8') + body
+    now = int(time.time()) if now is None else now
+    data_to_sign = str(now).encode('utf-8') + method.upper().encode('utf-8') + path_url.encode('utf-8') + body
     # hmac needs bytes
     signature = hmac.new(
         os.environ['SUMSUB_SECRET_KEY'].encode('utf-8'),
         data_to_sign,
         digestmod=hashlib.sha256
     )
-    prepared_request.headers['X-App-Token'] = os.environ['SUMSUB_APP_TOKEN']
-    prepared_request.headers['X-App-Access-Ts'] = str(now)
-    prepared_request.headers['X-App-Access-Sig'] = signature.hexdigest()
-    return prepared_request
-
-
-# # Such actions are presented below:
-# # 1) Creating an applicant
-# # 2) Adding a document to the applicant
-# # 3) Getting applicant status
-# # 4) Getting access token
-# def sumsub():
-#     logging.basicConfig(level=logging.INFO)
-#     external_user_id = str(uuid.uuid4())
-#     level_name = 'basic-kyc-level'
-#     applicant_id = create_applicant(external_user_id, level_name)
-#     logging.info(applicant_id)
-#     image_id = add_document(applicant_id)
-#     logging.info(image_id)
-#     status = get_applicant_status(applicant_id)
-#     logging.info(status)
-#     token = get_access_token(external_user_id, level_name)
-#     logging.info(token)
+    return {
+        'X-App-Token': os.environ['SUMSUB_APP_TOKEN'],
+        'X-App-Access-Ts': str(now),
+        'X-App-Access-Sig': signature.hexdigest(),
+    }
+
+
+def verify_webhook(body: bytes, digest: str, algorithm: Optional[str] = None) -> bool:
+    """Check the signature of a webhook sent by Sumsub.
+
+    Args:
+        body (bytes): The raw request body.
+        digest (str): The `X-Payload-Digest` header.
+        algorithm (str, optional): The `X-Payload-Digest-Alg` header.
+            Defaults to `HMAC_SHA256_HEX`.
+
+    Returns:
+        bool: True if the body was signed with `SUMSUB_WEBHOOK_SECRET`.
+    """
+    digestmod = WEBHOOK_DIGEST_ALGORITHMS.get(algorithm or 'HMAC_SHA256_HEX')
+    if digestmod is None or not digest:
+        return False
+
+    expected = hmac.new(
+        os.environ['SUMSUB_WEBHOOK_SECRET'].encode('utf-8'),
+        body,
+        digestmod=digestmod
+    ).hexdigest()
+    return hmac.compare_digest(expected, digest.lower())
+
+
+def webhook_status(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the applicant status fields from a webhook payload.
+
+    Args:
+        payload (Dict[str, Any]): The webhook body, ex: an
+            `applicantReviewed` event.
+
+    Returns:
+        Dict[str, Any]: The `SumsubApplicantStatus` fields it contains.
+    """
+    return {
+        field: payload[field]
+        for field in SumsubApplicantStatus.model_fields
+        if payload.get(field) is not None
+    }
+
+
+def webhook_created(payload: Dict[str, Any]) -> Optional[float]:
+    """Get the time Sumsub created a webhook event.
+
+    Args:
+        payload (Dict[str, Any]): The webhook body.
+
+    Returns:
+        Optional[float]: The epoch time of `createdAtMs` (UTC, ex:
+            "2024-02-21 13:23:19.321"), None if it is missing or invalid.
+    """
+    created = payload.get('createdAtMs')
+    if isinstance(created, (int, float)):
+        return created / 1000
+    try:
+        parsed = time.strptime(created[:19], "%Y-%m-%d %H:%M:%S")
+        fraction = float("0" + created[19:]) if len(created) > 19 else 0.0
+    except (TypeError, ValueError):
+        return None
+    return calendar.timegm(parsed) + fraction
+
+
+def _is_retryable(err: BaseException) -> bool:
+    """Retry network errors, rate limits and server errors."""
+    if isinstance(err, httpx.TransportError):
+        return True
+    if isinstance(err, httpx.HTTPStatusError):
+        return err.response.status_code == 429 or err.response.status_code >= 500
+    return False
+
+
+class SumsubClient():
+    """Async Sumsub API client on a pool of keep-alive connections."""
+
+    def __init__(
+            self: Self,
+            base_url: str = SUMSUB_BASE_URL,
+            timeout: float = SUMSUB_TIMEOUT,
+            pool_size: int = SUMSUB_POOL_SIZE,
+            retries: int = SUMSUB_RETRIES,
+            transport: httpx.AsyncBaseTransport = None) -> None:
+        """Create a client.
+
+        Args:
+            base_url (str, optional): The Sumsub API url.
+            timeout (float, optional): Seconds before a request times out.
+            pool_size (int, optional): Max open connections.
+            retries (int, optional): Max attempts per request.
+            transport (httpx.AsyncBaseTransport, optional): Overrides the
+                HTTP transport, for tests.
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size
+            ),
+            transport=transport
+        )
+
+    @property
+    def max_request_seconds(self: Self) -> float:
+        """Get the worst case duration of a request.
+
+        Returns:
+            float: Seconds until the last attempt times out, when every
+                attempt times out after the longest backoff.
+        """
+        return self.retries * self.timeout + \
+            (self.retries - 1) * SUMSUB_BACKOFF_SECONDS
+
+    async def _request(
+            self: Self,
+            method: str,
+            path: str,
+            params: Dict[str, Any] = None,
+            body: Dict[str, Any] = None) -> Dict:
+        """Make a signed request, retrying with jittered backoff.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The API path, ex: "/resources/applicants".
+            params (Dict[str, Any], optional): The query params.
+            body (Dict[str, Any], optional): The JSON body.
+
+        Raises:
+            httpx.HTTPError: If the last attempt failed.
+
+        Returns:
+            Dict: The JSON response.
+        """
+        content = b'' if body is None else json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+
+        async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.retries),
+                wait=wait_random_exponential(multiplier=0.5, max=SUMSUB_BACKOFF_SECONDS),
+                retry=retry_if_exception(_is_retryable),
+                reraise=True):
+            with attempt:
+                request = self.client.build_request(
+                    method, path, params=params, content=content, headers=headers
+                )
+                # signed for each attempt, the timestamp is part of the signature
+                request.headers.update(sign_headers(
+                    method, request.url.raw_path.decode('ascii'), content
+                ))
+                response = await self.client.send(request)
+                response.raise_for_status()
+
+        LOG.debug(f"Sumsub {method} {path} response: {response.status_code}")
+        return response.json()
+
+    async def generate_token(self: Self, uid: str, level_name: str, ttl_in_secs: Optional[int] = 600) -> str:
+        """Generates a Sumsub access token.
+
+        Args:
+            uid (str): The external user ID which will be bound to the token.
+            level_name (str): The name of the level configured in the dashboard.
+            ttl_in_secs (int, optional): Lifespan of a token in seconds. Default is 600 seconds.
+
+        Returns:
+            str: A newly generated access token for an applicant.
+        """
+        params = {'userId': uid, 'levelName': level_name}
+        if ttl_in_secs is not None:
+            params['ttlInSecs'] = ttl_in_secs
+        response = await self._request('POST', '/resources/accessTokens', params=params)
+        return response.get('token')
+
+    async def create_applicant(self: Self, external_user_id: str, level_name: str) -> str:
+        """Create a Sumsub applicant for a user.
+
+        Args:
+            external_user_id (str): The user id.
+            level_name (str): The name of the level configured in the dashboard.
+
+        Returns:
+            str: The applicant id.
+        """
+        # https://developers.sumsub.com/api-reference/#creating-an-applicant
+        response = await self._request(
+            'POST',
+            '/resources/applicants',
+            params={'levelName': level_name},
+            body={'externalUserId': external_user_id}
+        )
+        return response['id']
+
+    async def get_applicant_status(self: Self, applicant_id: str) -> SumsubApplicantStatus:
+        """Get the review status of an applicant.
+
+        Args:
+            applicant_id (str): The applicant id.
+
+        Returns:
+            SumsubApplicantStatus: The status.
+        """
+        # https://developers.sumsub.com/api-reference/#getting-applicant-status-api
+        return await self._request('GET', f'/resources/applicants/{applicant_id}/status')
+
+    async def get_access_token(self: Self, external_user_id: str, level_name: str) -> str:
+        """Get an SDK access token for a user.
+
+        Args:
+            external_user_id (str): The user id.
+            level_name (str): The name of the level configured in the dashboard.
+
+        Returns:
+            str: The access token.
+        """
+        # https://developers.sumsub.com/api-reference/#access-tokens-for-sdks
+        return await self.generate_token(external_user_id, level_name)
+
+    async def close(self: Self) -> None:
+        """Close the pooled connections."""
+        await self.client.aclose()
+
+
+_lock = threading.Lock()
+_sumsub_client = None
+
+
+def get_sumsub_client() -> SumsubClient:
+    """Get the process-wide Sumsub client.
+
+    Returns:
+        SumsubClient: The shared client.
+    """
+    global _sumsub_client
+    with _lock:
+        if _sumsub_client is None:
+            _sumsub_client = SumsubClient()
+        return _sumsub_client
+
+
+async def close_sumsub_client() -> None:
+    """Close the shared Sumsub client."""
+    global _sumsub_client
+    with _lock:
+        client, _sumsub_client = _sumsub_client, None
+
+    if client is not None:
+        await client.close()
+
+
+class AccessTokenCache():
+    """Sumsub access tokens per (user, level), reused until close to expiry.
+
+    Concurrent requests for a token that has to be refreshed wait on the
+    same Sumsub call.
+    """
+
+    def __init__(
+            self: Self,
+            fetch: Callable[[str, str, int], Awaitable[str]] = None,
+            ttl_in_secs: int = SUMSUB_TOKEN_TTL_SECONDS,
+            refresh_margin: float = SUMSUB_TOKEN_REFRESH_SECONDS,
+            max_size: int = SUMSUB_TOKEN_CACHE_SIZE) -> None:
+        """Create an empty cache.
+
+        Args:
+            fetch (Callable[[str, str, int], Awaitable[str]], optional):
+                Generates a token for (uid, level_name, ttl_in_secs).
+                Defaults to the shared `SumsubClient`.
+            ttl_in_secs (int, optional): Lifespan of the generated tokens.
+            refresh_margin (float, optional): Tokens with less than this
+                many seconds left are not handed out anymore.
+            max_size (int, optional): Max number of tokens to keep.
+        """
+        self.fetch = fetch or (
+            lambda uid, level_name, ttl: get_sumsub_client().generate_token(
+                uid, level_name, ttl
+            )
+        )
+        self.ttl_in_secs = ttl_in_secs
+        self.refresh_margin = refresh_margin
+        self._tokens = LRUCache(max_size)
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    async def _refresh(self: Self, key: Tuple[str, str]) -> str:
+        started = time.monotonic()
+        token = await self.fetch(key[0], key[1], self.ttl_in_secs)
+        if not token:
+            raise ValueError(f"Sumsub returned no access token for {key[0]}")
+
+        # the token lifetime starts when it is requested
+        self._tokens.set(key, (token, started + self.ttl_in_secs))
+        return token
+
+    async def get(self: Self, uid: str, level_name: str) -> str:
+        """Get a token, generating a new one if needed.
+
+        Args:
+            uid (str): The external user ID which will be bound to the token.
+            level_name (str): The name of the level configured in the dashboard.
+
+        Raises:
+            ValueError: If Sumsub did not return a token.
+
+        Returns:
+            str: An access token with at least `refresh_margin` seconds left.
+        """
+        key = (uid, level_name)
+        cached = self._tokens.get(key)
+        if cached is not None and \
+                cached[1] - time.monotonic() > self.refresh_margin:
+            return cached[0]
+
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh(key))
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        # a cancelled request must not cancel the refresh for the others
+        return await asyncio.shield(future)
+
+
+access_tokens = AccessTokenCache()
@@ -1,25 +1,25 @@
 """Utils."""
 import datetime
-import json
+import hashlib
 import logging
 import os
-from typing import List
+from typing import Any, Dict, List, Mapping, Type
 from typing_extensions import Unpack
 from functools import wraps
 
+from bizlogic.loan.status import LoanStatusType
+
 from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from firebase_admin import auth
-
-from google.auth.transport.requests import AuthorizedSession
-from google.oauth2 import service_account
-
 from ipfskvs.store import Store
 
 import pandas as pd
 
-from src import FIREBASE_PROJECT_ID
+from pydantic import BaseModel
+
+from src.auth import verify_id_token
+from src.flags import flags
 from src.schemas import SuccessOrFailureResponse
 
 
@@ -45,12 +45,9 @@ class RouterUtils:
                 headers={'WWW-Authenticate': 'Bearer realm="auth_required"'},
             )
         try:
-            if os.environ['NODE_ENV'] == 'development':
-                # When using the Firebase Authentication emulator,
-                # trust the UID in the decoded token.
-                decoded_token = {'uid': request.headers.get('X-User-Uid')}
-            else:
-                decoded_token = auth.verify_id_token(credential.credentials)
+            uid = RouterUtils.user_from_token(
+                credential.credentials, request.headers
+            )
         except Exception as err:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -59,42 +56,98 @@ class RouterUtils:
             )
 
         res.headers['WWW-Authenticate'] = 'Bearer realm="auth_required"'
-        return decoded_token['uid']
+        return uid
 
     @staticmethod
-    def sanitize_output(data):
-        for item in data:
-            if 'loan_status' in item:
-                item['loan_status'] = item['loan_status'].value
+    def user_from_token(token: str, headers: Mapping[str, str]) -> str:
+        """Get the user id from a Firebase ID token.
+
+        Args:
+            token (str): The ID token.
+            headers (Mapping[str, str]): The request headers.
 
-            if 'created' in item:
-                item['created'] = item['created'].to_pydatetime()
+        Raises:
+            Exception: If the token is invalid.
 
-            if 'offer_expiry' in item:
-                item['offer_expiry'] = item['offer_expiry'].to_pydatetime()
+        Returns:
+            str: The user id.
+        """
+        if os.environ['NODE_ENV'] == 'development':
+            # When using the Firebase Authentication emulator,
+            # trust the UID in the decoded token.
+            return headers.get('X-User-Uid')
+        return verify_id_token(token)['uid']
+
+    @staticmethod
+    def make_etag(*parts: Any) -> str:
+        """Build a strong ETag from the values a response depends on.
+
+        Args:
+            *parts (Any): The version of the data and the request
+                parameters, ex: `StoreIndex.version`, `limit`.
+
+        Returns:
+            str: The quoted ETag.
+        """
+        key = "\x1f".join(str(part) for part in parts)
+        return f'"{hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]}"'
+
+    @staticmethod
+    def etag_matches(request: Request, etag: str) -> bool:
+        """Check if the client already has the version `etag`.
+
+        Args:
+            request (Request): The request with an `If-None-Match` header.
+            etag (str): The quoted ETag of the current response.
+
+        Returns:
+            bool: True if the server can reply with `304 Not Modified`.
+        """
+        if_none_match = request.headers.get('if-none-match')
+        if not if_none_match:
+            return False
+
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in candidates or etag in candidates or \
+            f'W/{etag}' in candidates
+
+    @staticmethod
+    def sanitize_output(
+            data: pd.DataFrame,
+            model: Type[BaseModel] = None) -> pd.DataFrame:
+        """Convert a dataframe to the response format, column by column.
+
+        Args:
+            data (pd.DataFrame): The rows.
+            model (Type[BaseModel], optional): Only keep the columns that
+                are fields of this response model.
+
+        Returns:
+            pd.DataFrame: The converted copy of the rows.
+        """
+        if model is not None:
+            data = data[[
+                column for column in model.model_fields
+                if column in data.columns
+            ]]
+
+        data = data.copy()
+        if 'loan_status' in data.columns:
+            data['loan_status'] = data['loan_status'].map(
+                {status: status.value for status in LoanStatusType}
+            )
+
+        for column in ['created', 'offer_expiry']:
+            if column in data.columns:
+                data[column] = pd.to_datetime(data[column])
 
         return data
 
-def get_config() -> None:
-    """Get the feature flag config."""
-    scopes = [
-        "https://www.googleapis.com/auth/firebase.remoteconfig"
-    ]
-
-    # Authenticate a credential with the service account
-    credentials = service_account.Credentials.from_service_account_file(
-        os.environ['FIREBASE_CREDENTIALS_PATH'], scopes=scopes)
-
-    authed_session = AuthorizedSession(credentials)
-    # https://firebase.google.com/docs/reference/remote-config/rest/v1/projects/getRemoteConfig
-    url = f"https://firebaseremoteconfig.googleapis.com/v1/projects/{FIREBASE_PROJECT_ID}/remoteConfig"  # noqa: E501
-    response = authed_session.get(url)
-    response = json.loads(response.content.decode('utf-8'))
-    response = response.get("parameters")
-
-    # feature_flags = []
-    # for flag in response.keys():
-    #     if response.get(flag).get('valueType') == 'BOOLEAN':
-    #         default_value = bool(response.get(flag).get('defaultValue').get('value'))  # noqa: E501
-
-    print(response)
+
+def get_config() -> Dict[str, Any]:
+    """Get the feature flag config.
+
+    Returns:
+        Dict[str, Any]: The flags loaded so far, see `src.flags`.
+    """
+    return flags.all()
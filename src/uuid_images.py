@@ -1,50 +1,289 @@
+import os
+import sqlite3
+import threading
 import uuid
-import imageio
-import numpy as np
-from PIL import Image
-from io import BytesIO
-from uuidtoimage.generate import Generate
-from ipfsclient.ipfs import Ipfs
+from typing import Dict, Iterable, Optional, Self
 
+import pandas as pd
 
-client = Ipfs()  # defaults to http://127.0.0.1:5001/api/v0
-client.mkdir("CDN")
+from src.cache import LRUCache
+from src.image_render import render_pngs
+from src.ipfs import get_ipfs_client
 
-def add_uuid_images(data):
-    """Parses data and adds IPFS links to images.
 
-    For each UUID found in the data, generate an image and add it to IPFS.
-    Then, add the IPFS link to the data.
+IMAGE_WIDTH, IMAGE_HEIGHT = 100, 100
+UUID_IMAGE_INDEX_PATH = os.environ.get(
+    "UUID_IMAGE_INDEX_PATH", os.path.join(".cache", "uuid_images.sqlite3")
+)
+UUID_IMAGE_CACHE_SIZE = int(os.environ.get("UUID_IMAGE_CACHE_SIZE", 10000))
+
+CDN_DIRECTORY = "CDN"
+
+# "http": link to the `/image/{uuid}.png` endpoint of this server,
+# "ipfs": upload the images to IPFS and link to their CIDs. Only "ipfs"
+# uploads images, so the `UuidImageIndex` of their CIDs is opt-in.
+UUID_IMAGE_LINKS = os.environ.get("UUID_IMAGE_LINKS", "http")
+
+
+class UuidImageIndex():
+    """Persistent UUID --> CID index for generated images.
+
+    The image for a UUID never changes, so once it has been uploaded
+    the CID is kept in an in-memory LRU backed by a local sqlite file.
+    It is only used with `UUID_IMAGE_LINKS=ipfs`.
+    """
+
+    def __init__(self: Self, path: str, max_size: int) -> None:
+        """Open (or create) the index.
+
+        Args:
+            path (str): The sqlite file for the on-disk store.
+            max_size (int): Max number of CIDs to keep in memory.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.memory = LRUCache(max_size)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS uuid_images "
+                "(key TEXT PRIMARY KEY, cid TEXT NOT NULL)"
+            )
+
+    @staticmethod
+    def key(uuid_string: str, width: int, height: int) -> str:
+        """Get the index key for an image.
+
+        Args:
+            uuid_string (str): The UUID the image is generated from.
+            width (int): The image width.
+            height (int): The image height.
+
+        Returns:
+            str: The index key.
+        """
+        return f"{uuid.UUID(uuid_string)}/{width}x{height}"
+
+    def get_many(self: Self, keys: Iterable[str]) -> Dict[str, str]:
+        """Look up the CIDs for many images at once.
+
+        Args:
+            keys (Iterable[str]): The index keys.
+
+        Returns:
+            Dict[str, str]: key --> CID for every key that is indexed.
+        """
+        result = {}
+        missing = []
+        for key in keys:
+            cid = self.memory.get(key)
+            if cid is None:
+                missing.append(key)
+            else:
+                result[key] = cid
+
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT key, cid FROM uuid_images WHERE key IN ({placeholders})",  # noqa: E501
+                    missing
+                ).fetchall()
+            for key, cid in rows:
+                self.memory.set(key, cid)
+                result[key] = cid
+
+        return result
+
+    def get(self: Self, key: str) -> Optional[str]:
+        """Look up the CID for an image.
+
+        Args:
+            key (str): The index key.
+
+        Returns:
+            Optional[str]: The CID, or None if the image is not indexed.
+        """
+        return self.get_many([key]).get(key)
+
+    def set(self: Self, key: str, cid: str) -> None:
+        """Index the CID for an image.
+
+        Args:
+            key (str): The index key.
+            cid (str): The CID of the uploaded image.
+        """
+        self.memory.set(key, cid)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO uuid_images (key, cid) VALUES (?, ?)",
+                (key, cid)
+            )
+
+
+_lock = threading.Lock()
+_index = None
+_cdn_ready = False
+
+
+def get_index() -> UuidImageIndex:
+    """Get the process-wide image index, opening it on first use.
+
+    Returns:
+        UuidImageIndex: The shared index.
+    """
+    global _index
+    with _lock:
+        if _index is None:
+            _index = UuidImageIndex(UUID_IMAGE_INDEX_PATH, UUID_IMAGE_CACHE_SIZE)  # noqa: E501
+        return _index
+
+
+def prepare_cdn() -> None:
+    """Create the IPFS directory the images are uploaded to (once).
+
+    This is blocking, run it with the executor.
     """
+    global _cdn_ready
+    if not _cdn_ready:
+        get_ipfs_client().mkdir(CDN_DIRECTORY)
+        _cdn_ready = True
 
-    uuids = [data["metadata"]["loan"]] + [schedule["paymentId"] for schedule in data["repaymentSchedule"]]
 
-    for uuid_string in uuids:
-        my_uuid = uuid.UUID(uuid_string)
-        width, height = 100, 100
+def render_uuid_image(
+        uuid_string: str,
+        width: int = IMAGE_WIDTH,
+        height: int = IMAGE_HEIGHT) -> bytes:
+    """Generate the PNG image for a UUID.
 
-        image = Generate.generate_image(width, height, my_uuid)
+    Args:
+        uuid_string (str): The UUID to render.
+        width (int, optional): The image width.
+        height (int, optional): The image height.
 
-        # Convert array to Image
-        img = Image.fromarray(image.astype('uint8'))
+    Returns:
+        bytes: The PNG data.
+    """
+    return render_pngs([uuid_string], width, height)[0]
 
-        # Convert Image to Bytes
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
 
+def get_uuid_image_cids(uuid_strings: Iterable[str]) -> Dict[str, str]:
+    """Get the IPFS CIDs of the images for many UUIDs.
+
+    Images are only generated and uploaded the first time a UUID is
+    seen. All the missing images are rendered together as one batch.
+
+    Args:
+        uuid_strings (Iterable[str]): The UUIDs.
+
+    Returns:
+        Dict[str, str]: UUID --> CID of its image.
+    """
+    keys = {
+        uuid_string: UuidImageIndex.key(uuid_string, IMAGE_WIDTH, IMAGE_HEIGHT)
+        for uuid_string in uuid_strings
+    }
+    index = get_index()
+    found = index.get_many(keys.values())
+
+    missing = [
+        uuid_string for uuid_string, key in keys.items() if key not in found
+    ]
+    if not missing:
+        return {
+            uuid_string: found[key] for uuid_string, key in keys.items()
+        }
+
+    prepare_cdn()
+    client = get_ipfs_client()
+    pngs = render_pngs(missing, IMAGE_WIDTH, IMAGE_HEIGHT)
+    for uuid_string, png in zip(missing, pngs):
         # Add Image to IPFS
-        filename = f"{uuid_string}.png"
-        cid = client.add(f"CDN/{filename}", buffer.read())
-
-        # Add IPFS link to data
-        ipfs_link = f"ipfs://{cid}"
-        if uuid_string == data["metadata"]["loan"]:
-            data["metadata"]["loanImageLink"] = ipfs_link
-        else:
-            for schedule in data["repaymentSchedule"]:
-                if schedule["paymentId"] == uuid_string:
-                    schedule["imageLink"] = ipfs_link
-                    break
+        cid = client.add(f"{CDN_DIRECTORY}/{uuid_string}.png", png)
+        index.set(keys[uuid_string], cid)
+        found[keys[uuid_string]] = cid
+
+    return {
+        uuid_string: found[key] for uuid_string, key in keys.items()
+    }
+
+
+def get_uuid_image_cid(uuid_string: str) -> str:
+    """Get the IPFS CID of the image for a UUID.
+
+    Args:
+        uuid_string (str): The UUID.
+
+    Returns:
+        str: The CID of the image.
+    """
+    return get_uuid_image_cids([uuid_string])[uuid_string]
+
+
+def get_uuid_image_links(
+        uuid_strings: Iterable[str],
+        base_url: str) -> Dict[str, str]:
+    """Get the links to the images for many UUIDs.
+
+    Args:
+        uuid_strings (Iterable[str]): The UUIDs.
+        base_url (str): The URL of this server, used for "http" links.
+
+    Returns:
+        Dict[str, str]: UUID --> link to its image, see `UUID_IMAGE_LINKS`.
+    """
+    if UUID_IMAGE_LINKS == "ipfs":
+        return {
+            uuid_string: f"ipfs://{cid}"
+            for uuid_string, cid in get_uuid_image_cids(uuid_strings).items()
+        }
+
+    base_url = base_url.rstrip("/")
+    return {
+        uuid_string: f"{base_url}/image/{uuid_string}.png"
+        for uuid_string in uuid_strings
+    }
+
+
+def add_uuid_images(data: dict, base_url: str) -> dict:
+    """Parses data and adds links to images.
+
+    For each UUID found in the data, add the link to its image.
+
+    Args:
+        data (dict): The loan details.
+        base_url (str): The URL of this server.
+
+    Returns:
+        dict: The loan details with the image links.
+    """
+    uuids = [data["metadata"]["loan"]] + [schedule["paymentId"] for schedule in data["repaymentSchedule"]]  # noqa: E501
+    links = get_uuid_image_links(uuids, base_url)
+
+    data["metadata"]["loanImageLink"] = links[data["metadata"]["loan"]]
+    for schedule in data["repaymentSchedule"]:
+        schedule["imageLink"] = links[schedule["paymentId"]]
 
     return data
+
+
+def add_uuid_image_links(df: pd.DataFrame, base_url: str) -> pd.DataFrame:
+    """Add a `loanImageLink` column to a dataframe of loans.
+
+    Args:
+        df (pd.DataFrame): The loans, with a `loan` column.
+        base_url (str): The URL of this server.
+
+    Returns:
+        pd.DataFrame: The loans with links to their images.
+    """
+    if df.empty:
+        return df
+
+    links = get_uuid_image_links(df['loan'].unique(), base_url)
+    df = df.copy()
+    df['loanImageLink'] = df['loan'].map(links)
+    return df
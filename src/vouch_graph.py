@@ -0,0 +1,199 @@
+"""In-memory adjacency index of the vouch graph.
+
+Every vouch is an edge from the voucher to the vouchee. `VouchGraph`
+keeps the forward (voucher --> vouches) and reverse (vouchee --> vouches)
+edges of every user, built from the vouch `StoreIndex`. The store index
+is append-only, so `refresh()` only reads the records added since the
+last refresh.
+
+```py
+    from src.vouch_graph import get_vouch_graph
+
+    graph = get_vouch_graph()
+    graph.refresh()
+    rows = graph.vouches("123", "voucher", recent=True)
+```
+"""
+import os
+import threading
+from collections import defaultdict, deque
+from typing import Dict, List, Self, Set, Tuple
+
+from bizlogic.utils import ParserType
+
+from src.store_index import StoreIndex, get_store_index
+
+VOUCH_GRAPH_MAX_DEPTH = int(os.environ.get("VOUCH_GRAPH_MAX_DEPTH", 3))
+VOUCH_GRAPH_MAX_NODES = int(os.environ.get("VOUCH_GRAPH_MAX_NODES", 1000))
+
+PERSPECTIVES = ("voucher", "vouchee")
+DIRECTIONS = ("out", "in", "both")
+
+
+class VouchGraph():
+    """Forward and reverse vouch edges keyed by user id."""
+
+    def __init__(self: Self, index: StoreIndex) -> None:
+        """Create an empty graph.
+
+        Args:
+            index (StoreIndex): The vouch index to build the graph from.
+        """
+        self.index = index
+        self.generation = 0
+
+        # vouch id --> edge
+        self._voucher: Dict[str, str] = {}
+        self._vouchee: Dict[str, str] = {}
+        self._rows: Dict[str, List[int]] = defaultdict(list)
+        self._latest: Dict[str, Tuple[object, int]] = {}
+
+        # user id --> vouch ids
+        self._forward: Dict[str, Set[str]] = defaultdict(set)
+        self._reverse: Dict[str, Set[str]] = defaultdict(set)
+
+        # (voucher, vouchee) of every vouch, in the order they were added
+        self._edges: List[Tuple[str, str]] = []
+
+        self._synced = 0
+        self._lock = threading.Lock()
+
+    def refresh(self: Self) -> None:
+        """Add the vouches that were added to the index since last time."""
+        with self._lock:
+            frame = self.index.frame()
+            if len(frame) <= self._synced:
+                return
+
+            new = frame.iloc[self._synced:]
+            for row, vouch, voucher, vouchee, created in zip(
+                range(self._synced, len(frame)),
+                new['vouch'], new['voucher'], new['vouchee'], new['created']
+            ):
+                if vouch not in self._latest:
+                    self._voucher[vouch] = voucher
+                    self._vouchee[vouch] = vouchee
+                    self._forward[voucher].add(vouch)
+                    self._reverse[vouchee].add(vouch)
+                    self._edges.append((voucher, vouchee))
+
+                self._rows[vouch].append(row)
+                if vouch not in self._latest or \
+                        created >= self._latest[vouch][0]:
+                    self._latest[vouch] = (created, row)
+
+            self._synced = len(frame)
+            self.generation += 1
+
+    def edges(self: Self, start: int = 0) -> List[Tuple[str, str]]:
+        """Get the vouches added after the first `start` vouches.
+
+        Vouches are only ever added, so callers can keep their own copy
+        of the graph up to date with `edges(len(copy))`.
+
+        Args:
+            start (int, optional): The number of vouches already seen.
+
+        Returns:
+            List[Tuple[str, str]]: (voucher, vouchee) of each vouch.
+        """
+        with self._lock:
+            return self._edges[start:]
+
+    def vouches(
+            self: Self,
+            user: str,
+            perspective: str,
+            recent: bool = True) -> List[int]:
+        """Get the vouches of a user, in O(degree).
+
+        Args:
+            user (str): The user id.
+            perspective (str): "voucher" for the vouches by the user,
+                "vouchee" for the vouches for the user.
+            recent (bool, optional): Only get the most recent record of
+                each vouch, instead of every change (CDC).
+
+        Returns:
+            List[int]: The positions of the records in the index frame.
+        """
+        edges = self._forward if perspective == "voucher" else self._reverse
+        with self._lock:
+            vouch_ids = edges.get(user, ())
+            if recent:
+                return sorted(self._latest[vouch][1] for vouch in vouch_ids)
+            return sorted(
+                row for vouch in vouch_ids for row in self._rows[vouch]
+            )
+
+    def neighbourhood(
+            self: Self,
+            user: str,
+            depth: int = 1,
+            direction: str = "both",
+            max_nodes: int = VOUCH_GRAPH_MAX_NODES) -> Tuple[Dict[str, int], List[dict]]:  # noqa: E501
+        """Get the users within `depth` vouches of a user, breadth first.
+
+        Args:
+            user (str): The user id.
+            depth (int, optional): Max number of vouches between the user
+                and the users returned.
+            direction (str, optional): Follow the vouches by each user
+                ("out"), for each user ("in") or both.
+            max_nodes (int, optional): Stop after this many users.
+
+        Returns:
+            Tuple[Dict[str, int], List[dict]]: user id --> distance from
+                the user, and the vouches between the users found.
+        """
+        distances = {user: 0}
+        edges = {}
+        queue = deque([user])
+
+        with self._lock:
+            while queue:
+                current = queue.popleft()
+                if distances[current] >= depth:
+                    continue
+
+                vouch_ids = set()
+                if direction in ("out", "both"):
+                    vouch_ids |= self._forward.get(current, set())
+                if direction in ("in", "both"):
+                    vouch_ids |= self._reverse.get(current, set())
+
+                for vouch in sorted(vouch_ids):
+                    voucher = self._voucher[vouch]
+                    vouchee = self._vouchee[vouch]
+                    other = vouchee if voucher == current else voucher
+                    if other not in distances:
+                        if len(distances) >= max_nodes:
+                            # only keep edges between the users returned
+                            continue
+                        distances[other] = distances[current] + 1
+                        queue.append(other)
+
+                    edges[vouch] = {
+                        "vouch": vouch,
+                        "voucher": voucher,
+                        "vouchee": vouchee
+                    }
+
+        return distances, list(edges.values())
+
+
+_lock = threading.Lock()
+_graph = None
+
+
+def get_vouch_graph() -> VouchGraph:
+    """Get the process-wide vouch graph.
+
+    Returns:
+        VouchGraph: The shared graph, call `refresh()` before reading it.
+    """
+    global _graph
+    with _lock:
+        if _graph is None:
+            _graph = VouchGraph(get_store_index(ParserType.VOUCH))
+        return _graph
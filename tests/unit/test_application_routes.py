@@ -0,0 +1,156 @@
+"""Test src/routes/application.py."""
+import time
+from typing import List
+
+from bizlogic.application import PREFIX
+from bizlogic.protoc.loan_application_pb2 import LoanApplication as LoanApplicationMessage  # noqa: E501
+from bizlogic.utils import ParserType
+
+from fastapi.testclient import TestClient
+
+from ipfskvs.index import Index
+
+import pandas as pd
+
+import pytest
+
+from src import ipfs
+from src.routes.application import LoanApplicationRouter
+from src.store_index import get_store_index
+from src.utils import RouterUtils
+
+from .test_vouch_routes import make_client
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    """Serve the application routes for user "123"."""
+    return make_client(monkeypatch, LoanApplicationRouter)
+
+
+def login(client: TestClient, user: str) -> None:
+    """Send the next requests as another user."""
+    client.app.dependency_overrides[RouterUtils.get_user_token] = lambda: user  # noqa: E501
+
+
+def apply(client: TestClient, *asking: int) -> List[str]:
+    """Create loan applications, get their ids."""
+    response = client.post(
+        "/loan/application/bulk",
+        json=[{"asking": amount} for amount in asking]
+    )
+    return [item["id"] for item in response.json()]
+
+
+def records(application: str) -> pd.DataFrame:
+    """Get every record written for an application."""
+    frame = get_store_index(ParserType.LOAN_APPLICATION).frame()
+    return frame[frame['application'] == application]
+
+
+def test_withdraw_unknown_application(client: TestClient) -> None:
+    """Withdrawing an application that does not exist is a 404."""
+    # When
+    response = client.delete("/loan/application/unknown")
+
+    # Then
+    assert response.status_code == 404
+
+
+def test_withdraw_application_of_another_user(client: TestClient) -> None:
+    """Only the borrower can withdraw an application."""
+    # Given
+    application, = apply(client, 100)
+    login(client, "321")
+
+    # When
+    response = client.delete(f"/loan/application/{application}")
+
+    # Then
+    assert response.status_code == 403
+    assert records(application)['closed'].tolist() == [False]
+
+
+def test_withdraw_updates_the_application(client: TestClient) -> None:
+    """The withdrawal is written to the same application id."""
+    # Given
+    application, other = apply(client, 100, 200)
+
+    # When
+    response = client.delete(f"/loan/application/{application}")
+
+    # Then
+    assert response.json()["success"] is True
+    withdrawn = records(application).sort_values('created')
+    assert withdrawn['closed'].tolist() == [False, True]
+    assert withdrawn['amount_asking'].tolist() == [100, 100]
+    assert records(other)['closed'].tolist() == [False]
+    frame = get_store_index(ParserType.LOAN_APPLICATION).frame()
+    assert set(frame['application']) == {application, other}
+
+
+def test_withdraw_closed_application(client: TestClient) -> None:
+    """A closed application is not written again."""
+    # Given
+    application, = apply(client, 100)
+    client.delete(f"/loan/application/{application}")
+    files = len(ipfs.get_ipfs_client().files)
+
+    # When
+    response = client.delete(f"/loan/application/{application}")
+
+    # Then
+    assert response.json()["success"] is True
+    assert len(ipfs.get_ipfs_client().files) == files
+    assert len(records(application)) == 2
+
+
+def test_withdraw_batch(client: TestClient) -> None:
+    """Applications listed twice are withdrawn once."""
+    # Given
+    first, second = apply(client, 100, 200)
+
+    # When
+    response = client.post(
+        "/loan/application/withdraw",
+        json={"applications": [first, second, first, "unknown"]}
+    )
+
+    # Then
+    results = response.json()
+    assert [item["index"] for item in results] == [0, 1, 2, 3]
+    assert [item["id"] for item in results] == [
+        first, second, first, "unknown"
+    ]
+    assert [item["success"] for item in results] == [True, True, True, False]
+    assert records(first)['closed'].tolist() == [False, True]
+    assert records(second)['closed'].tolist() == [False, True]
+
+
+def test_applications_default_to_the_latest_record(
+        client: TestClient) -> None:
+    """Only `recent=false` returns every record of an application."""
+    # Given
+    application, = apply(client, 100)
+
+    # a later record of the same open application
+    update = Index(
+        prefix=PREFIX,
+        index={"borrower": "123", "application": application},
+        subindex=Index(index={"created": str(time.time_ns())})
+    )
+    get_store_index(ParserType.LOAN_APPLICATION).record(
+        update, LoanApplicationMessage(amount_asking=200, closed=False)
+    )
+
+    # When
+    latest = client.get("/loan/application").json()
+    history = client.get("/loan/application?recent=false").json()
+    mine = client.get("/loan/application/user/self").json()
+    my_history = client.get("/loan/application/user/self?recent=false").json()  # noqa: E501
+
+    # Then
+    assert [row["amount_asking"] for row in latest] == [200]
+    assert [row["amount_asking"] for row in mine] == [200]
+    assert sorted(row["amount_asking"] for row in history) == [100, 200]
+    assert sorted(row["amount_asking"] for row in my_history) == [100, 200]
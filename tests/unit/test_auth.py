@@ -0,0 +1,138 @@
+"""Test src/auth.py."""
+import base64
+import json
+import time
+from typing import Iterator, Self
+
+import firebase_admin
+from firebase_admin import auth, credentials
+
+from google.auth.credentials import AnonymousCredentials
+
+import pytest
+
+import src.auth
+from src.auth import TokenCache, prefetch_certificates, seconds_until_stale, verify_id_token  # noqa: E501
+
+
+def test_token_cache_expires_with_token() -> None:
+    """Tokens are only served from the cache until their `exp` claim."""
+    # Given
+    cache = TokenCache(10)
+    cache.set("valid", {"uid": "a", "exp": time.time() + 60})
+    cache.set("expired", {"uid": "b", "exp": time.time() - 1})
+
+    # Then
+    assert cache.get("valid")["uid"] == "a"
+    assert cache.get("expired") is None
+    assert cache.get("unknown") is None
+
+
+def test_verify_id_token_is_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A token is only verified by firebase once."""
+    # Given
+    calls = []
+
+    def verify(token: str) -> dict:
+        calls.append(token)
+        return {"uid": "a", "exp": time.time() + 60}
+
+    monkeypatch.setattr(auth, "verify_id_token", verify)
+    monkeypatch.setattr(src.auth, "token_cache", TokenCache(10))
+
+    # When
+    first = verify_id_token("token")
+    second = verify_id_token("token")
+
+    # Then
+    assert first == second
+    assert calls == ["token"]
+
+
+def test_seconds_until_stale() -> None:
+    """The freshness left is counted from the response date."""
+    # Given
+    headers = {
+        "cache-control": "public, max-age=100, must-revalidate",
+        "date": "Thu, 01 Jun 2023 00:00:00 GMT",
+    }
+    fetched = 1685577600.0
+
+    # Then
+    assert seconds_until_stale(headers, now=fetched + 40) == 60
+    assert seconds_until_stale({}, now=fetched) == \
+        src.auth.CERT_REFRESH_SECONDS
+
+
+class FakeCredential(credentials.Base):
+    """Credential that never calls Google."""
+
+    def get_credential(self: Self) -> AnonymousCredentials:
+        """Get the google.auth credential."""
+        return AnonymousCredentials()
+
+
+class FakeResponse():
+    """Certificates response of the fake verifier request."""
+
+    status = 200
+    headers = {"cache-control": "public, max-age=100"}
+    data = json.dumps({"other": "certificate"}).encode('utf-8')
+
+
+@pytest.fixture
+def firebase_app() -> Iterator[firebase_admin.App]:
+    """Initialize the default firebase app for project "test"."""
+    app = firebase_admin.initialize_app(
+        FakeCredential(), options={"projectId": "test"}
+    )
+    yield app
+    firebase_admin.delete_app(app)
+
+
+def unsigned_token() -> str:
+    """Get an ID token for project "test" with a bad signature."""
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(
+            json.dumps(data).encode('utf-8')
+        ).rstrip(b"=").decode('ascii')
+
+    now = int(time.time())
+    return ".".join([
+        encode({"alg": "RS256", "kid": "key", "typ": "JWT"}),
+        encode({
+            "aud": "test",
+            "iss": "https://securetoken.google.com/test",
+            "sub": "user",
+            "iat": now,
+            "exp": now + 3600,
+            "auth_time": now,
+        }),
+        "c2lnbmF0dXJl",
+    ])
+
+
+def test_prefetch_warms_the_verifier_cache(
+        firebase_app: firebase_admin.App) -> None:
+    """Prefetching requests the certificates `verify_id_token` reads.
+
+    This relies on firebase_admin internals, it fails if they move.
+    """
+    # Given
+    urls = []
+
+    def request(url: str, method: str = "GET", **kwargs: object) -> FakeResponse:  # noqa: E501
+        urls.append(url)
+        return FakeResponse()
+
+    auth._get_client(None)._token_verifier.request = request
+
+    # When
+    delay = prefetch_certificates()
+    with pytest.raises(auth.InvalidIdTokenError):
+        auth.verify_id_token(unsigned_token())
+
+    # Then
+    assert delay == 100
+    assert len(urls) == 2
+    assert urls[0] == urls[1]
@@ -0,0 +1,65 @@
+"""Test src/batch.py."""
+import asyncio
+
+from fastapi import HTTPException
+
+import pytest
+
+from src import batch
+
+
+def test_run_batch_returns_a_result_per_item() -> None:
+    """Items succeed or fail on their own, results keep the item order."""
+    # Given
+    async def process(item: int) -> str:
+        await asyncio.sleep(0.01 * (3 - item))
+        if item == 1:
+            raise ValueError("bad item")
+        if item == 2:
+            raise HTTPException(status_code=404, detail="missing")
+        return f"id-{item}"
+
+    # When
+    results = asyncio.run(batch.run_batch([0, 1, 2], process))
+
+    # Then
+    assert [result.index for result in results] == [0, 1, 2]
+    assert results[0].success is True
+    assert results[0].id == "id-0"
+    assert results[1].success is False
+    assert results[1].error_type == "ValueError"
+    assert results[2].error_message == "missing"
+
+
+def test_check_batch_size(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Batches over the limit are refused."""
+    # Given
+    monkeypatch.setattr(batch, "BATCH_MAX_SIZE", 2)
+
+    # Then
+    batch.check_batch_size([1, 2])
+    with pytest.raises(HTTPException) as error:
+        batch.check_batch_size([1, 2, 3])
+    assert error.value.status_code == 400
+
+
+def test_failure_logs_the_traceback_of_the_error(
+        caplog: pytest.LogCaptureFixture) -> None:
+    """Errors gathered earlier are logged with their own traceback."""
+    # Given
+    def fail() -> None:
+        raise ValueError("bad item")
+
+    try:
+        fail()
+    except ValueError as e:
+        error = e
+
+    # When, outside of the except block
+    result = batch.failure(3, error, "application")
+
+    # Then
+    assert result.error_message == "bad item"
+    record, = caplog.records
+    assert record.exc_info[1] is error
+    assert "in fail" in caplog.text
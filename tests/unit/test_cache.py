@@ -0,0 +1,28 @@
+"""Test src/cache.py."""
+from src.cache import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    """The least recently used entry is evicted first."""
+    # Given
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # When
+    cache.get("a")
+    cache.set("c", 3)
+
+    # Then
+    assert cache.get("a") == 1
+    assert "b" not in cache
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_cache_miss_returns_default() -> None:
+    """Missing keys return the default."""
+    cache = LRUCache(max_size=1)
+    assert cache.get("missing") is None
+    assert cache.get("missing", 0) == 0
+    assert cache.pop("missing", "x") == "x"
@@ -0,0 +1,119 @@
+"""Test src/changes.py."""
+import time
+
+from bizlogic.loan import PREFIX as LOAN_PREFIX
+from bizlogic.protoc.loan_pb2 import Loan
+from bizlogic.protoc.vouch_pb2 import Vouch
+from bizlogic.utils import ParserType
+from bizlogic.vouch import PREFIX as VOUCH_PREFIX
+
+from fastapi import HTTPException
+
+from ipfskvs.index import Index
+
+import pytest
+
+from src.changes import ChangeLog, START
+from src.store_index import StoreIndex
+
+from .test_store_index import InMemoryIpfs
+
+
+def vouch_index(created: int) -> Index:
+    """Get the index of a vouch written at `created` nanoseconds."""
+    return Index(
+        prefix=VOUCH_PREFIX,
+        index={"vouchee": "b1", "voucher": "v1", "vouch": "vouch1"},
+        subindex=Index(index={"created": str(created)})
+    )
+
+
+def loan_index(created: int) -> Index:
+    """Get the index of a loan written at `created` nanoseconds."""
+    return Index(
+        prefix=LOAN_PREFIX,
+        index={"borrower": "b1", "lender": "l1", "loan": "loan1"},
+        subindex=Index(index={"created": str(created)})
+    )
+
+
+def make_indexes() -> dict:
+    """Index loans and vouches, without reading from IPFS."""
+    ipfs = InMemoryIpfs()
+    return {
+        ParserType.LOAN: StoreIndex(ipfs, LOAN_PREFIX, Loan(), ParserType.LOAN),  # noqa: E501
+        ParserType.VOUCH: StoreIndex(ipfs, VOUCH_PREFIX, Vouch(), ParserType.VOUCH),  # noqa: E501
+    }
+
+
+def test_read_changes_in_key_order() -> None:
+    """Changes of every type are ordered by creation time."""
+    # Given
+    indexes = make_indexes()
+    indexes[ParserType.LOAN].record(loan_index(3), Loan())
+    indexes[ParserType.VOUCH].record(vouch_index(2), Vouch())
+    indexes[ParserType.LOAN].record(loan_index(1), Loan())
+
+    # When
+    first, cursor = ChangeLog.read(indexes, START, 2)
+    rest, end = ChangeLog.read(indexes, cursor, 10, settle=0)
+
+    # Then
+    assert [(key[0], kind, row) for key, kind, row in first] == [
+        (1, ParserType.LOAN, 1), (2, ParserType.VOUCH, 0)
+    ]
+    assert cursor == first[-1][0]
+    assert [(key[0], kind, row) for key, kind, row in rest] == [
+        (3, ParserType.LOAN, 0)
+    ]
+    assert ChangeLog.read(indexes, end, 10, settle=0) == ([], end)
+
+
+def test_cursors_resume_on_another_replica() -> None:
+    """A replica that indexed the same records continues from a cursor."""
+    # Given
+    replica, other = make_indexes(), make_indexes()
+    for indexes in (replica, other):
+        indexes[ParserType.LOAN].record(loan_index(1), Loan())
+        indexes[ParserType.VOUCH].record(vouch_index(2), Vouch())
+    other[ParserType.LOAN].record(loan_index(3), Loan())
+
+    # When
+    _, cursor = ChangeLog.read(replica, START, 10, settle=0)
+    changes, _ = ChangeLog.read(
+        other, ChangeLog.decode_cursor(ChangeLog.encode_cursor(cursor)), 10
+    )
+
+    # Then
+    assert [key[0] for key, _, _ in changes] == [3]
+
+
+def test_cursor_stays_behind_recent_changes() -> None:
+    """Recent changes are sent again, late records of replicas are not lost."""
+    # Given
+    indexes = make_indexes()
+    now = time.time_ns()
+    indexes[ParserType.LOAN].record(loan_index(now), Loan())
+
+    # When
+    changes, cursor = ChangeLog.read(indexes, START, 10, settle=60)
+    # a record of another replica, written just before, arrives late
+    indexes[ParserType.VOUCH].record(vouch_index(now - 1), Vouch())
+    again, _ = ChangeLog.read(indexes, cursor, 10, settle=60)
+
+    # Then
+    assert len(changes) == 1
+    assert cursor < changes[0][0]
+    assert [key[0] for key, _, _ in again] == [now - 1, now]
+
+
+def test_cursors() -> None:
+    """Cursors encode the key of a change."""
+    assert ChangeLog.decode_cursor(None) == START
+    assert ChangeLog.decode_cursor(
+        ChangeLog.encode_cursor((2, "loan/x"))
+    ) == (2, "loan/x")
+
+    with pytest.raises(HTTPException) as error:
+        ChangeLog.decode_cursor("not a cursor")
+    assert error.value.status_code == 400
@@ -0,0 +1,211 @@
+"""Test src/firestore/crud.py."""
+import asyncio
+import time
+from typing import Dict
+
+from fastapi import HTTPException
+
+import pytest
+
+from src.firestore import crud
+from src.sumsub import SUMSUB_LEVEL_NAME
+
+from .test_lock import FakeDocument, FakeTransaction
+
+
+class FakeDb():
+    """In-memory stand-in for the Firestore client."""
+
+    def __init__(self) -> None:
+        """Create an empty database."""
+        self.documents: Dict[str, FakeDocument] = {}
+
+    def collection(self, name: str) -> "FakeDb":
+        """Get the collection, there is only one."""
+        return self
+
+    def document(self, id: str) -> FakeDocument:
+        """Get a document, creating it if needed."""
+        return self.documents.setdefault(id, FakeDocument(id))
+
+    def transaction(self) -> FakeTransaction:
+        """Start a transaction."""
+        return FakeTransaction()
+
+
+@pytest.fixture
+def db(monkeypatch: pytest.MonkeyPatch) -> FakeDb:
+    """Use an in-memory database."""
+    db = FakeDb()
+    monkeypatch.setattr(crud, "get_db", lambda: db)
+    return db
+
+
+def event(type: str, answer: str, created: str) -> dict:
+    """Get an `applicantReviewed` or `applicantPending` webhook body."""
+    payload = {
+        "type": type,
+        "applicantId": "applicant",
+        "externalUserId": "user",
+        "reviewStatus": "completed" if answer else "pending",
+        "createdAtMs": created,
+    }
+    if answer:
+        payload["reviewResult"] = {"reviewAnswer": answer}
+    return payload
+
+
+def test_late_webhook_does_not_overwrite_newer_status(db: FakeDb) -> None:
+    """A pending event delivered after the review result is ignored."""
+    # Given
+    reviewed = event("applicantReviewed", "GREEN", "2024-02-21 13:23:19.321")
+    pending = event("applicantPending", None, "2024-02-21 13:20:00.000")
+
+    # When
+    crud.record_webhook(reviewed)
+    updated = db.document("user").data["sumsub_status_updated"]
+    crud.record_webhook(pending)
+
+    # Then
+    data = db.document("user").data
+    assert data["sumsub_status"]["reviewStatus"] == "completed"
+    assert data["sumsub_status"]["reviewResult"] == {"reviewAnswer": "GREEN"}
+    assert data["sumsub_status_updated"] == updated
+
+
+class FakeSumsub():
+    """Sumsub client that counts its calls."""
+
+    max_request_seconds = 50.0
+
+    def __init__(self) -> None:
+        """Create the client."""
+        self.calls = []
+
+    async def create_applicant(self, uid: str, level_name: str) -> str:
+        """Create an applicant."""
+        self.calls.append(("create_applicant", uid, level_name))
+        return "applicant"
+
+    async def get_applicant_status(self, applicant_id: str) -> dict:
+        """Get the status of an applicant."""
+        self.calls.append(("get_applicant_status", applicant_id))
+        return {"reviewStatus": "pending"}
+
+
+@pytest.fixture
+def sumsub(monkeypatch: pytest.MonkeyPatch) -> FakeSumsub:
+    """Use a fake Sumsub client."""
+    client = FakeSumsub()
+    monkeypatch.setattr(crud, "get_sumsub_client", lambda: client)
+    return client
+
+
+def test_cached_status() -> None:
+    """A stored status is served until it is older than the TTL."""
+    # Given
+    status = {"reviewStatus": "completed"}
+    data = {"sumsub_status": status, "sumsub_status_updated": 1000.0}
+
+    # Then
+    assert crud.cached_status(data, now=1000.0 + 10) == status
+    assert crud.cached_status(
+        data, now=1000.0 + crud.ONBOARD_STATUS_TTL_SECONDS + 1
+    ) is None
+    assert crud.cached_status({}, now=1000.0) is None
+    assert crud.cached_status(
+        {"sumsub_status": status}, now=1000.0
+    ) is None
+
+
+def test_record_webhook_stores_the_status(db: FakeDb) -> None:
+    """The status of a webhook event is stored on the user document."""
+    # When
+    stored = crud.record_webhook(
+        event("applicantReviewed", "GREEN", "2024-02-21 13:23:19.321")
+    )
+
+    # Then
+    assert stored is True
+    data = db.document("user").data
+    assert data["applicant_id"] == "applicant"
+    assert data["sumsub_status"] == {
+        "reviewStatus": "completed",
+        "reviewResult": {"reviewAnswer": "GREEN"},
+    }
+    assert data["sumsub_status_created"] == pytest.approx(1708521799.321)
+    assert crud.cached_status(data) == data["sumsub_status"]
+
+
+def test_record_webhook_ignores_other_events(db: FakeDb) -> None:
+    """Events without a user or a status are not stored."""
+    # Given
+    payload = event("applicantReviewed", "GREEN", "2024-02-21 13:23:19.321")
+    del payload["externalUserId"]
+
+    # Then
+    assert crud.record_webhook(payload) is False
+    assert crud.record_webhook({"externalUserId": "user"}) is False
+    assert db.documents == {}
+
+
+def test_onboarding_status_from_cache(db: FakeDb, sumsub: FakeSumsub) -> None:
+    """A fresh status is served without calling Sumsub or leasing the user."""
+    # Given
+    crud.record_webhook(
+        event("applicantReviewed", "GREEN", "2024-02-21 13:23:19.321")
+    )
+
+    # When
+    status = asyncio.run(crud.get_onboarding_status("user"))
+
+    # Then
+    assert status["reviewStatus"] == "completed"
+    assert sumsub.calls == []
+    assert "lease_owner" not in db.document("user").data
+
+
+def test_onboarding_status_from_sumsub(db: FakeDb, sumsub: FakeSumsub) -> None:
+    """Without a fresh status, the user is leased while Sumsub is called."""
+    # Given
+    leases = []
+    get_applicant_status = sumsub.get_applicant_status
+
+    async def check_lease(applicant_id: str) -> dict:
+        data = db.document("user").data
+        leases.append((data["locked"], data["lease_expiry"] - time.time()))
+        return await get_applicant_status(applicant_id)
+
+    sumsub.get_applicant_status = check_lease
+
+    # When
+    status = asyncio.run(crud.get_onboarding_status("user"))
+
+    # Then
+    assert status == {"reviewStatus": "pending"}
+    assert sumsub.calls == [
+        ("create_applicant", "user", SUMSUB_LEVEL_NAME),
+        ("get_applicant_status", "applicant"),
+    ]
+    (locked, lease_seconds), = leases
+    assert locked is True
+    # the lease outlives both Sumsub calls
+    assert lease_seconds > 2 * sumsub.max_request_seconds
+
+    data = db.document("user").data
+    assert data["locked"] is False
+    assert data["applicant_id"] == "applicant"
+    assert crud.cached_status(data) == {"reviewStatus": "pending"}
+
+
+def test_onboarding_status_while_leased(
+        db: FakeDb, sumsub: FakeSumsub) -> None:
+    """A second request for the same user is refused."""
+    # Given
+    db.document("user").set({"locked": True, "lease_expiry": time.time() + 60})
+
+    # Then
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(crud.get_onboarding_status("user"))
+    assert error.value.status_code == 400
+    assert sumsub.calls == []
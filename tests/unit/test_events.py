@@ -0,0 +1,80 @@
+"""Test src/events.py."""
+import asyncio
+import threading
+
+from bizlogic.utils import ParserType
+
+import pandas as pd
+
+from src.changes import ChangeLog
+from src.events import EventBroker, Subscription
+
+
+def test_subscribers_only_receive_matching_events() -> None:
+    """Events are filtered by kind and topic."""
+    async def run() -> tuple:
+        # Given
+        log = ChangeLog()
+        broker = EventBroker(log)
+        log.add_listener(broker.publish_changes)
+        everything = broker.subscribe()
+        loans = broker.subscribe(frozenset({"loan"}), {"borrower": "b1"})
+
+        # When: records are added from another thread
+        def write() -> None:
+            log.append(ParserType.LOAN, [(1, "a"), (2, "b")], pd.DataFrame({
+                "borrower": ["b1", "b2"],
+                "lender": ["l1", "l1"],
+                "loan": ["loan1", "loan2"],
+            }))
+            log.append(ParserType.VOUCH, [(3, "c")], pd.DataFrame({
+                "vouchee": ["b1"], "voucher": ["v1"], "vouch": ["vouch1"],
+            }))
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0)
+
+        broker.close()
+        await asyncio.sleep(0)
+        return (
+            [event async for event in everything.events(heartbeat=1)],
+            [event async for event in loans.events(heartbeat=1)],
+            log
+        )
+
+    # When
+    everything, loans, log = asyncio.run(run())
+
+    # Then
+    assert [
+        log.decode_cursor(event["cursor"]) for event in everything
+    ] == [(1, "a"), (2, "b"), (3, "c")]
+    assert [event["kind"] for event in everything] == ["loan", "loan", "vouch"]
+    assert [event["record"]["loan"] for event in loans] == ["loan1"]
+
+
+def test_slow_subscribers_are_closed() -> None:
+    """A subscriber with a full queue is closed after its queued events."""
+    async def run() -> list:
+        # Given
+        subscription = Subscription(asyncio.get_running_loop(), max_size=2)
+
+        # When
+        subscription.push([
+            {"kind": "loan", "record": {}, "seq": seq} for seq in range(5)
+        ])
+        return [event async for event in subscription.events(heartbeat=1)]
+
+    # Then
+    assert [event["seq"] for event in asyncio.run(run())] == [0, 1]
+
+
+def test_heartbeat_without_events() -> None:
+    """None is yielded when there are no events for a while."""
+    async def run() -> object:
+        subscription = EventBroker(ChangeLog()).subscribe()
+        return await subscription.events(heartbeat=0.01).__anext__()
+
+    assert asyncio.run(run()) is None
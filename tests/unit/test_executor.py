@@ -0,0 +1,77 @@
+"""Test src/executor.py."""
+import asyncio
+import threading
+
+import pytest
+
+from src.executor import BoundedExecutor
+
+
+def test_run_returns_result_off_the_event_loop() -> None:
+    """Blocking calls run on a worker thread."""
+    # Given
+    executor = BoundedExecutor({"ipfs": 2})
+    main_thread = threading.get_ident()
+
+    # When
+    result = asyncio.run(executor.run("ipfs", threading.get_ident))
+
+    # Then
+    assert result != main_thread
+    assert executor.stats()["ipfs"]["completed"] == 1
+    executor.shutdown()
+
+
+def test_run_respects_downstream_limit() -> None:
+    """No more than `limit` calls run at once for a downstream."""
+    # Given
+    executor = BoundedExecutor({"ipfs": 2}, max_workers=8)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def blocking_call() -> None:
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        threading.Event().wait(0.05)
+        with lock:
+            running.pop()
+
+    async def run_many() -> None:
+        await asyncio.gather(*[
+            executor.run("ipfs", blocking_call) for _ in range(6)
+        ])
+
+    # When
+    asyncio.run(run_many())
+
+    # Then
+    assert max(peak) == 2
+    assert executor.stats()["ipfs"]["max_waiting"] >= 4
+    assert executor.stats()["ipfs"]["in_flight"] == 0
+    executor.shutdown()
+
+
+def test_run_counts_failures() -> None:
+    """Exceptions propagate and are counted."""
+    # Given
+    executor = BoundedExecutor({"ipfs": 1})
+
+    def failing_call() -> None:
+        raise ValueError("boom")
+
+    # When
+    with pytest.raises(ValueError):
+        asyncio.run(executor.run("ipfs", failing_call))
+
+    # Then
+    assert executor.stats()["ipfs"]["failed"] == 1
+    executor.shutdown()
+
+
+def test_run_unknown_downstream() -> None:
+    """Unknown downstreams are rejected."""
+    executor = BoundedExecutor({"ipfs": 1})
+    with pytest.raises(KeyError):
+        asyncio.run(executor.run("nope", print))
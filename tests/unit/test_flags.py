@@ -0,0 +1,78 @@
+"""Test src/flags.py."""
+from typing import Any, Dict, List
+
+from src.flags import FeatureFlags, parse_value
+
+
+class FakeResponse():
+    """Just enough of `requests.Response`."""
+
+    def __init__(self, status_code: int, etag: str = None, body: dict = None) -> None:  # noqa: E501
+        """Create a response."""
+        self.status_code = status_code
+        self.headers = {'ETag': etag} if etag else {}
+        self.body = body
+
+    def raise_for_status(self) -> None:
+        """Responses are never errors."""
+
+    def json(self) -> dict:
+        """Get the body."""
+        return self.body
+
+
+class FakeSession():
+    """Serves a Remote Config template and honors `If-None-Match`."""
+
+    def __init__(self, etag: str, parameters: dict) -> None:
+        """Serve a template."""
+        self.etag = etag
+        self.parameters = parameters
+        self.requests: List[Dict[str, Any]] = []
+
+    def get(self, url: str, headers: dict, **kwargs: Any) -> FakeResponse:
+        """Get the template."""
+        self.requests.append(headers)
+        if headers.get('If-None-Match') == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.etag, {"parameters": self.parameters})
+
+
+def test_parse_value() -> None:
+    """Values are typed by their `valueType`."""
+    def param(value: str, value_type: str) -> dict:
+        return {"defaultValue": {"value": value}, "valueType": value_type}
+
+    assert parse_value(param("true", "BOOLEAN")) is True
+    assert parse_value(param("3", "NUMBER")) == 3
+    assert parse_value(param("0.5", "NUMBER")) == 0.5
+    assert parse_value(param('{"a": 1}', "JSON")) == {"a": 1}
+    assert parse_value(param("x", "STRING")) == "x"
+    assert parse_value({"defaultValue": {"useInAppDefault": True}}) is None
+
+
+def test_refresh_uses_etag() -> None:
+    """The template is only parsed again when its ETag changes."""
+    # Given
+    session = FakeSession("etag-1", {
+        "new_flow": {"defaultValue": {"value": "true"}, "valueType": "BOOLEAN"},  # noqa: E501
+    })
+    flags = FeatureFlags(url="https://remote.config", session=session)
+
+    # When
+    changed = [flags.refresh(), flags.refresh()]
+
+    # Then
+    assert changed == [True, False]
+    assert session.requests[1] == {"If-None-Match": "etag-1"}
+    assert flags.is_enabled("new_flow")
+    assert not flags.is_enabled("missing")
+    assert flags.get("missing", 1) == 1
+
+    # When the template changes
+    session.etag = "etag-2"
+    session.parameters = {}
+
+    # Then
+    assert flags.refresh()
+    assert flags.all() == {}
@@ -0,0 +1,77 @@
+"""Test src/image_render.py."""
+import uuid
+from io import BytesIO
+
+from PIL import Image
+
+import numpy as np
+
+import pytest
+
+from src import image_render
+from src.image_render import encode_pngs, generate_images, render_pngs
+
+from uuidtoimage.generate import Generate
+
+
+def test_generate_images_matches_generate() -> None:
+    """The batch renderer draws the same pixels as `Generate`."""
+    # Given
+    uuids = [
+        uuid.UUID("9f4c2a4e-8f3b-4a8e-9c1d-2b7e6f5a4d3c"),
+        uuid.UUID(int=0),
+        uuid.UUID(int=2**128 - 1),
+    ]
+
+    # When
+    images = generate_images(uuids, 32, 32)
+
+    # Then
+    assert images.shape == (3, 32, 32, 4)
+    for image, cur_uuid in zip(images, uuids):
+        expected = Generate.generate_image(32, 32, cur_uuid)
+        assert np.array_equal(image, expected)
+
+
+def test_render_pngs_in_batches(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Rendering in batches gives the same images, in order."""
+    # Given
+    monkeypatch.setattr(image_render, "IMAGE_RENDER_BATCH", 2)
+    uuids = [str(uuid.uuid4()) for _ in range(5)]
+    batches = []
+    generate = image_render.generate_images
+    monkeypatch.setattr(
+        image_render, "generate_images",
+        lambda batch, *size: batches.append(len(batch)) or generate(batch, *size)  # noqa: E501
+    )
+
+    # When
+    pngs = render_pngs(uuids, 16, 16)
+
+    # Then
+    assert batches == [2, 2, 1]
+    assert pngs == encode_pngs(generate(uuids, 16, 16))
+
+
+def test_generate_images_rejects_non_square() -> None:
+    """Only square images are supported."""
+    with pytest.raises(ValueError):
+        generate_images([uuid.uuid4()], 32, 16)
+
+
+def test_render_pngs_round_trip() -> None:
+    """The PNGs decode back to the rendered images."""
+    # Given
+    uuids = [str(uuid.uuid4()) for _ in range(3)]
+
+    # When
+    pngs = render_pngs(uuids, 16, 16)
+
+    # Then
+    images = generate_images(uuids, 16, 16)
+    for png, image in zip(pngs, images):
+        decoded = np.asarray(Image.open(BytesIO(png)))
+        assert np.array_equal(decoded, image)
+
+    assert render_pngs([], 16, 16) == []
+    assert encode_pngs(images[:0]) == []
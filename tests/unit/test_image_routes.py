@@ -0,0 +1,74 @@
+"""Test src/routes/image.py."""
+from io import BytesIO
+
+from PIL import Image
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import pytest
+
+from src.routes.image import IMMUTABLE, ImageRouter
+
+IMAGE_ID = "9f4c2a4e-8f3b-4a8e-9c1d-2b7e6f5a4d3c"
+
+
+@pytest.fixture
+def client() -> TestClient:
+    """Serve the image routes."""
+    app = FastAPI()
+    ImageRouter(app)
+    return TestClient(app)
+
+
+def test_get_image(client: TestClient) -> None:
+    """The PNG is sent with a strong ETag and cached forever."""
+    # When
+    response = client.get(f"/image/{IMAGE_ID}.png")
+
+    # Then
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert response.headers["etag"].startswith('"')
+    assert Image.open(BytesIO(response.content)).size == (100, 100)
+
+
+def test_get_image_not_modified(client: TestClient) -> None:
+    """A client with the current ETag gets an empty 304."""
+    # Given
+    etag = client.get(f"/image/{IMAGE_ID}.png").headers["etag"]
+
+    # When
+    response = client.get(
+        f"/image/{IMAGE_ID.upper()}.png",
+        headers={"If-None-Match": etag}
+    )
+
+    # Then
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"] == IMMUTABLE
+
+
+def test_get_image_changed(client: TestClient) -> None:
+    """A client with another image's ETag gets the image."""
+    # When
+    response = client.get(
+        f"/image/{IMAGE_ID}.png",
+        headers={"If-None-Match": '"other"'}
+    )
+
+    # Then
+    assert response.status_code == 200
+    assert response.content
+
+
+def test_get_image_invalid_uuid(client: TestClient) -> None:
+    """Only UUIDs have images."""
+    # When
+    response = client.get("/image/not-a-uuid.png")
+
+    # Then
+    assert response.status_code == 404
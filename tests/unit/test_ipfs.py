@@ -0,0 +1,82 @@
+"""Test src/ipfs.py."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Self, Tuple
+
+import pytest
+
+from src.ipfs import PooledIpfs
+
+
+class IpfsHandler(BaseHTTPRequestHandler):
+    """Answer every IPFS RPC call on keep-alive connections."""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    ports: List[int] = []
+
+    def do_POST(self: Self) -> None:  # noqa: N802
+        """Record the connection of the request and reply."""
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.ports.append(self.client_address[1])
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Length", "4")
+        self.end_headers()
+        self.wfile.write(b"data")
+
+    def log_message(self: Self, *args: object) -> None:
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def server() -> Iterator[Tuple[ThreadingHTTPServer, type]]:
+    """Run an IPFS RPC server on a free local port."""
+    handler = type("Handler", (IpfsHandler,), {"ports": [], "delay": 0.0})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_reuses_connections(server: Tuple[ThreadingHTTPServer, type]) -> None:
+    """Sequential calls share one keep-alive connection."""
+    # Given
+    httpd, handler = server
+    client = PooledIpfs(host="http://127.0.0.1", port=httpd.server_port)
+
+    # When
+    data = [client.read("loan/a") for _ in range(3)]
+
+    # Then
+    assert data == [b"data"] * 3
+    assert len(handler.ports) == 3
+    assert len(set(handler.ports)) == 1
+    client.close()
+
+
+def test_pool_size_bounds_connections(
+        server: Tuple[ThreadingHTTPServer, type]) -> None:
+    """Concurrent calls wait for a pooled connection instead of adding one."""
+    # Given
+    httpd, handler = server
+    handler.delay = 0.05
+    client = PooledIpfs(
+        host="http://127.0.0.1", port=httpd.server_port, pool_size=2
+    )
+    adapter = client.session.get_adapter(f"http://127.0.0.1:{httpd.server_port}")  # noqa: E501
+
+    # When
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        data = list(pool.map(client.read, [f"loan/{i}" for i in range(6)]))
+
+    # Then
+    assert data == [b"data"] * 6
+    assert adapter._pool_maxsize == 2
+    assert adapter._pool_block is True
+    assert len(set(handler.ports)) <= 2
+    client.close()
@@ -0,0 +1,75 @@
+"""Test src/loan_status.py."""
+import datetime
+
+from bizlogic.loan.status import LoanStatus, LoanStatusType
+
+import pandas as pd
+
+from src.loan_status import count_expired, loan_status_codes, loan_statuses, sorted_offer_expiry  # noqa: E501
+
+
+def test_loan_statuses_match_loan_status() -> None:
+    """Every row gets the same status as `LoanStatus.loan_status`."""
+    # Given
+    now = datetime.datetime.now(datetime.timezone.utc)
+    future = now + datetime.timedelta(days=1)
+    past = now - datetime.timedelta(days=1)
+    df = pd.DataFrame({
+        "loan": ["draft", "pending", "expired", "accepted", "late"],
+        "transaction": [None, "t", "t", "t", "t"],
+        "offer_expiry": [future, future, past, future, past],
+        "accepted": [False, False, False, True, True],
+    }, index=[10, 11, 12, 13, 14])
+
+    # When
+    statuses = loan_statuses(df)
+
+    # Then
+    expected = [
+        LoanStatus.loan_status(
+            {key: value for key, value in row.items() if value is not None}
+        )
+        for row in df.to_dict(orient='records')
+    ]
+    assert statuses.tolist() == expected
+    assert statuses.tolist() == [
+        LoanStatusType.DRAFT,
+        LoanStatusType.PENDING_ACCEPTANCE,
+        LoanStatusType.EXPIRED_UNACCEPTED,
+        LoanStatusType.ACCEPTED,
+        LoanStatusType.ACCEPTED,
+    ]
+    assert statuses.index.tolist() == df.index.tolist()
+
+
+def test_loans_without_transactions_are_drafts() -> None:
+    """Loans are drafts when there is no `transaction` column."""
+    # Given
+    df = pd.DataFrame({"loan": ["a", "b"], "accepted": [True, False]})
+
+    # Then
+    assert loan_status_codes(df).tolist() == [LoanStatusType.DRAFT.value] * 2
+    assert loan_statuses(pd.DataFrame()).empty
+
+
+def test_count_expired() -> None:
+    """Offers are counted as expired once `offer_expiry` has passed."""
+    # Given
+    now = datetime.datetime.now(datetime.timezone.utc)
+    df = pd.DataFrame({
+        "loan": ["a", "b", "c"],
+        "offer_expiry": [
+            now + datetime.timedelta(days=1),
+            now - datetime.timedelta(days=2),
+            now - datetime.timedelta(days=1),
+        ],
+    })
+
+    # When
+    offer_expiry = sorted_offer_expiry(df)
+
+    # Then
+    assert count_expired(offer_expiry, now) == 2
+    assert count_expired(offer_expiry, now - datetime.timedelta(days=3)) == 0
+    assert count_expired(offer_expiry, now + datetime.timedelta(days=2)) == 3
+    assert count_expired(sorted_offer_expiry(pd.DataFrame())) == 0
@@ -0,0 +1,176 @@
+"""Test src/firestore/lock.py."""
+import time
+from typing import Any
+
+from src.firestore.lock import acquire_lease, lease_held, lock_user, release_lease, unlock_user  # noqa: E501
+
+
+class FakeSnapshot():
+    """Document snapshot of `FakeDocument`."""
+
+    def __init__(self, data: dict) -> None:
+        """Snapshot the data."""
+        self.exists = data is not None
+        self._data = dict(data) if data is not None else None
+
+    def to_dict(self) -> dict:
+        """Get the document data."""
+        return self._data
+
+
+class FakeDocument():
+    """In-memory stand-in for a Firestore `DocumentReference`."""
+
+    def __init__(self, id: str, data: dict = None) -> None:
+        """Create the document."""
+        self.id = id
+        self.data = data
+
+    def get(self, **kwargs: Any) -> FakeSnapshot:
+        """Read the document."""
+        return FakeSnapshot(self.data)
+
+    def set(self, data: dict, merge: bool = False) -> None:
+        """Write the document."""
+        self.data = {**(self.data or {}), **data} if merge else dict(data)
+
+
+class FakeTransaction():
+    """Just enough of a Firestore `Transaction` for `transactional`.
+
+    Writes are applied on commit. The first `aborts` commits fail like
+    a commit that raced another transaction, and are retried.
+    """
+
+    def __init__(self, aborts: int = 0) -> None:
+        """Create the transaction."""
+        self._id = None
+        self._read_only = False
+        self._max_attempts = 5
+        self.aborts = aborts
+        self.attempts = 0
+        self.writes = []
+
+    def _clean_up(self) -> None:
+        self.writes = []
+        self._id = None
+
+    def _begin(self, retry_id: bytes = None) -> None:
+        self.attempts += 1
+        self._id = b"transaction"
+
+    def _commit(self) -> list:
+        from google.api_core.exceptions import Aborted
+
+        if self.aborts:
+            self.aborts -= 1
+            self._clean_up()
+            raise Aborted("contention")
+        for document, data, merge in self.writes:
+            document.set(data, merge=merge)
+        self._clean_up()
+        return []
+
+    def _rollback(self) -> None:
+        self._clean_up()
+
+    def set(self, document: FakeDocument, data: dict, merge: bool = False) -> None:  # noqa: E501
+        """Buffer a write until the commit."""
+        self.writes.append((document, data, merge))
+
+
+def test_lock_user_holds_lease_until_expiry() -> None:
+    """A second request can not lock the user until the lease expires."""
+    # Given
+    user_ref = FakeDocument("user")
+
+    # When
+    first = lock_user(user_ref, owner="a", lease_seconds=60)
+    second = lock_user(user_ref, owner="b", lease_seconds=60)
+
+    # Then
+    assert first is True
+    assert second is False
+    assert user_ref.data["locked"] is True
+    assert user_ref.data["lease_owner"] == "a"
+    assert lease_held(user_ref.data)
+    assert not lease_held(user_ref.data, now=time.time() + 61)
+
+
+def test_expired_lease_can_be_taken() -> None:
+    """A lock left behind by a crashed request expires."""
+    # Given
+    user_ref = FakeDocument("user", {"locked": True})
+
+    # Then
+    assert lock_user(user_ref, owner="b")
+    assert user_ref.data["lease_owner"] == "b"
+
+
+def test_unlock_user_only_releases_own_lease() -> None:
+    """A request whose lease was taken over does not unlock the user."""
+    # Given
+    user_ref = FakeDocument("user")
+    lock_user(user_ref, owner="b")
+
+    # Then
+    assert unlock_user(user_ref, owner="a") is False
+    assert user_ref.data["locked"] is True
+    assert unlock_user(user_ref, owner="b") is True
+    assert user_ref.data["locked"] is False
+
+
+def test_acquire_lease_in_a_transaction() -> None:
+    """The lease is written on commit, the previous document is returned."""
+    # Given
+    user_ref = FakeDocument("user", {"applicant_id": "applicant"})
+    transaction = FakeTransaction()
+
+    # When
+    data = acquire_lease(transaction, user_ref, "a", 60)
+
+    # Then
+    assert data == {"applicant_id": "applicant"}
+    assert user_ref.data["lease_owner"] == "a"
+    assert lease_held(user_ref.data)
+    assert not lease_held(user_ref.data, now=time.time() + 61)
+    assert acquire_lease(FakeTransaction(), user_ref, "b") is None
+    assert user_ref.data["lease_owner"] == "a"
+
+
+def test_acquire_lease_retries_aborted_transactions() -> None:
+    """A transaction that raced another one runs again."""
+    # Given
+    user_ref = FakeDocument("user")
+    transaction = FakeTransaction(aborts=1)
+
+    # When
+    data = acquire_lease(transaction, user_ref, "a")
+
+    # Then
+    assert data == {}
+    assert transaction.attempts == 2
+    assert user_ref.data["lease_owner"] == "a"
+
+
+def test_release_lease_in_a_transaction() -> None:
+    """Only the owner of the lease releases it."""
+    # Given
+    user_ref = FakeDocument("user")
+    acquire_lease(FakeTransaction(), user_ref, "a")
+
+    # When
+    other = release_lease(FakeTransaction(), user_ref, "b")
+
+    # Then
+    assert other is False
+    assert user_ref.data["locked"] is True
+    assert user_ref.data["lease_owner"] == "a"
+
+    # When
+    owner = release_lease(FakeTransaction(), user_ref, "a")
+
+    # Then
+    assert owner is True
+    assert user_ref.data["locked"] is False
+    assert user_ref.data["lease_owner"] is None
@@ -0,0 +1,99 @@
+"""Test the initialization steps and readiness of src/main.py."""
+import asyncio
+from typing import Callable, Dict
+
+from fastapi.testclient import TestClient
+
+import pytest
+
+from src import main
+
+
+@pytest.fixture(autouse=True)
+def readiness(monkeypatch: pytest.MonkeyPatch) -> Dict[str, str]:
+    """Start from no initialized steps, retry right away."""
+    state = {}
+    monkeypatch.setattr(main, "readiness", state)
+    monkeypatch.setattr(main, "INIT_RETRY_SECONDS", 0)
+    return state
+
+
+def flaky_step(failures: int, calls: list) -> Callable:
+    """Make a step that fails a few times before it succeeds."""
+    async def step() -> None:
+        calls.append(dict(main.readiness))
+        if len(calls) <= failures:
+            raise ConnectionError("not yet")
+
+    return step
+
+
+async def ok() -> None:
+    """Initialize nothing."""
+
+
+def test_required_step_is_retried(readiness: Dict[str, str]) -> None:
+    """A failed step runs again until it succeeds."""
+    # Given
+    calls = []
+
+    # When
+    result = asyncio.run(main.run_init_step("ipfs", flaky_step(2, calls)))
+
+    # Then
+    assert result is True
+    assert [call["ipfs"] for call in calls] == ["pending", "failed", "failed"]
+    assert readiness == {"ipfs": "ready"}
+
+
+def test_optional_step_is_not_retried(readiness: Dict[str, str]) -> None:
+    """A step without retry fails once."""
+    # Given
+    calls = []
+
+    # When
+    result = asyncio.run(main.run_init_step(
+        "loan_index", flaky_step(1, calls), retry=False
+    ))
+
+    # Then
+    assert result is False
+    assert len(calls) == 1
+    assert readiness == {"loan_index": "failed"}
+
+
+def test_ready_once_the_required_steps_are_ready() -> None:
+    """/ready answers 503 with the state of each step until it is ready."""
+    # Given
+    client = TestClient(main.app)
+    asyncio.run(main.run_init_step("firebase", ok))
+    asyncio.run(main.run_init_step(
+        "firestore", flaky_step(1, []), retry=False
+    ))
+    asyncio.run(main.run_init_step(
+        "loan_index", flaky_step(1, []), retry=False
+    ))
+
+    # When
+    response = client.get("/ready")
+
+    # Then
+    assert response.status_code == 503
+    assert response.json() == {
+        "ready": False,
+        "steps": {
+            "firebase": "ready",
+            "firestore": "failed",
+            "loan_index": "failed",
+        },
+    }
+
+    # When
+    asyncio.run(main.run_init_step("firestore", ok))
+    asyncio.run(main.run_init_step("ipfs", ok))
+    response = client.get("/ready")
+
+    # Then, optional steps do not block readiness
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    assert response.json()["steps"]["loan_index"] == "failed"
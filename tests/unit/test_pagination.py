@@ -0,0 +1,57 @@
+"""Test src/pagination.py."""
+import datetime
+
+from fastapi import HTTPException
+
+import pandas as pd
+
+import pytest
+
+from src.pagination import paginate
+
+
+@pytest.fixture
+def loans() -> pd.DataFrame:
+    """Loans with a tie on `created`."""
+    created = datetime.datetime(2023, 6, 1)
+    return pd.DataFrame({
+        "loan": ["c", "a", "b", "d"],
+        "created": [
+            created,
+            created,
+            created + datetime.timedelta(seconds=1),
+            created - datetime.timedelta(seconds=1),
+        ],
+    })
+
+
+def test_paginate_walks_every_row_once(loans: pd.DataFrame) -> None:
+    """Following the cursors returns every row in (created, id) order."""
+    # Given
+    seen = []
+    cursor = None
+
+    # When
+    while True:
+        page, cursor = paginate(loans, "loan", limit=2, cursor=cursor)
+        seen += list(page["loan"])
+        if cursor is None:
+            break
+
+    # Then
+    assert seen == ["d", "a", "c", "b"]
+
+
+def test_paginate_without_limit_returns_everything(
+        loans: pd.DataFrame) -> None:
+    """Pagination is opt in."""
+    page, cursor = paginate(loans, "loan")
+    assert len(page) == 4
+    assert cursor is None
+
+
+def test_paginate_invalid_cursor(loans: pd.DataFrame) -> None:
+    """Invalid cursors are a client error."""
+    with pytest.raises(HTTPException) as error:
+        paginate(loans, "loan", limit=1, cursor="not a cursor")
+    assert error.value.status_code == 400
@@ -0,0 +1,136 @@
+"""Test src/responses.py."""
+import datetime
+import json
+from typing import List
+
+from bizlogic.loan.status import LoanStatusType
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import pandas as pd
+
+from pydantic import TypeAdapter
+
+from src.responses import DataFrameJSONResponse, iter_ndjson
+from src.schemas import LoanResponse
+from src.utils import RouterUtils
+
+
+def test_iter_ndjson_yields_one_object_per_line() -> None:
+    """Each row is streamed as one JSON line, across chunks."""
+    # Given
+    df = pd.DataFrame({
+        "loan": ["a", "b", "c"],
+        "created": [datetime.datetime(2023, 6, 1)] * 3,
+        "loan_status": [LoanStatusType.DRAFT] * 3,
+    })
+
+    # When
+    chunks = list(iter_ndjson(df, chunk_size=2))
+
+    # Then
+    assert len(chunks) == 2
+    lines = b"".join(chunks).decode().splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [row["loan"] for row in rows] == ["a", "b", "c"]
+    assert rows[0]["loan_status"] == LoanStatusType.DRAFT.value
+    assert rows[0]["created"].startswith("2023-06-01T00:00:00")
+
+
+def test_iter_ndjson_empty() -> None:
+    """Nothing is streamed for no rows."""
+    assert list(iter_ndjson(pd.DataFrame())) == []
+
+
+def test_dataframe_json_response() -> None:
+    """The rows are rendered as one JSON array."""
+    # Given
+    df = pd.DataFrame({
+        "loan": ["a", "b"],
+        "created": [datetime.datetime(2023, 6, 1)] * 2,
+        "principal": [1, 2],
+    })
+
+    # When
+    response = DataFrameJSONResponse(df, headers={"X-Next-Cursor": "c"})
+
+    # Then
+    rows = json.loads(response.body)
+    assert [row["principal"] for row in rows] == [1, 2]
+    assert rows[0]["created"].startswith("2023-06-01T00:00:00")
+    assert response.headers["x-next-cursor"] == "c"
+    assert response.media_type == "application/json"
+
+
+def test_dataframe_json_response_empty() -> None:
+    """No rows are rendered as an empty array."""
+    assert DataFrameJSONResponse(pd.DataFrame()).body == b"[]"
+
+
+def test_rows_are_serialized_like_the_response_model() -> None:
+    """The JSON is the same as the pydantic serialization of the rows."""
+    # Given
+    df = pd.DataFrame({
+        "loan": ["a", "b"],
+        "loanImageLink": ["ipfs://cid/a.png", None],
+        "borrower": ["b1", "b2"],
+        "lender": ["l1", "l2"],
+        "created": [
+            datetime.datetime(2024, 1, 2, 3, 4, 5, 123456),
+            datetime.datetime(2024, 1, 2, 3, 4, 5),
+        ],
+        "principal": [100, 200],
+        "offer_expiry": [
+            datetime.datetime(2024, 2, 2, 3, 4, 5, 1),
+            datetime.datetime(2024, 2, 2, 3, 4, 5, 654321),
+        ],
+        "accepted": [True, False],
+        "payments": [3, 4],
+        "loan_status": [LoanStatusType.DRAFT, LoanStatusType.ACCEPTED],
+        "lender_deposit_wallet": ["w/1", "w/2"],
+        "borrower_deposit_wallet": ["w/3", "w/4"],
+    })
+    rows = RouterUtils.sanitize_output(df, LoanResponse)
+
+    # pydantic models of the same rows, like a `response_model` route
+    adapter = TypeAdapter(List[LoanResponse])
+    models = adapter.validate_python(df.assign(
+        loan_status=[LoanStatusType.DRAFT.value, LoanStatusType.ACCEPTED.value]  # noqa: E501
+    ).to_dict(orient="records"))
+    expected = JSONResponse(
+        jsonable_encoder(adapter.dump_python(models, mode="json"))
+    ).body
+
+    # When
+    body = DataFrameJSONResponse(rows).body
+    lines = b"".join(iter_ndjson(rows)).splitlines()
+
+    # Then
+    assert body == expected
+    assert b"\\/" not in body
+    assert json.loads(body)[0]["created"] == "2024-01-02T03:04:05.123456"
+    assert [json.loads(line) for line in lines] == json.loads(expected)
+
+
+def test_timezone_aware_datetimes() -> None:
+    """Aware datetimes keep their offset, UTC is written as Z."""
+    # Given
+    utc = datetime.timezone.utc
+    df = pd.DataFrame({
+        "created": [
+            datetime.datetime(2024, 1, 2, 3, 4, 5, 120000, tzinfo=utc),
+            None,
+        ],
+    })
+    adapter = TypeAdapter(datetime.datetime)
+
+    # When
+    rows = json.loads(DataFrameJSONResponse(df).body)
+
+    # Then
+    assert rows == [
+        {"created": adapter.dump_python(df["created"][0], mode="json")},
+        {"created": None},
+    ]
+    assert rows[0]["created"] == "2024-01-02T03:04:05.120000Z"
@@ -0,0 +1,218 @@
+"""Test src/store_index.py."""
+import asyncio
+import time
+from typing import Dict
+
+from bizlogic.loan import PREFIX
+from bizlogic.protoc.loan_pb2 import Loan
+from bizlogic.utils import ParserType
+
+from ipfskvs.index import Index
+from ipfskvs.store import Store
+
+import pytest
+
+from src import store_index
+from src.changes import ChangeLog
+from src.store_index import StoreIndex
+
+
+class InMemoryIpfs():
+    """Just enough of the `Ipfs` api to store and query files."""
+
+    def __init__(self) -> None:
+        """Create an empty file system."""
+        self.files: Dict[str, bytes] = {}
+        self.reads = 0
+
+    def add(self, filename: str, data: bytes) -> str:
+        """Add a file."""
+        self.files[filename] = data
+        return filename
+
+    def read(self, filename: str) -> bytes:
+        """Read a file."""
+        self.reads += 1
+        return self.files[filename]
+
+    def list_files(self, prefix: str = "") -> dict:
+        """List the entries of a directory (or the file itself)."""
+        prefix = prefix.strip("/")
+        if prefix in self.files:
+            return {"Entries": [{"Name": prefix.split("/")[-1]}]}
+
+        names = {
+            filename[len(prefix) + 1:].split("/")[0]
+            for filename in self.files
+            if filename.startswith(prefix + "/")
+        }
+        return {"Entries": [{"Name": name} for name in sorted(names)]}
+
+
+def write_loan(ipfs: InMemoryIpfs, loan: str, accepted: bool) -> Index:
+    """Write a loan record like `LoanWriter.write`."""
+    index = Index(
+        prefix=PREFIX,
+        index={"borrower": "b1", "lender": "l1", "loan": loan},
+        subindex=Index(index={"created": str(time.time_ns())})
+    )
+    Store(
+        index=index,
+        ipfs=ipfs,
+        writer=Loan(principal_amount=100, accepted=accepted)
+    ).add()
+    return index
+
+
+def test_refresh_only_reads_new_records() -> None:
+    """A refresh reads the records it has not seen before."""
+    # Given
+    ipfs = InMemoryIpfs()
+    write_loan(ipfs, "loan1", accepted=False)
+    index = StoreIndex(ipfs, PREFIX, Loan(), ParserType.LOAN)
+
+    # When
+    asyncio.run(index.snapshot())
+    write_loan(ipfs, "loan1", accepted=True)
+    index.refresh()
+
+    # Then
+    assert ipfs.reads == 2
+    assert index.generation == 2
+    assert len(index.frame()) == 2
+
+    latest = index.latest("loan")
+    assert len(latest) == 1
+    assert bool(latest.iloc[0]["accepted"]) is True
+
+
+def test_record_adds_local_writes_without_reading() -> None:
+    """Records written by this process are added without an IPFS read."""
+    # Given
+    ipfs = InMemoryIpfs()
+    index = StoreIndex(ipfs, PREFIX, Loan(), ParserType.LOAN)
+    index.refresh()
+
+    # When
+    written = write_loan(ipfs, "loan2", accepted=False)
+    index.record(written, Loan(principal_amount=100, accepted=False))
+    index.refresh()
+
+    # Then
+    assert ipfs.reads == 0
+    assert list(index.frame()["loan"]) == ["loan2"]
+    assert index.generation == 1
+
+
+def test_version_only_depends_on_the_records() -> None:
+    """Replicas that read the same records report the same version."""
+    # Given
+    ipfs = InMemoryIpfs()
+    first = write_loan(ipfs, "loan1", accepted=False)
+    second = write_loan(ipfs, "loan2", accepted=False)
+    index = StoreIndex(ipfs, PREFIX, Loan(), ParserType.LOAN)
+    replica = StoreIndex(ipfs, PREFIX, Loan(), ParserType.LOAN)
+    empty = index.version
+
+    # When
+    index.refresh()
+    replica.record(second, Loan(principal_amount=100, accepted=False))
+    partial = replica.version
+    replica.record(first, Loan(principal_amount=100, accepted=False))
+
+    # Then
+    assert index.version != empty
+    assert partial != index.version
+    assert replica.version == index.version
+
+    # adding a record that is already indexed keeps the version
+    index.record(first, Loan(principal_amount=100, accepted=False))
+    assert index.version == replica.version
+
+
+def test_new_records_are_added_to_the_change_log() -> None:
+    """Every record is sent to the change log once, with its key."""
+    # Given
+    ipfs = InMemoryIpfs()
+    log = ChangeLog()
+    appended = []
+    log.add_listener(lambda kind, keys, records: appended.append(
+        (kind, keys, records["accepted"].tolist())
+    ))
+    first = write_loan(ipfs, "loan1", accepted=False)
+    index = StoreIndex(ipfs, PREFIX, Loan(), ParserType.LOAN, change_log=log)
+
+    # When
+    index.refresh()
+    written = write_loan(ipfs, "loan1", accepted=True)
+    index.record(written, Loan(principal_amount=100, accepted=True))
+    index.refresh()
+
+    # Then
+    keys = [
+        (int(item.get_metadata()["created"]), item.get_filename())
+        for item in (first, written)
+    ]
+    assert appended == [
+        (ParserType.LOAN, keys[:1], [False]),
+        (ParserType.LOAN, keys[1:], [True]),
+    ]
+    assert index.changes(keys[0], 10) == [(keys[1], 1)]
+
+
+def test_refresh_loop_reads_records_of_other_replicas(
+        monkeypatch: pytest.MonkeyPatch) -> None:
+    """New records reach the change log without any read of the index."""
+    # Given
+    ipfs = InMemoryIpfs()
+    log = ChangeLog()
+    appended = []
+    log.add_listener(lambda kind, keys, records: appended.extend(keys))
+    index = StoreIndex(ipfs, PREFIX, Loan(), ParserType.LOAN, change_log=log)
+    index.refresh()
+    monkeypatch.setattr(store_index, "_indexes", {ParserType.LOAN: index})
+
+    async def run() -> None:
+        task = asyncio.create_task(store_index.refresh_indexes(interval=0))
+        # When, another replica writes a loan
+        write_loan(ipfs, "loan1", accepted=False)
+        for _ in range(100):
+            if appended:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+
+    # Then
+    assert len(appended) == 1
+    assert list(index.frame()["loan"]) == ["loan1"]
+
+
+def test_refresh_loop_survives_failures(
+        monkeypatch: pytest.MonkeyPatch) -> None:
+    """A failed refresh is retried on the next interval."""
+    # Given
+    calls = []
+
+    class FlakyIndex():
+        prefix = PREFIX
+
+        def refresh(self) -> None:
+            calls.append(None)
+            if len(calls) == 1:
+                raise ConnectionError("IPFS is down")
+
+    monkeypatch.setattr(store_index, "_indexes", {ParserType.LOAN: FlakyIndex()})  # noqa: E501
+
+    async def run() -> None:
+        task = asyncio.create_task(store_index.refresh_indexes(interval=0))
+        while len(calls) < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    # When
+    asyncio.run(asyncio.wait_for(run(), 5))
+
+    # Then
+    assert len(calls) >= 2
@@ -0,0 +1,195 @@
+"""Test src/sumsub.py."""
+import asyncio
+import hashlib
+import hmac
+
+import httpx
+
+import pytest
+
+from src.sumsub import AccessTokenCache, SUMSUB_BACKOFF_SECONDS, SumsubClient, sign_headers, verify_webhook, webhook_created, webhook_status  # noqa: E501
+
+
+@pytest.fixture(autouse=True)
+def sumsub_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Set fake Sumsub credentials."""
+    monkeypatch.setenv("SUMSUB_SECRET_KEY", "secret")
+    monkeypatch.setenv("SUMSUB_APP_TOKEN", "app-token")
+    monkeypatch.setenv("SUMSUB_WEBHOOK_SECRET", "webhook-secret")
+
+
+def test_sign_headers() -> None:
+    """The signature covers the timestamp, method, path and body."""
+    # When
+    headers = sign_headers("post", "/resources/applicants?levelName=a", b"{}", now=10)  # noqa: E501
+
+    # Then
+    expected = hmac.new(
+        b"secret", b"10POST/resources/applicants?levelName=a{}", hashlib.sha256
+    ).hexdigest()
+    assert headers == {
+        "X-App-Token": "app-token",
+        "X-App-Access-Ts": "10",
+        "X-App-Access-Sig": expected,
+    }
+
+
+def test_client_retries_server_errors() -> None:
+    """Server errors are retried with a fresh signature."""
+    # Given
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"id": "applicant"})
+
+    client = SumsubClient(
+        base_url="https://sumsub.test",
+        transport=httpx.MockTransport(handler)
+    )
+
+    # When
+    applicant_id = asyncio.run(client.create_applicant("user", "level"))
+
+    # Then
+    assert applicant_id == "applicant"
+    assert len(requests) == 2
+    assert requests[1].url.raw_path == b"/resources/applicants?levelName=level"  # noqa: E501
+    assert requests[1].headers["X-App-Token"] == "app-token"
+    assert requests[1].content == b'{"externalUserId": "user"}'
+
+
+def test_max_request_seconds() -> None:
+    """Every attempt times out after the longest backoff."""
+    # Given
+    client = SumsubClient(timeout=10, retries=3)
+
+    # Then
+    assert client.max_request_seconds == 3 * 10 + 2 * SUMSUB_BACKOFF_SECONDS
+
+
+def test_client_does_not_retry_client_errors() -> None:
+    """Client errors are raised right away."""
+    # Given
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(404)
+
+    client = SumsubClient(
+        base_url="https://sumsub.test",
+        transport=httpx.MockTransport(handler)
+    )
+
+    # Then
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.get_applicant_status("missing"))
+    assert len(requests) == 1
+
+
+def test_verify_webhook() -> None:
+    """Only bodies signed with the webhook secret are accepted."""
+    # Given
+    body = b'{"type": "applicantReviewed"}'
+    digest = hmac.new(b"webhook-secret", body, hashlib.sha256).hexdigest()
+    sha1 = hmac.new(b"webhook-secret", body, hashlib.sha1).hexdigest()
+
+    # Then
+    assert verify_webhook(body, digest)
+    assert verify_webhook(body, sha1, "HMAC_SHA1_HEX")
+    assert not verify_webhook(body + b" ", digest)
+    assert not verify_webhook(body, digest, "UNKNOWN")
+    assert not verify_webhook(body, None)
+
+
+def test_webhook_status() -> None:
+    """The status fields are taken from the event."""
+    # Given
+    payload = {
+        "type": "applicantReviewed",
+        "externalUserId": "user",
+        "reviewStatus": "completed",
+        "reviewResult": {"reviewAnswer": "GREEN"},
+    }
+
+    # Then
+    assert webhook_status(payload) == {
+        "reviewStatus": "completed",
+        "reviewResult": {"reviewAnswer": "GREEN"},
+    }
+
+
+def test_access_token_cache_collapses_refreshes() -> None:
+    """Concurrent requests for the same user share one Sumsub call."""
+    # Given
+    calls = []
+
+    async def fetch(uid: str, level_name: str, ttl: int) -> str:
+        calls.append((uid, level_name, ttl))
+        await asyncio.sleep(0.01)
+        return f"token-{len(calls)}"
+
+    cache = AccessTokenCache(fetch=fetch, ttl_in_secs=600)
+
+    async def get_tokens() -> list:
+        first = await asyncio.gather(*[
+            cache.get("user", "level") for _ in range(5)
+        ])
+        return first + [await cache.get("user", "level")]
+
+    # When
+    tokens = asyncio.run(get_tokens())
+
+    # Then
+    assert tokens == ["token-1"] * 6
+    assert calls == [("user", "level", 600)]
+
+
+def test_access_token_cache_refreshes_early() -> None:
+    """Tokens close to expiry are replaced before they are handed out."""
+    # Given
+    calls = []
+
+    async def fetch(uid: str, level_name: str, ttl: int) -> str:
+        calls.append(uid)
+        return f"token-{len(calls)}"
+
+    # every token is already inside the refresh margin
+    cache = AccessTokenCache(fetch=fetch, ttl_in_secs=1, refresh_margin=5)
+
+    async def get_tokens() -> list:
+        return [await cache.get("user", "level") for _ in range(2)]
+
+    # Then
+    assert asyncio.run(get_tokens()) == ["token-1", "token-2"]
+
+
+def test_access_token_cache_raises_without_token() -> None:
+    """A response without a token is an error, and is not cached."""
+    # Given
+    tokens = [None, "token"]
+
+    async def fetch(uid: str, level_name: str, ttl: int) -> str:
+        return tokens.pop(0)
+
+    cache = AccessTokenCache(fetch=fetch)
+
+    # When
+    with pytest.raises(ValueError):
+        asyncio.run(cache.get("user", "level"))
+
+    # Then
+    assert asyncio.run(cache.get("user", "level")) == "token"
+
+
+def test_webhook_created() -> None:
+    """The creation time of an event is read from `createdAtMs` (UTC)."""
+    assert webhook_created(
+        {"createdAtMs": "2024-02-21 13:23:19.321"}
+    ) == pytest.approx(1708521799.321)
+    assert webhook_created({"createdAtMs": "2024-02-21 13:23:19"}) == 1708521799  # noqa: E501
+    assert webhook_created({"createdAtMs": "yesterday"}) is None
+    assert webhook_created({}) is None
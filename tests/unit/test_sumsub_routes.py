@@ -0,0 +1,84 @@
+"""Test src/routes/sumsub.py."""
+import hashlib
+import hmac
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import pytest
+
+from src.firestore import crud
+from src.routes.sumsub import SumsubRouter
+
+from .test_crud import FakeDb, event
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    """Serve the Sumsub routes."""
+    monkeypatch.setenv("SUMSUB_WEBHOOK_SECRET", "webhook-secret")
+    app = FastAPI()
+    SumsubRouter(app)
+    return TestClient(app)
+
+
+@pytest.fixture
+def db(monkeypatch: pytest.MonkeyPatch) -> FakeDb:
+    """Use an in-memory database."""
+    db = FakeDb()
+    monkeypatch.setattr(crud, "get_db", lambda: db)
+    return db
+
+
+def sign(body: bytes) -> dict:
+    """Get the headers Sumsub signs a webhook with."""
+    digest = hmac.new(b"webhook-secret", body, hashlib.sha256).hexdigest()
+    return {
+        "X-Payload-Digest": digest,
+        "X-Payload-Digest-Alg": "HMAC_SHA256_HEX",
+    }
+
+
+def test_webhook_stores_the_status(client: TestClient, db: FakeDb) -> None:
+    """A signed event is stored on the user document."""
+    # Given
+    body = json.dumps(
+        event("applicantReviewed", "GREEN", "2024-02-21 13:23:19.321")
+    ).encode('utf-8')
+
+    # When
+    response = client.post("/onboard/webhook", content=body, headers=sign(body))  # noqa: E501
+
+    # Then
+    assert response.json()["success"] is True
+    assert db.document("user").data["sumsub_status"]["reviewStatus"] == "completed"  # noqa: E501
+
+
+def test_webhook_with_bad_digest(client: TestClient, db: FakeDb) -> None:
+    """An event that is not signed with the webhook secret is refused."""
+    # Given
+    body = json.dumps(
+        event("applicantReviewed", "GREEN", "2024-02-21 13:23:19.321")
+    ).encode('utf-8')
+
+    # When
+    response = client.post(
+        "/onboard/webhook", content=body, headers=sign(b"other body")
+    )
+
+    # Then
+    assert response.status_code == 401
+    assert db.documents == {}
+
+
+def test_webhook_with_bad_json(client: TestClient, db: FakeDb) -> None:
+    """A signed body that is not JSON is refused."""
+    # When
+    response = client.post(
+        "/onboard/webhook", content=b"not json", headers=sign(b"not json")
+    )
+
+    # Then
+    assert response.status_code == 400
+    assert db.documents == {}
@@ -0,0 +1,53 @@
+"""Test src/trust_score.py."""
+import numpy as np
+
+from bizlogic.protoc.vouch_pb2 import Vouch
+from bizlogic.utils import ParserType
+from bizlogic.vouch import PREFIX
+
+from src.store_index import StoreIndex
+from src.trust_score import TrustScores, pagerank
+from src.vouch_graph import VouchGraph
+
+from .test_store_index import InMemoryIpfs
+from .test_vouch_graph import record_vouch
+
+
+def test_pagerank() -> None:
+    """Scores sum to 1 and flow along the vouches."""
+    # Given: 0 --> 2, 1 --> 2, 2 --> 3
+    voucher = np.array([0, 1, 2])
+    vouchee = np.array([2, 2, 3])
+
+    # When
+    scores = pagerank(voucher, vouchee, 4)
+
+    # Then
+    assert np.isclose(scores.sum(), 1)
+    assert scores[0] == scores[1]
+    assert scores[2] > scores[0]
+    assert scores[3] > scores[2]
+
+    # starting from other scores converges to the same scores
+    warm = pagerank(voucher, vouchee, 4, start=np.array([0.7, 0.1, 0.1, 0.1]))
+    assert np.allclose(warm, scores, atol=1e-6)
+
+
+def test_scores_update_with_new_vouches() -> None:
+    """New vouches are added incrementally."""
+    # Given
+    index = StoreIndex(InMemoryIpfs(), PREFIX, Vouch(), ParserType.VOUCH)
+    record_vouch(index, "v1", "a", "b")
+    scores = TrustScores(VouchGraph(index))
+    scores.refresh()
+    before = scores.score("b")
+
+    # When
+    record_vouch(index, "v2", "c", "b")
+    scores.refresh()
+
+    # Then
+    assert scores.score("b") > before
+    assert scores.score("b") > scores.score("a")
+    assert scores.score("nobody") == 0
+    assert np.isclose(scores.scores(["a", "b", "c"]).mean(), 1)
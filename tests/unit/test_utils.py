@@ -0,0 +1,43 @@
+"""Test src/utils.py."""
+import datetime
+
+from bizlogic.loan.status import LoanStatusType
+
+import pandas as pd
+
+from src.schemas import LoanResponse
+from src.utils import RouterUtils
+
+
+def test_sanitize_output() -> None:
+    """Enums and timestamps are converted column by column."""
+    # Given
+    df = pd.DataFrame({
+        "loan": ["a", "b"],
+        "created": [datetime.datetime(2023, 6, 1)] * 2,
+        "loan_status": [LoanStatusType.DRAFT, LoanStatusType.PENDING_ACCEPTANCE],  # noqa: E501
+        "internal": [1, 2],
+    })
+
+    # When
+    result = RouterUtils.sanitize_output(df, LoanResponse)
+
+    # Then
+    assert "internal" not in result.columns
+    assert result["loan_status"].tolist() == [
+        LoanStatusType.DRAFT.value, LoanStatusType.PENDING_ACCEPTANCE.value
+    ]
+    assert pd.api.types.is_datetime64_any_dtype(result["created"])
+    assert df["loan_status"][0] is LoanStatusType.DRAFT
+
+
+def test_make_etag() -> None:
+    """ETags are quoted and change with any of their parts."""
+    # When
+    etag = RouterUtils.make_etag("1-abc", None, 10)
+
+    # Then
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == RouterUtils.make_etag("1-abc", None, 10)
+    assert etag != RouterUtils.make_etag("2-def", None, 10)
+    assert etag != RouterUtils.make_etag("1-abc", None, 20)
@@ -0,0 +1,107 @@
+"""Test src/uuid_images.py."""
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+import pytest
+
+from src import ipfs, uuid_images
+from src.uuid_images import UuidImageIndex
+
+from .test_store_index import InMemoryIpfs
+
+LOAN = "9f4c2a4e-8f3b-4a8e-9c1d-2b7e6f5a4d3c"
+PAYMENT = "00000000-0000-0000-0000-000000000001"
+
+
+def test_image_links_point_at_the_image_endpoint(
+        monkeypatch: pytest.MonkeyPatch) -> None:
+    """By default the links are served by `/image/{uuid}.png`."""
+    # Given
+    monkeypatch.setattr(uuid_images, "UUID_IMAGE_LINKS", "http")
+    data = {
+        "metadata": {"loan": LOAN},
+        "repaymentSchedule": [{"paymentId": PAYMENT}],
+    }
+    loans = pd.DataFrame({"loan": [LOAN, LOAN]})
+
+    # When
+    data = uuid_images.add_uuid_images(data, "http://testserver/")
+    loans = uuid_images.add_uuid_image_links(loans, "http://testserver/")
+
+    # Then
+    assert data["metadata"]["loanImageLink"] == f"http://testserver/image/{LOAN}.png"  # noqa: E501
+    assert data["repaymentSchedule"][0]["imageLink"] == f"http://testserver/image/{PAYMENT}.png"  # noqa: E501
+    assert loans["loanImageLink"].tolist() == [f"http://testserver/image/{LOAN}.png"] * 2  # noqa: E501
+
+
+def test_index_falls_back_to_sqlite(tmp_path: Path) -> None:
+    """Evicted CIDs are read back from the sqlite file."""
+    # Given
+    path = str(tmp_path / "index" / "uuid_images.sqlite3")
+    index = UuidImageIndex(path, max_size=1)
+    first = UuidImageIndex.key(LOAN, 100, 100)
+    second = UuidImageIndex.key(PAYMENT, 100, 100)
+    index.set(first, "cid1")
+    index.set(second, "cid2")
+
+    # When
+    found = index.get_many([first, second, "missing"])
+
+    # Then
+    assert found == {first: "cid1", second: "cid2"}
+    assert index.memory.get(first) == "cid1"
+    assert UuidImageIndex(path, max_size=1).get(second) == "cid2"
+
+
+def test_images_are_uploaded_once(
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path) -> None:
+    """Known UUIDs are neither rendered nor uploaded again."""
+    # Given
+    client = InMemoryIpfs()
+    client.mkdir = lambda directory: None
+    monkeypatch.setattr(ipfs, "_ipfs_client", client)
+    monkeypatch.setattr(uuid_images, "_cdn_ready", False)
+    monkeypatch.setattr(uuid_images, "_index", UuidImageIndex(
+        str(tmp_path / "uuid_images.sqlite3"), max_size=10
+    ))
+
+    rendered: List[List[str]] = []
+
+    def render_pngs(uuids: List[str], width: int, height: int) -> List[bytes]:
+        rendered.append(list(uuids))
+        return [uuid.encode() for uuid in uuids]
+
+    monkeypatch.setattr(uuid_images, "render_pngs", render_pngs)
+
+    # When
+    cids = uuid_images.get_uuid_image_cids([LOAN, PAYMENT])
+    # known UUIDs do not need IPFS at all
+    monkeypatch.setattr(uuid_images, "get_ipfs_client", None)
+    again = uuid_images.get_uuid_image_cids([PAYMENT, LOAN])
+
+    # Then
+    assert cids == again == {
+        LOAN: f"CDN/{LOAN}.png",
+        PAYMENT: f"CDN/{PAYMENT}.png",
+    }
+    assert rendered == [[LOAN, PAYMENT]]
+    assert len(client.files) == 2
+
+
+def test_ipfs_image_links(monkeypatch: pytest.MonkeyPatch) -> None:
+    """With `UUID_IMAGE_LINKS=ipfs` the links point at the CIDs."""
+    # Given
+    monkeypatch.setattr(uuid_images, "UUID_IMAGE_LINKS", "ipfs")
+    monkeypatch.setattr(
+        uuid_images, "get_uuid_image_cids",
+        lambda uuids: {uuid: f"cid-{uuid}" for uuid in uuids}
+    )
+
+    # When
+    links = uuid_images.get_uuid_image_links([LOAN], "http://testserver")
+
+    # Then
+    assert links == {LOAN: f"ipfs://cid-{LOAN}"}
@@ -0,0 +1,89 @@
+"""Test src/vouch_graph.py."""
+import time
+
+from bizlogic.protoc.vouch_pb2 import Vouch
+from bizlogic.utils import ParserType
+from bizlogic.vouch import PREFIX
+
+from ipfskvs.index import Index
+
+from src.store_index import StoreIndex
+from src.vouch_graph import VouchGraph
+
+from .test_store_index import InMemoryIpfs
+
+
+def record_vouch(
+        index: StoreIndex,
+        vouch: str,
+        voucher: str,
+        vouchee: str) -> None:
+    """Add a vouch record like `VouchWriter.write`."""
+    index.record(
+        Index(
+            prefix=PREFIX,
+            index={"vouchee": vouchee, "voucher": voucher, "vouch": vouch},
+            subindex=Index(index={"created": str(time.time_ns())})
+        ),
+        Vouch()
+    )
+
+
+def make_graph() -> VouchGraph:
+    """Build a graph: a --> b --> c --> d, and e --> b."""
+    index = StoreIndex(InMemoryIpfs(), PREFIX, Vouch(), ParserType.VOUCH)
+    record_vouch(index, "v1", "a", "b")
+    record_vouch(index, "v2", "b", "c")
+    record_vouch(index, "v3", "c", "d")
+    record_vouch(index, "v4", "e", "b")
+    graph = VouchGraph(index)
+    graph.refresh()
+    return graph
+
+
+def test_vouches_by_and_for_a_user() -> None:
+    """Lookups use the forward and reverse edges."""
+    # Given
+    graph = make_graph()
+    frame = graph.index.frame()
+
+    # Then
+    assert frame.iloc[graph.vouches("b", "voucher")]["vouch"].tolist() == ["v2"]  # noqa: E501
+    assert sorted(
+        frame.iloc[graph.vouches("b", "vouchee")]["voucher"]
+    ) == ["a", "e"]
+    assert graph.vouches("z", "voucher") == []
+
+
+def test_refresh_only_reads_new_records() -> None:
+    """New records and updates are added incrementally."""
+    # Given
+    graph = make_graph()
+
+    # When
+    record_vouch(graph.index, "v1", "a", "b")
+    record_vouch(graph.index, "v5", "a", "c")
+    graph.refresh()
+
+    # Then
+    assert len(graph.vouches("a", "voucher")) == 2
+    assert len(graph.vouches("a", "voucher", recent=False)) == 3
+    assert graph.generation == 2
+
+
+def test_neighbourhood() -> None:
+    """Users are found breadth first up to the depth."""
+    # Given
+    graph = make_graph()
+
+    # When
+    out, out_edges = graph.neighbourhood("a", depth=2, direction="out")
+    both, _ = graph.neighbourhood("c", depth=1)
+    limited, limited_edges = graph.neighbourhood("b", depth=1, max_nodes=2)
+
+    # Then
+    assert out == {"a": 0, "b": 1, "c": 2}
+    assert sorted(edge["vouch"] for edge in out_edges) == ["v1", "v2"]
+    assert both == {"c": 0, "b": 1, "d": 1}
+    assert len(limited) == 2
+    assert len(limited_edges) == 1
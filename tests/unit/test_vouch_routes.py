@@ -0,0 +1,96 @@
+"""Test src/routes/vouch.py."""
+import time
+from typing import Type
+
+from bizlogic.protoc.vouch_pb2 import Vouch
+from bizlogic.utils import ParserType
+from bizlogic.vouch import PREFIX
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ipfskvs.index import Index
+
+import pytest
+
+from src import ipfs, store_index, trust_score, vouch_graph
+from src.routes.vouch import VouchRouter
+from src.store_index import get_store_index
+from src.utils import RouterUtils
+
+from .test_store_index import InMemoryIpfs
+
+
+def make_client(
+        monkeypatch: pytest.MonkeyPatch,
+        router: Type,
+        user: str = "123") -> TestClient:
+    """Serve a router on in-memory IPFS, authenticated as `user`."""
+    monkeypatch.setattr(ipfs, "_ipfs_client", InMemoryIpfs())
+    monkeypatch.setattr(store_index, "_indexes", {})
+    monkeypatch.setattr(vouch_graph, "_graph", None)
+    monkeypatch.setattr(trust_score, "_scores", None)
+
+    app = FastAPI()
+    router(app)
+    app.dependency_overrides[RouterUtils.get_user_token] = lambda: user
+    return TestClient(app)
+
+
+def test_new_vouch_is_in_user_vouches_and_graph(
+        monkeypatch: pytest.MonkeyPatch) -> None:
+    """A vouch written with POST /vouch is served from the vouch graph."""
+    # Given
+    client = make_client(monkeypatch, VouchRouter)
+    assert client.get("/vouch/user/other?them=321&perspective=vouchee").json() == []  # noqa: E501
+
+    # When
+    response = client.post("/vouch?vouchee=321")
+
+    # Then
+    assert response.json()["success"] is True
+
+    vouches = client.get("/vouch/user/self").json()
+    assert [(v["voucher"], v["vouchee"]) for v in vouches] == [("123", "321")]
+
+    vouches = client.get(
+        "/vouch/user/other?them=321&perspective=vouchee"
+    ).json()
+    assert [(v["voucher"], v["vouchee"]) for v in vouches] == [("123", "321")]
+
+    graph = client.get("/vouch/graph?them=321").json()
+    assert sorted(
+        (node["user"], node["depth"]) for node in graph["nodes"]
+    ) == [("123", 1), ("321", 0)]
+    assert [
+        (edge["voucher"], edge["vouchee"]) for edge in graph["edges"]
+    ] == [("123", "321")]
+
+
+def test_vouches_default_to_the_latest_record(
+        monkeypatch: pytest.MonkeyPatch) -> None:
+    """Only `recent=false` returns every record of a vouch."""
+    # Given
+    client = make_client(monkeypatch, VouchRouter)
+    client.post("/vouch?vouchee=321")
+    vouch, = client.get("/vouch").json()
+
+    # a later record of the same vouch
+    update = Index(
+        prefix=PREFIX,
+        index={"vouchee": "321", "voucher": "123", "vouch": vouch["vouch"]},
+        subindex=Index(index={"created": str(time.time_ns())})
+    )
+    get_store_index(ParserType.VOUCH).record(update, Vouch(active=False))
+
+    # When
+    latest = client.get("/vouch").json()
+    history = client.get("/vouch?recent=false").json()
+    mine = client.get("/vouch/user/self").json()
+    my_history = client.get("/vouch/user/self?recent=false").json()
+
+    # Then
+    assert len(latest) == len(mine) == 1
+    assert len(history) == len(my_history) == 2
+    assert latest[0]["created"] == max(v["created"] for v in history)
+    assert mine == latest